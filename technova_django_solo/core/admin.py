@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Coupon, Newsletter, ContactMessage, Address
+from django.utils import timezone
+from .models import Coupon, Newsletter, ContactMessage, Address, OutgoingEmail
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
@@ -24,3 +25,18 @@ class AddressAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'company', 'address_line_1', 'address_line_2', 'city', 'state', 'postal_code', 'country', 'phone')
     search_fields = ('first_name', 'last_name', 'company', 'address_line_1', 'address_line_2', 'city', 'state', 'postal_code', 'country', 'phone')  
 
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at', 'claimed_at')
+    actions = ['retry_now']
+
+    @admin.action(description='Reintentar ahora')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), claim_token=None, claimed_at=None,
+        )
+        self.message_user(request, f'{updated} correos reprogramados')
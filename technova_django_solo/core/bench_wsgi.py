@@ -0,0 +1,27 @@
+"""
+Aplicación WSGI para benchmarks con gunicorn
+Apunta la configuración a la base de pruebas creada por el comando de benchmark
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'technova.settings')
+
+from django.conf import settings  # noqa: E402
+
+# Las conexiones y el cache se crean de forma perezosa, así que basta con
+# ajustar la configuración antes de construir la aplicación
+settings.DATABASES['default']['NAME'] = os.environ['TECHNOVA_BENCH_DB']
+settings.CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['TECHNOVA_BENCH_CACHE_DIR'],
+    }
+}
+settings.DEBUG = False
+settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+settings.STORAGES = {**settings.STORAGES, 'staticfiles': {'BACKEND': settings.STATICFILES_STORAGE}}
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+application = get_wsgi_application()
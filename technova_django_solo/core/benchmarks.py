@@ -0,0 +1,406 @@
+"""
+Utilidades de benchmark para TechNova Solutions
+Base de datos temporal, generación masiva de datos, escenarios de carga y estadísticas de latencia
+"""
+
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+
+from .stats import summarize
+
+BRANDS = ['Samsung', 'Apple', 'Lenovo', 'Xiaomi', 'Huawei', 'Sony', 'Asus', 'HP', 'Dell', 'Motorola', 'JBL', 'Logitech']
+NOUNS = ['Teléfono', 'Portátil', 'Tableta', 'Audífonos', 'Cámara', 'Monitor', 'Teclado', 'Ratón', 'Bocina', 'Cargador', 'Reloj', 'Consola']
+ADJECTIVES = ['inalámbrico', 'rápido', 'compacto', 'resistente', 'económico', 'profesional', 'ligero', 'potente', 'ergonómico', 'táctil']
+WORDS = [
+    'batería', 'pantalla', 'diseño', 'sonido', 'conexión', 'garantía', 'memoria', 'almacenamiento',
+    'procesador', 'cámara', 'resolución', 'carga', 'rápida', 'aluminio', 'cristal', 'señal', 'potencia',
+    'duración', 'portátil', 'oficina', 'juegos', 'estudio', 'viaje', 'hogar', 'calidad', 'precio',
+]
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+PLAIN_STATIC = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+@contextmanager
+def benchmark_database(keepdb=False, shared_cache=False, test_name=None):
+    """Ejecutar el benchmark sobre una base de datos de prueba aislada
+
+    Nunca toca la base de datos de desarrollo: usa la misma maquinaria que
+    ``manage.py test`` para crear (y destruir al final) la base de pruebas.
+    Salvo ``shared_cache=True``, el cache configurado (Redis) se sustituye por
+    uno local en memoria para no mezclar datos del benchmark con los reales.
+    ``test_name`` fija el nombre de la base de pruebas (en SQLite, un archivo
+    que otros procesos como gunicorn pueden abrir).
+    """
+    from django.db import connection
+    from django.test.utils import override_settings, setup_databases, teardown_databases
+
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_name = test_settings.get('NAME')
+    if test_name:
+        test_settings['NAME'] = str(test_name)
+    cache_override = override_settings() if shared_cache else override_settings(CACHES=LOCMEM_CACHES)
+    try:
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+        try:
+            with cache_override:
+                yield
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+    finally:
+        # El nombre fijado no debe quedar para el siguiente benchmark (ni para los tests)
+        if old_name is None:
+            test_settings.pop('NAME', None)
+        else:
+            test_settings['NAME'] = old_name
+
+
+def seed_categories(count=12):
+    """Crear categorías de benchmark (las de la migración inicial se reutilizan)"""
+    from products.models import Category
+
+    existing = Category.objects.count()
+    for i in range(existing, count):
+        # create() y no bulk_create() para que las señales calculen la ruta del árbol
+        Category.objects.create(name=f'Bench Categoría {i}', slug=f'bench-categoria-{i}', sort_order=i)
+    return list(Category.objects.all()[:count])
+
+
+def make_product(index, categories, rng):
+    """Producto sintético con texto en español y especificaciones variadas"""
+    from products.models import Product
+
+    brand = rng.choice(BRANDS)
+    noun = rng.choice(NOUNS)
+    adjective = rng.choice(ADJECTIVES)
+    price = Decimal(rng.randint(500, 60000)) / 2
+    on_sale = rng.random() < 0.2
+    return Product(
+        name=f'{noun} {brand} {adjective} {index}',
+        slug=f'bench-producto-{index}',
+        sku=f'BN-{index:08d}',
+        brand=brand,
+        model=f'M{rng.randint(100, 999)}',
+        description=' '.join(rng.choices(WORDS, k=40)),
+        short_description=' '.join(rng.choices(WORDS, k=8)),
+        category=rng.choice(categories),
+        price=price,
+        compare_at_price=(price * Decimal('1.25')).quantize(Decimal('0.01')) if on_sale else None,
+        stock_quantity=rng.randint(0, 200),
+        condition=rng.choice(['new', 'new', 'new', 'refurbished', 'used']),
+        average_rating=Decimal(rng.randint(0, 50)) / 10,
+        specifications={
+            'ram': f'{rng.choice([4, 8, 16, 32])}GB',
+            'almacenamiento': f'{rng.choice([64, 128, 256, 512, 1024])}GB',
+            'color': rng.choice(['negro', 'blanco', 'azul', 'gris']),
+        },
+    )
+
+
+def seed_products(count, start=0, categories=None, batch_size=5000, seed=42):
+    """Insertar ``count`` productos sintéticos con bulk_create (sin señales)"""
+    from products.models import Product
+
+    rng = random.Random(seed + start)
+    categories = categories or seed_categories()
+    for offset in range(start, start + count, batch_size):
+        stop = min(offset + batch_size, start + count)
+        Product.objects.bulk_create(
+            [make_product(i, categories, rng) for i in range(offset, stop)],
+            batch_size=batch_size,
+        )
+    return count
+
+
+def seed_users(count, start=0, password='bench-pass', batch_size=2000):
+    """Usuarios (con perfil) en bloque; todos comparten la misma contraseña"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from users.models import UserProfile
+
+    User = get_user_model()
+    hashed = make_password(password)
+    users = User.objects.bulk_create(
+        [
+            User(username=f'bench{i}', email=f'bench{i}@example.com', password=hashed, first_name='Bench', last_name=str(i))
+            for i in range(start, start + count)
+        ],
+        batch_size=batch_size,
+    )
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=batch_size)
+    return users
+
+
+def seed_orders(count, users, products, max_items=4, batch_size=2000, seed=42):
+    """Pedidos históricos con sus líneas, sin pasar por el checkout"""
+    from orders.models import Order, OrderItem
+    from orders.numbering import format_order_number, reserve_block
+
+    rng = random.Random(seed)
+    first, _ = reserve_block(count)
+    for offset in range(0, count, batch_size):
+        orders = []
+        lines = []
+        for i in range(offset, min(offset + batch_size, count)):
+            picked = rng.sample(products, rng.randint(1, max_items))
+            order_lines = [(product, rng.randint(1, 3)) for product in picked]
+            total = sum(product.price * quantity for product, quantity in order_lines)
+            user = rng.choice(users)
+            orders.append(Order(
+                order_number=format_order_number(first + i), user=user, email=user.email, phone='5555555555',
+                payment_method='credit_card', status=rng.choice(['pending', 'confirmed', 'delivered']),
+                subtotal=total, total_amount=total,
+            ))
+            lines.append(order_lines)
+        Order.objects.bulk_create(orders, batch_size=batch_size)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order, product=product, quantity=quantity, unit_price=product.price,
+                    total_price=product.price * quantity, product_name=product.name, product_sku=product.sku or '',
+                )
+                for order, order_lines in zip(orders, lines)
+                for product, quantity in order_lines
+            ],
+            batch_size=batch_size,
+        )
+    return count
+
+
+def seed_fixture(categories=12, products=10000, users=100, orders=1000, seed=42):
+    """Catálogo, usuarios y pedidos completos para los escenarios de carga"""
+    from products.facets import rebuild_facet_index
+    from products.models import Product
+    from products.search import get_search_backend
+
+    category_list = seed_categories(categories)
+    seed_products(products, categories=category_list, seed=seed)
+    # El checkout del benchmark no debe agotar el inventario
+    Product.objects.update(stock_quantity=1000000, status='active')
+    get_search_backend().rebuild()
+    rebuild_facet_index()
+    user_list = seed_users(users)
+    sample = list(Product.objects.order_by('?')[:500])
+    seed_orders(orders, user_list, sample, seed=seed)
+    return {'categories': len(category_list), 'products': products, 'users': users, 'orders': orders}
+
+
+class Scenario:
+    """Flujo de usuario: ``build(rng, data)`` devuelve (método, ruta, datos POST)
+
+    ``setup`` (opcional) prepara cada iteración sin medirla, p. ej. llenar
+    el carrito antes de confirmar el checkout.
+    """
+
+    def __init__(self, name, build, login=False, setup=None):
+        self.name = name
+        self.build = build
+        self.login = login
+        self.setup = setup
+
+
+class InProcessRunner:
+    """Peticiones a través de la aplicación WSGI en el mismo proceso"""
+
+    def __init__(self, user=None):
+        from django.test import Client
+
+        self.client = Client(HTTP_HOST='localhost')
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self, method, path, data=None):
+        from .instrumentation import RequestRecorder
+
+        recorder = RequestRecorder()
+        with recorder.record():
+            response = getattr(self.client, method.lower())(path, data or {})
+        return response.status_code, recorder.queries
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPRunner:
+    """Peticiones HTTP reales (p. ej. contra gunicorn) con sesión y CSRF propios
+
+    El número de consultas se lee de la cabecera X-Query-Count, así que el
+    servidor debe tener REQUEST_INSTRUMENTATION activo.
+    """
+
+    def __init__(self, base_url, user=None):
+        from django.conf import settings
+        from django.test import Client
+
+        self.base_url = base_url.rstrip('/')
+        self.csrf_token = secrets.token_hex(16)
+        cookies = {settings.CSRF_COOKIE_NAME: self.csrf_token}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookies[settings.SESSION_COOKIE_NAME] = client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.cookie = '; '.join(f'{name}={value}' for name, value in cookies.items())
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def request(self, method, path, data=None):
+        url, body = self.base_url + path, None
+        if data and method.upper() == 'GET':
+            url += '?' + urllib.parse.urlencode(data)
+        elif data:
+            body = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(url, data=body, method=method.upper())
+        request.add_header('Cookie', self.cookie)
+        request.add_header('X-CSRFToken', self.csrf_token)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        queries = headers.get('X-Query-Count')
+        return status, int(queries) if queries is not None else None
+
+
+def run_scenario(scenario, runner_factory, requests=100, concurrency=1, data=None, seed=42):
+    """Ejecutar un escenario y devolver latencias, consultas por petición y throughput"""
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    samples, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def work(index):
+        rng = random.Random(seed + index)
+        user = rng.choice(data['users']) if scenario.login else None
+        runner = runner_factory(user)
+        for _ in range(per_worker[index]):
+            if scenario.setup:
+                scenario.setup(runner, rng, data)
+            method, path, payload = scenario.build(rng, data)
+            start = time.perf_counter()
+            status, count = runner.request(method, path, payload)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                if count is not None:
+                    queries.append(count)
+                if status >= 400:
+                    errors.append(status)
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        work(0)
+    else:
+        workers = [threading.Thread(target=work, args=(i,)) for i in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    wall = time.perf_counter() - start
+
+    result = summarize(samples)
+    result.update({
+        'throughput_rps': round(len(samples) / wall, 2) if wall else None,
+        'queries_mean': round(statistics.fmean(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+        'errors': len(errors),
+        'concurrency': concurrency,
+    })
+    return result
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_server(database_name, workers=2, threads=1, timeout=30):
+    """Levantar gunicorn sobre la base de pruebas; devuelve la URL base
+
+    Usa ``core.bench_wsgi``, que apunta la configuración a ``database_name``
+    y a un cache en archivos compartido por los workers.
+    """
+    from django.conf import settings
+
+    port = _free_port()
+    cache_dir = Path(str(database_name) + '-cache')
+    env = dict(
+        os.environ,
+        TECHNOVA_BENCH_DB=str(database_name),
+        TECHNOVA_BENCH_CACHE_DIR=str(cache_dir),
+        REQUEST_INSTRUMENTATION='True',
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', 'core.bench_wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+            '--log-level', 'warning',
+        ],
+        cwd=settings.BASE_DIR,
+        env=env,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn terminó antes de aceptar conexiones')
+            try:
+                urllib.request.urlopen(base_url + '/contacto/', timeout=2).read()
+                break
+            except urllib.error.HTTPError as error:
+                raise RuntimeError(f'gunicorn respondió {error.code} al comprobar el arranque')
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError('gunicorn no respondió a tiempo')
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(func, repeat=5, warmup=1):
+    """Ejecutar ``func`` varias veces y devolver las duraciones en segundos"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def parse_sizes(value):
+    """'10000,100000' -> [10000, 100000]"""
+    return sorted(int(size) for size in value.split(',') if size.strip())
+
+
+def write_results(path, payload):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(payload, fh, indent=2, ensure_ascii=False, default=str)
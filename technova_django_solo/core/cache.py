@@ -0,0 +1,72 @@
+"""
+Utilidades de cache para TechNova Solutions
+Contadores de versión compartidos entre procesos para invalidar datos cacheados
+"""
+
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+def get_version(key):
+    """Versión actual de un espacio de cache (se inicializa si no existe)"""
+    version = cache.get(key)
+    if version is None:
+        # Si la versión se pierde (expulsión del cache) se parte de un valor
+        # nuevo para no leer entradas antiguas de otra generación
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Invalidar todo lo cacheado bajo la versión anterior"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return get_version(key)
+
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+_missing = object()
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidar todo lo que depende del catálogo (productos, categorías, ratings)"""
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_or_build(key, builder, timeout=DEFAULT_TIMEOUT, lock_timeout=30, wait=5.0, poll=0.05):
+    """Leer ``key`` del cache o construirlo con protección contra estampidas
+
+    Sólo el proceso que consigue el candado (``cache.add``) ejecuta
+    ``builder``; el resto espera a que el valor aparezca. Si el constructor
+    tarda más de ``wait`` segundos, el que espera lo calcula por su cuenta en
+    lugar de bloquear la petición indefinidamente.
+    """
+    value = cache.get(key, _missing)
+    if value is not _missing:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = builder()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        value = cache.get(key, _missing)
+        if value is not _missing:
+            return value
+    return builder()
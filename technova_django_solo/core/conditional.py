@@ -0,0 +1,64 @@
+"""
+Peticiones condicionales del catálogo
+ETag calculado antes de renderizar (versión del catálogo, datos de la página y visitante) y Cache-Control por vista
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from orders.cart import cart_fingerprint
+from .cache import get_catalog_version
+
+# Revalidar siempre: la cabecera muestra el carrito, así que la página es privada
+DEFAULT_CACHE_CONTROL = {'private': True, 'max_age': 0, 'must_revalidate': True}
+
+
+def cache_control_policy(name):
+    policies = getattr(settings, 'CATALOG_CACHE_CONTROL', {})
+    return policies.get(name, DEFAULT_CACHE_CONTROL)
+
+
+def has_pending_messages(request):
+    """Mensajes flash por mostrar (no los marca como leídos)"""
+    storage = getattr(request, '_messages', None)
+    return bool(storage) if storage is not None else False
+
+
+def page_etag(request, content):
+    """ETag de la página para este visitante: contenido + catálogo + usuario + carrito"""
+    user = request.user.pk if request.user.is_authenticated else 0
+    raw = f'{content}|{get_catalog_version()}|{user}|{cart_fingerprint(request)}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_page(fingerprint, policy):
+    """Responder 304 si la página no cambió y aplicar la política de Cache-Control ``policy``
+
+    ``fingerprint(request, *args, **kwargs)`` resume en una cadena, con una
+    consulta barata como mucho, los datos de los que depende la página; si
+    devuelve None (p. ej. el objeto no existe) la vista se ejecuta sin ETag.
+    No se usa Last-Modified: el stock y las valoraciones cambian con update()
+    sin tocar updated_at, y una fecha no los reflejaría.
+    """
+    def etag_func(request, *args, **kwargs):
+        if not getattr(settings, 'CATALOG_CONDITIONAL_GET', True) or has_pending_messages(request):
+            return None
+        content = fingerprint(request, *args, **kwargs)
+        return None if content is None else page_etag(request, content)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                patch_cache_control(response, **cache_control_policy(policy))
+                patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -3,47 +3,40 @@ Context processors para TechNova Solutions
 Proporcionan datos globales a todas las plantillas
 """
 
-from orders.models import Cart, CartItem
-from products.models import Category
+from django.utils.functional import SimpleLazyObject
+from orders.cart import CartSummary
+from products.category_tree import get_category_tree
 
 
 def cart(request):
-    """Contexto del carrito de compras"""
-    cart_items = []
-    cart_total = 0
-    cart_count = 0
-    
-    if request.user.is_authenticated:
-        # Usuario autenticado
-        cart_obj, created = Cart.objects.get_or_create(user=request.user)
-    else:
-        # Usuario anónimo
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        
-        cart_obj, created = Cart.objects.get_or_create(session_id=session_key)
-    
-    cart_items = cart_obj.items.select_related('product').all()
-    cart_count = sum(item.quantity for item in cart_items)
-    cart_total = sum(item.total_price for item in cart_items)
+    """Contexto del carrito de compras (perezoso: no crea carrito ni sesión)"""
+    summary = CartSummary(request)
     
     return {
-        'cart': cart_obj,
-        'cart_items': cart_items,
-        'cart_count': cart_count,
-        'cart_total': cart_total,
+        'cart_summary': summary,
+        'cart': SimpleLazyObject(lambda: summary.cart),
+        'cart_items': SimpleLazyObject(lambda: summary.items),
+        'cart_count': SimpleLazyObject(lambda: summary.count),
+        'cart_total': SimpleLazyObject(lambda: summary.total),
     }
 
 
 def categories(request):
-    """Contexto de categorías"""
-    categories = Category.objects.filter(
-        parent__isnull=True,
-        is_active=True
-    ).order_by('sort_order')
-    
+    """Contexto de categorías (desde la instantánea del árbol, sin consultas)"""
     return {
-        'main_categories': categories,
-    }
\ No newline at end of file
+        'main_categories': SimpleLazyObject(lambda: get_category_tree().roots),
+    }
+
+
+def user_fragments(request):
+    """Indica si el carrito y los mensajes se cargan aparte (página cacheada para anónimos)
+
+    En ese caso {% csrf_token %} no escribe nada: el HTML se comparte entre
+    visitantes y el token de cada uno llega por core:user_fragments.
+    """
+    deferred = getattr(request, 'defer_user_fragments', False)
+    context = {'user_fragments_deferred': deferred}
+    if deferred:
+        # Valor que CsrfTokenNode reconoce para no renderizar el campo
+        context['csrf_token'] = 'NOTPROVIDED'
+    return context
@@ -0,0 +1,235 @@
+"""
+Instrumentación de peticiones
+Consultas SQL, duplicados, tiempo de BD y de plantillas por petición, con presupuestos por vista
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import resolve
+
+from .stats import summarize
+
+logger = logging.getLogger('technova.instrumentation')
+
+_current = contextvars.ContextVar('request_recorder', default=None)
+
+_whitespace = re.compile(r'\s+')
+_in_list = re.compile(r'IN \((?:%s, )*%s\)')
+_values_list = re.compile(r'VALUES (?:\((?:%s, )*%s\)(?:, )?)+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL sin variaciones de listas IN/VALUES, para detectar consultas repetidas"""
+    sql = _whitespace.sub(' ', sql.strip())
+    sql = _in_list.sub('IN (...)', sql)
+    return _values_list.sub('VALUES (...)', sql)
+
+
+def query_budget(max_queries):
+    """Declarar el máximo de consultas SQL que puede ejecutar una vista"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    return getattr(view, 'query_budget', None)
+
+
+class RequestRecorder:
+    """Envoltorio de ``connection.execute_wrapper`` que mide cada consulta"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.fingerprints = Counter()
+        self._rendering = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Ejecuciones repetidas de una misma consulta (síntoma de N+1)"""
+        return sum(count - 1 for count in self.fingerprints.values())
+
+    def duplicated(self, limit=5):
+        return [(sql, count) for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+    def record(self):
+        """Activar el registro sobre todas las conexiones configuradas"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        stack.callback(_current.reset, _current.set(self))
+        return stack
+
+
+class InstrumentedTemplate(Template):
+    """Plantilla que suma su tiempo de render al registro de la petición"""
+
+    def render(self, context=None, request=None):
+        recorder = _current.get()
+        if recorder is None:
+            return super().render(context, request)
+        # Sólo el render más externo cuenta (las vistas pueden renderizar plantillas anidadas)
+        recorder._rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorder._rendering -= 1
+            if not recorder._rendering:
+                recorder.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend de plantillas Django que mide el tiempo de render"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
+
+
+class RequestStats:
+    """Estadísticas móviles por vista dentro del proceso"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._duplicates = {}
+
+    def add(self, view_name, recorder, elapsed):
+        sample = (recorder.queries, recorder.duplicates, recorder.db_time, recorder.template_time, elapsed)
+        with self._lock:
+            self._samples.setdefault(view_name, deque(maxlen=self.window)).append(sample)
+            duplicated = self._duplicates.setdefault(view_name, Counter())
+            for sql, count in recorder.duplicated():
+                duplicated[sql] = max(duplicated[sql], count)
+
+    def snapshot(self):
+        with self._lock:
+            samples = {name: list(rows) for name, rows in self._samples.items()}
+            duplicates = {name: counter.most_common(5) for name, counter in self._duplicates.items()}
+        views = {}
+        for name, rows in samples.items():
+            queries = [row[0] for row in rows]
+            views[name] = {
+                'requests': len(rows),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+                'duplicates_max': max(row[1] for row in rows),
+                'db': summarize([row[2] for row in rows]),
+                'template': summarize([row[3] for row in rows]),
+                'total': summarize([row[4] for row in rows]),
+                'duplicated_queries': [{'sql': sql, 'count': count} for sql, count in duplicates.get(name, [])],
+            }
+        return views
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._duplicates.clear()
+
+
+stats = RequestStats()
+
+
+class QueryCountMiddleware:
+    """Mide cada petición y publica el resultado en cabeceras y en ``stats``
+
+    Cabeceras: X-Query-Count, X-Query-Duplicates, X-DB-Time-ms,
+    X-Template-Time-ms, X-Response-Time-ms y Server-Timing. Si la vista
+    declara un presupuesto con ``@query_budget`` y lo supera, se registra un
+    aviso (o se lanza QueryBudgetExceeded con QUERY_BUDGET_STRICT).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            return self.get_response(request)
+
+        recorder = RequestRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or request.path
+        self.add_headers(response, recorder, elapsed)
+        stats.add(view_name, recorder, elapsed)
+
+        budget = get_query_budget(match.func) if match else None
+        if budget is not None and recorder.queries > budget:
+            response['X-Query-Budget'] = str(budget)
+            message = f'{view_name}: {recorder.queries} consultas (presupuesto {budget})'
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def add_headers(self, response, recorder, elapsed):
+        db_ms = recorder.db_time * 1000
+        template_ms = recorder.template_time * 1000
+        total_ms = elapsed * 1000
+        response['X-Query-Count'] = str(recorder.queries)
+        response['X-Query-Duplicates'] = str(recorder.duplicates)
+        response['X-DB-Time-ms'] = f'{db_ms:.2f}'
+        response['X-Template-Time-ms'] = f'{template_ms:.2f}'
+        response['X-Response-Time-ms'] = f'{total_ms:.2f}'
+        response['Server-Timing'] = f'db;dur={db_ms:.2f}, tpl;dur={template_ms:.2f}, total;dur={total_ms:.2f}'
+
+
+@staff_member_required
+def stats_view(request):
+    """Estadísticas acumuladas del proceso (sólo personal)"""
+    if request.method == 'POST' and request.POST.get('reset'):
+        stats.reset()
+    return JsonResponse({'window': stats.window, 'views': stats.snapshot()})
+
+
+class QueryBudgetTestMixin:
+    """Helper de pruebas: falla si una vista supera su presupuesto de consultas"""
+
+    def assertWithinQueryBudget(self, url, method='get', budget=None, **kwargs):
+        view = resolve(url.split('?')[0]).func
+        budget = budget if budget is not None else get_query_budget(view)
+        if budget is None:
+            self.fail(f'{url} no declara presupuesto de consultas (@query_budget)')
+        recorder = RequestRecorder()
+        with recorder.record():
+            response = getattr(self.client, method)(url, **kwargs)
+        if recorder.queries > budget:
+            duplicated = '\n'.join(f'  {count}x {sql}' for sql, count in recorder.duplicated())
+            self.fail(f'{url}: {recorder.queries} consultas, presupuesto {budget}\n{duplicated}')
+        return response
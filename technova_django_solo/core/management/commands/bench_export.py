@@ -0,0 +1,103 @@
+"""
+Benchmark de la exportación de pedidos en streaming
+Uso: python manage.py bench_export --lines 1000000 --baseline-lines 100000 --output export.json
+"""
+
+import csv
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import benchmark_database, seed_orders, seed_products, seed_users, write_results
+from core.exports import get_export, render
+from orders.exports import OrderLineExport
+from orders.models import OrderItem
+from products.models import Product
+
+
+def streaming_export(export, limit=None):
+    """Exportación real (core.exports) descartando la salida; devuelve los bytes generados"""
+    queryset = None
+    if limit:
+        last = OrderItem.objects.order_by('order_id').values_list('order_id', flat=True)[limit - 1]
+        queryset = export.get_queryset().filter(pk__lte=last)
+    return sum(len(chunk) for chunk in render(export, queryset, 'csv'))
+
+
+def materialized_export(limit):
+    """Esquema anterior: cargar todas las líneas con su pedido y escribir el CSV en memoria"""
+    items = list(OrderItem.objects.select_related('order').order_by('order_id', 'pk')[:limit])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    export = OrderLineExport()
+    writer.writerow(export.headers)
+    for item in items:
+        order = item.order
+        writer.writerow([
+            order.order_number, order.created_at, order.status, order.payment_status, order.payment_method,
+            order.user_id, order.email, order.phone, order.subtotal, order.total_amount,
+            item.product_id, item.product_sku, item.product_name, item.quantity, item.unit_price, item.total_price,
+            *(order.shipping_address.get(field, '') for field in ('address', 'city', 'postal_code')),
+            *(order.billing_address.get(field, '') for field in ('address', 'city', 'postal_code')),
+        ])
+    return len(buffer.getvalue())
+
+
+def measure(func):
+    """(segundos, pico de memoria en bytes, resultado)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak, result
+
+
+class Command(BaseCommand):
+    help = 'Exporta un millón de líneas de pedido en streaming y compara con cargar el queryset en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000000, help='Líneas de pedido aproximadas a generar')
+        parser.add_argument('--baseline-lines', type=int, default=100000, help='Líneas para la comparación en memoria (0 para omitirla)')
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        results = {'runs': []}
+        with benchmark_database():
+            seed_products(1000)
+            products = list(Product.objects.all())
+            users = seed_users(100)
+            start = time.perf_counter()
+            # Entre 1 y 3 líneas por pedido: dos de media
+            seed_orders(options['lines'] // 2, users, products, max_items=3, batch_size=5000)
+            lines = OrderItem.objects.count()
+            results['lines'] = lines
+            self.stdout.write(f'{lines} líneas de pedido generadas en {time.perf_counter() - start:.1f}s')
+
+            export = get_export('orders')
+            sizes = [size for size in (options['baseline_lines'], lines) if size]
+            for size in sorted(set(min(size, lines) for size in sizes)):
+                limit = None if size == lines else size
+                runs = [('streaming', lambda: streaming_export(export, limit))]
+                if size <= options['baseline_lines']:
+                    runs.append(('en memoria', lambda: materialized_export(size)))
+                for name, func in runs:
+                    elapsed, peak, written = measure(func)
+                    row = {
+                        'lines': size, 'mode': name, 'seconds': round(elapsed, 2),
+                        'lines_per_second': round(size / elapsed), 'peak_bytes': peak, 'output_bytes': written,
+                    }
+                    results['runs'].append(row)
+                    self.stdout.write(
+                        f"  {size:>8} líneas {name:10} {elapsed:>7.2f}s  {row['lines_per_second']:>8} líneas/s  "
+                        f"memoria pico={peak / 2 ** 20:>7.1f} MiB  salida={written / 2 ** 20:.1f} MiB"
+                    )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
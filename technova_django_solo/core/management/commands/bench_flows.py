@@ -0,0 +1,157 @@
+"""
+Benchmark de flujos completos: portada, categoría, detalle, búsqueda, carrito y checkout
+Uso: python manage.py bench_flows --products 10000 --requests 200 --mode inprocess,gunicorn --output flows.json
+"""
+
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmarks import (
+    PLAIN_STATIC, WORDS, BRANDS, HTTPRunner, InProcessRunner, Scenario, benchmark_database, git_revision,
+    gunicorn_server, run_scenario, seed_fixture, write_results,
+)
+from products.models import Category, Product
+
+SEARCH_TERMS = [brand.lower() for brand in BRANDS] + WORDS[:10] + ['portatil ligero', 'audifonos inalambrico']
+
+
+def _product_url(product):
+    category_slug, slug = product
+    return reverse('products:detail', args=[category_slug, slug])
+
+
+def _add_to_cart(rng, data):
+    _, slug = rng.choice(data['products'])
+    return 'POST', reverse('orders:add_to_cart', args=[slug]), {'quantity': 1}
+
+
+def _fill_cart(runner, rng, data):
+    runner.request(*_add_to_cart(rng, data))
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario('home', lambda rng, data: ('GET', reverse('core:home'), None)),
+        Scenario('category', lambda rng, data: ('GET', reverse('products:category', args=[rng.choice(data['categories'])]), None)),
+        Scenario('detail', lambda rng, data: ('GET', _product_url(rng.choice(data['products'])), None)),
+        Scenario('search', lambda rng, data: ('GET', reverse('products:search'), {'q': rng.choice(SEARCH_TERMS)})),
+        Scenario('add_to_cart', _add_to_cart, login=True),
+        Scenario('checkout', lambda rng, data: ('POST', reverse('orders:checkout_confirm'), {
+            'email': 'bench@example.com', 'phone': '5555555555', 'payment_method': 'credit_card',
+            'shipping_address': 'Calle 1', 'shipping_city': 'Ciudad', 'shipping_postal': '00000',
+            'same_as_shipping': 'on',
+        }), login=True, setup=_fill_cart),
+    ]
+}
+
+
+class Command(BaseCommand):
+    help = 'Genera un catálogo sintético y mide los flujos principales en proceso y sobre gunicorn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones medidas por escenario')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+        parser.add_argument('--mode', default='inprocess', help="'inprocess', 'gunicorn' o ambos separados por coma")
+        parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn')
+        parser.add_argument('--threads', type=int, default=1, help='Hilos por worker de gunicorn')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+        parser.add_argument('--compare', help='JSON de una ejecución anterior para comparar')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+        modes = [mode.strip() for mode in options['mode'].split(',') if mode.strip()]
+
+        results = {
+            'revision': git_revision(),
+            'timestamp': timezone.now().isoformat(),
+            'options': {key: options[key] for key in ('categories', 'products', 'users', 'orders', 'requests', 'concurrency', 'workers', 'threads')},
+            'modes': {},
+        }
+
+        with tempfile.TemporaryDirectory() as workdir:
+            # Base en archivo para que los workers de gunicorn vean los mismos datos
+            with benchmark_database(test_name=Path(workdir) / 'bench.sqlite3'):
+                start = time.perf_counter()
+                results['fixture'] = seed_fixture(
+                    categories=options['categories'], products=options['products'],
+                    users=options['users'], orders=options['orders'],
+                )
+                self.stdout.write(f"Datos generados en {time.perf_counter() - start:.1f}s: {results['fixture']}")
+                data = self.scenario_data()
+
+                with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost', '127.0.0.1'], STATICFILES_STORAGE=PLAIN_STATIC):
+                    for mode in modes:
+                        if mode == 'inprocess':
+                            factory = InProcessRunner
+                            results['modes'][mode] = self.run_mode(mode, names, factory, data, options)
+                        elif mode == 'gunicorn':
+                            database = connection.settings_dict['NAME']
+                            with gunicorn_server(database, workers=options['workers'], threads=options['threads']) as url:
+                                factory = lambda user: HTTPRunner(url, user)  # noqa: E731
+                                results['modes'][mode] = self.run_mode(mode, names, factory, data, options)
+                        else:
+                            raise CommandError(f'Modo desconocido: {mode}')
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def scenario_data(self):
+        from django.contrib.auth import get_user_model
+
+        categories = list(
+            Category.objects.filter(products__isnull=False, is_active=True).values_list('slug', flat=True).distinct()
+        )
+        products = list(Product.objects.select_related('category').order_by('?').values_list('category__slug', 'slug')[:1000])
+        users = list(get_user_model().objects.filter(username__startswith='bench'))
+        return {'categories': categories, 'products': products, 'users': users}
+
+    def run_mode(self, mode, names, factory, data, options):
+        self.stdout.write(f'\n[{mode}]')
+        rows = {}
+        for name in names:
+            scenario = SCENARIOS[name]
+            if options['warmup']:
+                run_scenario(scenario, factory, options['warmup'], data=data, seed=0)
+            row = run_scenario(scenario, factory, options['requests'], options['concurrency'], data=data)
+            rows[name] = row
+            self.stdout.write(
+                f"  {name:12} p50={row['p50_ms']:>8.2f}ms p95={row['p95_ms']:>8.2f}ms p99={row['p99_ms']:>8.2f}ms "
+                f"{row['throughput_rps']:>8.1f} req/s  consultas={row['queries_mean']}  errores={row['errors']}"
+            )
+        return rows
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        self.stdout.write(f"\nComparación con {path} ({baseline.get('revision')})")
+        for mode, rows in results['modes'].items():
+            for name, row in rows.items():
+                old = baseline.get('modes', {}).get(mode, {}).get(name)
+                if not old:
+                    continue
+                deltas = []
+                for key in ('p50_ms', 'p95_ms', 'queries_mean'):
+                    if old.get(key) and row.get(key) is not None:
+                        deltas.append(f'{key} {100 * (row[key] - old[key]) / old[key]:+.1f}%')
+                self.stdout.write(f"  {mode}/{name:12} {'  '.join(deltas)}")
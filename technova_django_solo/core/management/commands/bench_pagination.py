@@ -0,0 +1,59 @@
+"""
+Benchmark de paginación: OFFSET + COUNT(*) frente a cursor (keyset)
+Uso: python manage.py bench_pagination --size 100000 --pages 1,10,100,1000,5000
+"""
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from core.benchmarks import benchmark_database, parse_sizes, seed_products, timed, write_results
+from core.stats import summarize
+from core.pagination import CursorPaginator, encode_cursor
+from products.models import Product
+
+ORDERINGS = ['-created_at', 'price', 'name', 'average_rating']
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia por profundidad de página con Paginator y con CursorPaginator'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--per-page', type=int, default=12)
+        parser.add_argument('--pages', default='1,10,100,1000,5000')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        results = []
+        with benchmark_database():
+            seed_products(options['size'])
+            queryset = Product.objects.filter(status='active')
+            for ordering in ORDERINGS:
+                self.stdout.write(f'\norden {ordering}')
+                cursor_paginator = CursorPaginator(queryset, per_page, ordering)
+                for page in parse_sizes(options['pages']):
+                    offset = (page - 1) * per_page
+                    anchor = queryset.order_by(*cursor_paginator._ordering(False))[offset - 1:offset].first() if offset else None
+                    if offset and anchor is None:
+                        continue
+                    token = encode_cursor(cursor_paginator._values(anchor)) if anchor else None
+
+                    offset_stats = summarize(timed(
+                        lambda: list(Paginator(queryset.order_by(ordering, 'id'), per_page).page(page)),
+                        options['repeat'],
+                    ))
+                    cursor_stats = summarize(timed(
+                        lambda: list(cursor_paginator.get_page(token)),
+                        options['repeat'],
+                    ))
+                    results.append({'ordering': ordering, 'page': page, 'offset': offset_stats, 'cursor': cursor_stats})
+                    self.stdout.write(
+                        f"  página {page:>6}: offset p50={offset_stats['p50_ms']:>8.2f}ms  "
+                        f"cursor p50={cursor_stats['p50_ms']:>8.2f}ms"
+                    )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
@@ -0,0 +1,37 @@
+"""
+Exportar pedidos, productos o suscriptores en streaming
+Uso: python manage.py export_data orders --format jsonl --output pedidos.jsonl [--chunk-size 2000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.exports import EXPORTS, FORMATS, get_export, render
+
+
+class Command(BaseCommand):
+    help = 'Escribe la tabla completa en CSV o JSONL sin cargarla en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='Archivo de salida (por defecto, la salida estándar)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        export = get_export(options['name'])
+        export.chunk_size = options['chunk_size']
+        start = time.perf_counter()
+        chunks = render(export, fmt=options['format'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        written = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"{options['output']}: {written / 2 ** 20:.1f} MiB en {elapsed:.2f}s"))
@@ -0,0 +1,35 @@
+"""
+Worker de la bandeja de correos
+Uso: python manage.py send_outbox [--workers 4] [--batch-size 50] [--loop --interval 5]
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes de la bandeja de salida por lotes, con reintentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Hilos de envío (cada uno con su conexión SMTP)')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50))
+        parser.add_argument('--loop', action='store_true', help='Seguir esperando correos nuevos')
+        parser.add_argument('--interval', type=float, default=5.0, help='Segundos entre revisiones con --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            results = process_outbox(workers=options['workers'], batch_size=options['batch_size'])
+            if results or not options['loop']:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"enviados={results.get('sent', 0)} reintentos={results.get('retried', 0)} "
+                    f"fallidos={results.get('failed', 0)} en {elapsed:.2f}s"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -4,6 +4,7 @@ Modelos para funcionalidades centrales del sistema
 """
 
 from django.db import models
+from django.utils import timezone
 
 
 class Address(models.Model):
@@ -90,4 +91,38 @@ class ContactMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.name} - {self.get_subject_display()}"
\ No newline at end of file
+        return f"{self.name} - {self.get_subject_display()}"
+
+class OutgoingEmail(models.Model):
+    """Bandeja de salida: correos pendientes de envío por el worker (ver core.outbox)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    content_subtype = models.CharField(max_length=10, default='plain')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        verbose_name = 'Correo saliente'
+        verbose_name_plural = 'Correos salientes'
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
@@ -0,0 +1,182 @@
+"""
+Bandeja de salida de correos
+Las vistas sólo encolan; un worker (comando send_outbox o tarea Celery) envía por lotes con una conexión SMTP reutilizada
+"""
+
+import logging
+import random
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger('technova.outbox')
+
+UPDATE_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'claim_token', 'claimed_at']
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_email(subject, body, to, from_email=None, html=False):
+    """Guardar el correo en la bandeja; se envía después del commit"""
+    email = OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        content_subtype='html' if html else 'plain',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+    transaction.on_commit(notify_worker)
+    return email
+
+
+def enqueue_template(subject, template_name, context, to, **kwargs):
+    """Renderizar una plantilla HTML y encolarla"""
+    return enqueue_email(subject, render_to_string(template_name, context), to, html=True, **kwargs)
+
+
+def notify_worker():
+    """Despertar a Celery si está activado; si no, el comando send_outbox lo recogerá"""
+    if not _setting('EMAIL_OUTBOX_CELERY', False):
+        return
+    from .tasks import send_outbox_task
+    if send_outbox_task is None:
+        return
+    try:
+        send_outbox_task.delay()
+    except Exception:
+        # Sin broker el correo sigue en la bandeja: no debe romper la petición
+        logger.warning('No se pudo encolar la tarea de envío; queda para el worker', exc_info=True)
+
+
+def retry_delay(attempts):
+    """Espera exponencial con jitter para el intento número ``attempts``"""
+    base = _setting('EMAIL_OUTBOX_RETRY_DELAY', 30)
+    delay = min(base * 2 ** (attempts - 1), _setting('EMAIL_OUTBOX_MAX_RETRY_DELAY', 3600))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(limit):
+    """Reservar hasta ``limit`` correos vencidos para este worker
+
+    El UPDATE repite la condición de elegibilidad: si otro worker reservó una
+    fila entre la lectura y la escritura, no se actualiza y no se envía dos
+    veces. Las reservas abandonadas (worker caído) se recuperan tras el lease.
+    """
+    now = timezone.now()
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(
+        status='sending', claimed_at__lt=now - timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE', 300)),
+    )
+    ids = list(OutgoingEmail.objects.filter(due).order_by('next_attempt_at', 'id').values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    OutgoingEmail.objects.filter(due, pk__in=ids).update(status='sending', claim_token=token, claimed_at=now)
+    return list(OutgoingEmail.objects.filter(claim_token=token).order_by('pk'))
+
+
+def _message(email, connection):
+    message = EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    message.content_subtype = email.content_subtype
+    return message
+
+
+def _mark_sent(email):
+    email.status = 'sent'
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.claim_token = email.claimed_at = None
+
+
+def _mark_failed(email, exc):
+    email.attempts += 1
+    email.last_error = f'{type(exc).__name__}: {exc}'
+    email.claim_token = email.claimed_at = None
+    if email.attempts >= _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 6):
+        email.status = 'failed'
+        logger.error('Correo %s descartado tras %s intentos: %s', email.pk, email.attempts, email.last_error)
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_batch(emails, connection=None):
+    """Enviar un lote reservado abriendo una sola conexión y guardar el resultado en un UPDATE"""
+    connection = connection or get_connection()
+    results = Counter()
+    pending = list(emails)
+    try:
+        connection.open()
+        while pending:
+            email = pending.pop(0)
+            try:
+                connection.send_messages([_message(email, connection)])
+            except Exception as exc:
+                _mark_failed(email, exc)
+                # Tras un error SMTP la sesión puede quedar inservible: abrir una nueva
+                connection.close()
+                connection.open()
+            else:
+                _mark_sent(email)
+    except Exception as exc:
+        # No se pudo (re)conectar: el resto del lote se reprograma
+        for email in pending:
+            _mark_failed(email, exc)
+    finally:
+        connection.close()
+
+    for email in emails:
+        results['sent' if email.status == 'sent' else 'failed' if email.status == 'failed' else 'retried'] += 1
+    OutgoingEmail.objects.bulk_update(emails, UPDATE_FIELDS)
+    return results
+
+
+def drain(batch_size=None, max_batches=None):
+    """Enviar lotes hasta vaciar la bandeja (o alcanzar ``max_batches``)"""
+    batch_size = batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    results = Counter()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim_batch(batch_size)
+        if not emails:
+            break
+        results.update(send_batch(emails))
+        batches += 1
+    return results
+
+
+def _drain_in_thread(batch_size, max_batches):
+    try:
+        return drain(batch_size, max_batches)
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            db_connection.close()
+
+
+def process_outbox(workers=1, batch_size=None, max_batches=None):
+    """Vaciar la bandeja con ``workers`` hilos, cada uno con su conexión SMTP y de BD"""
+    if workers <= 1:
+        return dict(drain(batch_size, max_batches))
+    results = Counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox') as pool:
+        for partial in pool.map(_drain_in_thread, [batch_size] * workers, [max_batches] * workers):
+            results.update(partial)
+    return dict(results)
@@ -0,0 +1,128 @@
+"""
+Cache de página completa para visitantes anónimos
+HTML del catálogo cacheado por URL e idioma bajo la versión del catálogo; carrito, mensajes y CSRF llegan aparte
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response
+
+from .cache import get_catalog_version
+
+# Cabeceras de la respuesta original que se guardan con el HTML (nunca Set-Cookie)
+STORED_HEADERS = ('Content-Type', 'ETag', 'Cache-Control', 'Vary')
+EVENTS = ('hit', 'miss', 'bypass')
+
+# Nombres de las páginas decoradas, para el endpoint de métricas
+PAGES = set()
+
+
+def _stats_key(name, event):
+    return f'page_cache_stats:{name}:{event}'
+
+
+def record(name, event):
+    """Contador compartido entre procesos"""
+    key = _stats_key(name, event)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def page_cache_stats():
+    """Aciertos, fallos y peticiones no cacheables por página"""
+    pages = {}
+    for name in sorted(PAGES):
+        counts = cache.get_many([_stats_key(name, event) for event in EVENTS])
+        row = {event: counts.get(_stats_key(name, event), 0) for event in EVENTS}
+        served = row['hit'] + row['miss']
+        row['hit_ratio'] = round(row['hit'] / served, 3) if served else None
+        pages[name] = row
+    return pages
+
+
+def reset_page_cache_stats():
+    cache.delete_many([_stats_key(name, event) for name in PAGES for event in EVENTS])
+
+
+def is_anonymous(request):
+    """Visitante sin sesión iniciada, sin cargar el usuario
+
+    Sin cookie de sesión no se toca nada; con ella sólo se leen los datos de
+    la sesión (del cache con el motor cached_db).
+    """
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return SESSION_KEY not in request.session
+
+
+def page_key(name, request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{name}:{get_catalog_version()}:{translation.get_language()}:{path}'
+
+
+def _cached_response(request, entry):
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response = get_conditional_response(request, etag=response.get('ETag'), response=response)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def anonymous_page(name):
+    """Servir la página desde el cache a visitantes anónimos
+
+    La página se renderiza con ``request.defer_user_fragments`` activo: la
+    plantilla base omite el contador del carrito y los mensajes, que el
+    navegador pide a ``core:user_fragments`` junto con su token CSRF. La clave
+    incluye la versión del catálogo, así que guardar o borrar un producto o
+    una categoría (señales de products) invalida todas las páginas; los
+    cambios de stock por update() se ven al expirar PAGE_CACHE_TIMEOUT.
+    """
+    PAGES.add(name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                not getattr(settings, 'PAGE_CACHE_ENABLED', True)
+                or request.method not in ('GET', 'HEAD')
+                or not is_anonymous(request)
+            ):
+                record(name, 'bypass')
+                return view(request, *args, **kwargs)
+
+            key = page_key(name, request)
+            entry = cache.get(key)
+            if entry is not None:
+                record(name, 'hit')
+                return _cached_response(request, entry)
+
+            record(name, 'miss')
+            request.defer_user_fragments = True
+            response = view(request, *args, **kwargs)
+            if request.method == 'GET' and response.status_code == 200 and not response.streaming:
+                headers = {header: response[header] for header in STORED_HEADERS if response.has_header(header)}
+                cache.set(key, {'content': response.content, 'headers': headers}, getattr(settings, 'PAGE_CACHE_TIMEOUT', 300))
+            response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+@staff_member_required
+def stats_view(request):
+    """Métricas del cache de páginas (sólo personal)"""
+    if request.method == 'POST' and request.POST.get('reset'):
+        reset_page_cache_stats()
+    return JsonResponse({'timeout': getattr(settings, 'PAGE_CACHE_TIMEOUT', 300), 'pages': page_cache_stats()})
@@ -0,0 +1,254 @@
+"""
+Paginación por cursor (keyset) para los listados
+Evita COUNT(*) y OFFSET: cada página se obtiene con un filtro sobre la clave de orden
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from collections.abc import Sequence
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+COUNT_CAP = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, backwards=False):
+    """Token opaco con los valores de la clave de orden"""
+    payload = json.dumps([[_serialize(v) for v in values], 'p' if backwards else 'n'], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values, direction = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list) or direction not in ('n', 'p'):
+        raise InvalidCursor(token)
+    return values, direction == 'p'
+
+
+def estimated_count(queryset, cap=COUNT_CAP):
+    """Conteo aproximado y barato
+
+    En PostgreSQL se usa la estimación del planificador; en el resto se
+    cuenta como máximo ``cap + 1`` filas. Devuelve (conteo, es_aproximado).
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+    count = queryset[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+class CursorPage(Sequence):
+    """Página de resultados compatible con el uso habitual de ``Page`` en plantillas"""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_querystring = ''
+        self.previous_querystring = ''
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f'<CursorPage ({len(self)} elementos)>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginador keyset sobre un campo de orden más ``id`` como desempate
+
+    ``ordering`` acepta un campo concreto del modelo con o sin ``-``
+    (``-created_at``, ``price``, ``name``, ``average_rating``...) o una
+    anotación del queryset que no sea un agregado (``search_rank``); su valor
+    viaja en el cursor como el de cualquier campo.
+    ``count_mode`` puede ser None (sin conteo), ``'exact'`` o ``'approx'``.
+    """
+
+    def __init__(self, queryset, per_page, ordering='-created_at', count_mode=None, count_cap=COUNT_CAP):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.count_mode = count_mode
+        self.count_cap = count_cap
+
+        name = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        # Pares (nombre en la consulta, campo para convertir el valor del cursor)
+        self.keys = [self._key(queryset, name)]
+        if self.keys[0][0] != 'id':
+            self.keys.append(self._key(queryset, 'id'))
+        self.descending = descending
+
+    @staticmethod
+    def _key(queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return name, annotation.output_field
+        field = queryset.model._meta.get_field(name)
+        return field.attname, field
+
+    @staticmethod
+    def supports(queryset, ordering):
+        name = ordering.lstrip('-')
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return not annotation.contains_aggregate
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return field.concrete and not field.is_relation
+
+    def _ordering(self, backwards):
+        descending = self.descending != backwards
+        return [f"{'-' if descending else ''}{name}" for name, _ in self.keys]
+
+    def _after(self, values, backwards):
+        """Condición lexicográfica (a, id) > (va, vid) en el sentido del recorrido
+
+        Se añade la cota ``a >= va`` para que la base de datos pueda recorrer
+        el índice por rango en lugar de evaluar el OR fila a fila.
+        """
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        condition = Q()
+        equal = {}
+        for (name, _), value in zip(self.keys, values):
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        first = self.keys[0][0]
+        return Q(**{f'{first}__{lookup}e': values[0]}) & condition
+
+    def _values(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def _parse(self, token):
+        values, backwards = decode_cursor(token)
+        if len(values) != len(self.keys):
+            raise InvalidCursor(token)
+        try:
+            return [field.to_python(value) for (_, field), value in zip(self.keys, values)], backwards
+        except ValidationError:
+            raise InvalidCursor(token)
+
+    def get_page(self, cursor=None):
+        """Página a partir de un cursor; un cursor inválido devuelve la primera página"""
+        values, backwards = None, False
+        if cursor:
+            try:
+                values, backwards = self._parse(cursor)
+            except InvalidCursor:
+                values = None
+
+        queryset = self.queryset.order_by(*self._ordering(backwards))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=encode_cursor(self._values(rows[-1])) if has_next and rows else None,
+            previous_cursor=encode_cursor(self._values(rows[0]), backwards=True) if has_previous and rows else None,
+        )
+
+    @cached_property
+    def _count(self):
+        if self.count_mode == 'exact':
+            return self.queryset.count(), False
+        if self.count_mode == 'approx':
+            return estimated_count(self.queryset, self.count_cap)
+        return None, False
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_is_approximate(self):
+        return self._count[1]
+
+
+def paginate(request, queryset, per_page, ordering):
+    """Paginar un listado según settings.LISTING_PAGINATION ('cursor' u 'offset')
+
+    Si el orden no es un campo concreto ni una anotación del queryset se usa el
+    ``Paginator`` clásico sobre el queryset ya ordenado. El conteo de
+    LISTING_COUNT_MODE sólo se calcula en la primera página: las siguientes
+    (las que recorren los rastreadores) cuestan una sola consulta.
+    """
+    params = request.GET.copy()
+    mode = getattr(settings, 'LISTING_PAGINATION', 'cursor')
+    if mode != 'cursor' or not CursorPaginator.supports(queryset, ordering):
+        page = Paginator(queryset, per_page).get_page(request.GET.get('page'))
+        # Filtros y búsqueda de la URL que conservan los enlaces ?page=N
+        params.pop('page', None)
+        params.pop('cursor', None)
+        page.querystring = params.urlencode()
+        return page
+
+    cursor = request.GET.get('cursor')
+    paginator = CursorPaginator(
+        queryset, per_page, ordering,
+        count_mode=None if cursor else getattr(settings, 'LISTING_COUNT_MODE', None),
+    )
+    page = paginator.get_page(cursor)
+
+    params.pop('page', None)
+    for attr, token in (('next_querystring', page.next_cursor), ('previous_querystring', page.previous_cursor)):
+        if token:
+            params['cursor'] = token
+            setattr(page, attr, params.urlencode())
+    return page
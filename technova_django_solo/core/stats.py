@@ -0,0 +1,24 @@
+"""
+Estadísticas de latencia
+Percentiles y media en milisegundos, compartidos por los benchmarks y la instrumentación de peticiones
+"""
+
+import statistics
+
+
+def summarize(samples):
+    """Percentiles y media en milisegundos"""
+    ordered = sorted(samples)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ordered[0]
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
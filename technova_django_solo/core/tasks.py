@@ -0,0 +1,19 @@
+"""
+Tareas Celery de core
+Opcionales: si Celery no está instalado, el comando send_outbox hace el mismo trabajo
+"""
+
+try:
+    from celery import shared_task
+except ImportError:
+    shared_task = None
+
+from .outbox import process_outbox
+
+send_outbox_task = None
+
+if shared_task is not None:
+    @shared_task(name='core.send_outbox', ignore_result=True)
+    def send_outbox_task(batch_size=None):
+        """Vaciar la bandeja de correos"""
+        return process_outbox(batch_size=batch_size)
@@ -0,0 +1,22 @@
+"""
+Ejecución de los tests de TechNova Solutions
+Cache local en memoria y estáticos sin manifiesto para toda la suite, sin Redis ni collectstatic
+"""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .benchmarks import LOCMEM_CACHES, PLAIN_STATIC
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner con la configuración de pruebas aplicada a todos los TestCase"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(CACHES=LOCMEM_CACHES, STATICFILES_STORAGE=PLAIN_STATIC)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,460 @@
+import csv
+import json
+import smtplib
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.checkout import place_order
+from newsletter.models import Subscriber
+from orders.models import Cart, CartItem, Order, OrderItem
+from products.models import Category, Product, Review
+from . import views
+from .cache import get_or_build
+from .exports import buffered, get_export, render
+from .models import OutgoingEmail
+from .outbox import claim_batch, enqueue_email, process_outbox
+from .instrumentation import QueryBudgetExceeded, QueryBudgetTestMixin, fingerprint, stats
+from .pagination import CursorPaginator, decode_cursor, encode_cursor
+
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.get(slug='tablets')
+        # Precios repetidos para forzar el desempate por id
+        Product.objects.bulk_create([
+            Product(name=f'Tableta {i:02d}', slug=f'tableta-{i}', description='', category=category,
+                    price=Decimal(100 + (i % 4) * 10))
+            for i in range(23)
+        ])
+
+    def walk(self, ordering, per_page=5):
+        paginator = CursorPaginator(Product.objects.all(), per_page, ordering)
+        page = paginator.get_page()
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return paginator, pages
+
+    def test_forward_walk_matches_offset_ordering(self):
+        for ordering in ['-created_at', 'price', '-price', 'name', 'average_rating']:
+            _, pages = self.walk(ordering)
+            ids = [p.id for page in pages for p in page]
+            expected = list(Product.objects.order_by(ordering, ('-' if ordering.startswith('-') else '') + 'id')
+                            .values_list('id', flat=True))
+            self.assertEqual(ids, expected, ordering)
+            self.assertFalse(pages[0].has_previous())
+
+    def test_backward_walk(self):
+        paginator, pages = self.walk('price')
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual([p.id for p in page], [p.id for p in expected])
+        self.assertFalse(page.has_previous())
+
+    def test_one_query_per_page_and_invalid_cursor(self):
+        paginator = CursorPaginator(Product.objects.all(), 5, 'price')
+        with self.assertNumQueries(1):
+            page = paginator.get_page('no-es-un-cursor')
+        self.assertEqual(len(page), 5)
+        self.assertEqual(decode_cursor(encode_cursor(['100.00', 3], backwards=True)), (['100.00', 3], True))
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class HomeSectionCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='smartphones')
+        for i in range(3):
+            Product.objects.create(
+                name=f'Teléfono {i}', slug=f'telefono-{i}', description='', category=cls.category,
+                price=Decimal('200.00'), compare_at_price=Decimal('250.00'), average_rating=Decimal('4.5'),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_steady_state_home_runs_no_queries(self):
+        self.assertEqual(self.client.get(reverse('core:home')).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('core:home'))
+        self.assertEqual(len(response.context['featured_products']), 3)
+        self.assertContains(response, '/telefono-0/')
+
+    def test_product_save_invalidates_sections(self):
+        self.client.get(reverse('core:home'))
+        Product.objects.create(name='Teléfono nuevo', slug='telefono-nuevo', description='', category=self.category, price=1)
+        response = self.client.get(reverse('core:home'))
+        self.assertEqual(response.context['featured_products'][0].slug, 'telefono-nuevo')
+
+    def test_waiters_do_not_rebuild_while_locked(self):
+        builder = mock.Mock(return_value='valor')
+        cache.add('clave:lock', 1)
+        cache.set('clave', 'construido por otro')
+        self.assertEqual(get_or_build('clave', builder), 'construido por otro')
+        cache.delete('clave')
+        # El dueño del candado no termina a tiempo: se calcula localmente
+        self.assertEqual(get_or_build('clave', builder, wait=0.1), 'valor')
+        builder.assert_called_once()
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.product = Product.objects.create(
+            name='Laptop ETag', slug='laptop-etag', description='', category=cls.category, price=900, stock_quantity=5,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('core:home'),
+            reverse('products:category', args=['laptops']),
+            reverse('products:detail', args=['laptops', 'laptop-etag']),
+        ]
+
+    def test_unchanged_page_returns_304(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertIn('ETag', response)
+            self.assertIn('max-age=0', response['Cache-Control'])
+            self.assertIn('private', response['Cache-Control'])
+            self.assertIn('Cookie', response['Vary'])
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(again.status_code, 304)
+
+    def test_etag_changes_with_catalog_stock_and_cart(self):
+        url = self.urls[2]
+        etags = [self.client.get(url)['ETag']]
+        # update() no dispara señales: el stock se lee en la consulta del ETag
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=4)
+        etags.append(self.client.get(url)['ETag'])
+        Product.objects.get(pk=self.product.pk).save()
+        etags.append(self.client.get(url)['ETag'])
+        self.client.post(reverse('orders:add_to_cart', args=['laptop-etag']), {'quantity': 1})
+        self.client.get(reverse('orders:cart'))
+        etags.append(self.client.get(url)['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_pending_messages_skip_etag(self):
+        self.client.post(reverse('orders:add_to_cart', args=['laptop-etag']), {'quantity': 0})
+        response = self.client.get(self.urls[2])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_missing_product_is_404(self):
+        self.assertEqual(self.client.get(reverse('products:detail', args=['laptops', 'no-existe'])).status_code, 404)
+
+
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.product = Product.objects.create(
+            name='Laptop Cache', slug='laptop-cache', description='', category=cls.category, price=900, stock_quantity=5,
+        )
+        cls.user = User.objects.create_user(username='pagecache', email='pc@example.com', password='x')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('products:detail', args=['laptops', 'laptop-cache'])
+
+    def test_anonymous_hit_runs_no_queries(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Laptop Cache')
+        self.assertContains(response, 'id="user-messages"')
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_cached_html_carries_no_csrf_token(self):
+        first = Client()
+        miss = first.get(self.url)
+        self.assertNotIn('csrftoken', miss.cookies)
+        hit = Client().get(self.url)
+        self.assertEqual(hit['X-Page-Cache'], 'hit')
+        for response in (miss, hit):
+            self.assertContains(response, reverse('orders:add_to_cart', args=['laptop-cache']))
+            self.assertNotContains(response, 'name="csrfmiddlewaretoken" value=')
+        # El token llega por el endpoint de fragmentos, con su cookie
+        fragments = first.get(reverse('core:user_fragments'))
+        self.assertTrue(fragments.json()['csrf_token'])
+        self.assertIn('csrftoken', fragments.cookies)
+
+    def test_product_save_invalidates(self):
+        self.client.get(self.url)
+        self.product.name = 'Laptop Renombrada'
+        self.product.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Laptop Renombrada')
+
+    def test_cart_and_messages_come_from_fragment_endpoint(self):
+        self.client.post(reverse('orders:add_to_cart', args=['laptop-cache']), {'quantity': 2})
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        data = self.client.get(reverse('core:user_fragments')).json()
+        self.assertEqual(data['cart_count'], 2)
+        self.assertEqual([message['text'] for message in data['messages']], ['Laptop Cache agregado al carrito'])
+        self.assertTrue(data['csrf_token'])
+        # Los mensajes se consumen una sola vez
+        self.assertEqual(self.client.get(reverse('core:user_fragments')).json()['messages'], [])
+
+    def test_authenticated_users_bypass_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertNotContains(response, 'id="user-messages"')
+
+    def test_stats_endpoint(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        staff = User.objects.create_user(username='pcstaff', email='pcs@example.com', password='x', is_staff=True)
+        self.client.force_login(staff)
+        pages = self.client.get(reverse('core:page_cache_stats')).json()['pages']
+        self.assertEqual((pages['detail']['hit'], pages['detail']['miss']), (1, 1))
+        self.assertEqual(pages['detail']['hit_ratio'], 0.5)
+
+
+@override_settings(REQUEST_INSTRUMENTATION=True)
+class RequestInstrumentationTests(TestCase):
+
+    def setUp(self):
+        stats.reset()
+
+    def test_headers_and_stats(self):
+        response = self.client.get(reverse('core:contact'))
+        for header in ('X-Query-Count', 'X-Query-Duplicates', 'X-DB-Time-ms', 'X-Template-Time-ms', 'Server-Timing'):
+            self.assertIn(header, response)
+        self.assertGreater(float(response['X-Template-Time-ms']), 0)
+        self.assertEqual(stats.snapshot()['core:contact']['requests'], 1)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT *  FROM t WHERE id IN (%s)'),
+        )
+
+    def test_budget_is_enforced_in_strict_mode(self):
+        with override_settings(QUERY_BUDGET_STRICT=True), mock.patch.object(views.contact, 'query_budget', -1):
+            with self.assertRaises(QueryBudgetExceeded), self.assertLogs('django.request', 'ERROR'):
+                self.client.get(reverse('core:contact'))
+
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse('core:request_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create_user(username='staff', email='s@example.com', password='x', is_staff=True)
+        self.client.force_login(staff)
+        self.assertIn('views', self.client.get(url).json())
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Las vistas principales no deben superar su presupuesto con datos realistas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.get(slug='laptops')
+        cls.user = User.objects.create_user(username='budget', email='b@example.com', password='x')
+        reviewers = [User.objects.create_user(username=f'r{i}', email=f'r{i}@example.com', password='x') for i in range(5)]
+        products = [
+            Product.objects.create(
+                name=f'Laptop {i}', slug=f'laptop-{i}', description='Laptop', category=category,
+                price=Decimal(500 + i), compare_at_price=Decimal(900), stock_quantity=50,
+            )
+            for i in range(12)
+        ]
+        for reviewer in reviewers:
+            Review.objects.create(product=products[0], user=reviewer, rating=5, comment='ok', is_approved=True)
+        for _ in range(2):
+            cart = Cart.objects.create(user=cls.user)
+            for product in products[:5]:
+                CartItem.objects.create(cart=cart, product=product, quantity=1)
+            cls.order = place_order(cart, cart.items.select_related('product'),
+                                    user=cls.user, email='b@example.com', phone='1', payment_method='paypal')
+            cart.delete()
+        cart = Cart.objects.create(user=cls.user)
+        for product in products[:5]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    def catalog_urls(self):
+        return [
+            reverse('core:home'),
+            reverse('core:contact'),
+            reverse('products:category', args=['laptops']),
+            reverse('products:detail', args=['laptops', 'laptop-0']),
+            reverse('products:search') + '?q=laptop',
+            reverse('products:all'),
+            reverse('products:sale'),
+        ]
+
+    def test_anonymous_pages(self):
+        for url in self.catalog_urls():
+            self.assertWithinQueryBudget(url)
+
+    def test_authenticated_pages(self):
+        self.client.force_login(self.user)
+        urls = self.catalog_urls() + [
+            reverse('orders:cart'),
+            reverse('orders:checkout'),
+            reverse('orders:orders'),
+            reverse('orders:order_detail', args=[self.order.order_number]),
+            reverse('orders:wishlist'),
+        ]
+        for url in urls:
+            self.assertWithinQueryBudget(url)
+
+
+class FlakyBackend(LocmemBackend):
+    """Backend de prueba que cuenta conexiones y rechaza ciertos destinatarios"""
+    opened = 0
+    refused = set()
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.refused:
+                raise smtplib.SMTPRecipientsRefused({address: (550, b'no') for address in message.to})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.FlakyBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_BATCH_SIZE=10)
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        FlakyBackend.opened = 0
+        FlakyBackend.refused = set()
+
+    def test_register_only_enqueues(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('users:register'), {
+                'username': 'nuevo', 'email': 'nuevo@example.com', 'first_name': 'Ana', 'last_name': 'Ruiz',
+                'password': 'secreta123', 'confirm_password': 'secreta123',
+            })
+        self.assertRedirects(response, reverse('users:registration_success'), fetch_redirect_response=False)
+        self.assertEqual(mail.outbox, [])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.to, email.content_subtype), ('pending', ['nuevo@example.com'], 'html'))
+
+        user = User.objects.get(username='nuevo')
+        self.assertIn(reverse('users:verify', args=[user.verificationtoken.token]), email.body)
+        self.assertEqual(process_outbox(), {'sent': 1})
+        self.assertEqual(mail.outbox[0].to, ['nuevo@example.com'])
+
+        # Reenviar renueva el token en lugar de chocar con el existente
+        old_token = user.verificationtoken.token
+        self.client.post(reverse('users:resend_verification'), {'email': 'nuevo@example.com'})
+        user.verificationtoken.refresh_from_db()
+        self.assertNotEqual(user.verificationtoken.token, old_token)
+        self.assertEqual(OutgoingEmail.objects.filter(status='pending').count(), 1)
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(5):
+            enqueue_email('Hola', 'cuerpo', [f'c{i}@example.com'])
+        # Reserva (3), un solo UPDATE de resultados y la reserva vacía final
+        with self.assertNumQueries(5):
+            self.assertEqual(process_outbox(), {'sent': 5})
+        self.assertEqual(FlakyBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(OutgoingEmail.objects.exclude(status='sent').exists())
+
+    def test_failures_back_off_then_give_up(self):
+        FlakyBackend.refused = {'malo@example.com'}
+        enqueue_email('Hola', 'cuerpo', ['malo@example.com'])
+        enqueue_email('Hola', 'cuerpo', ['bueno@example.com'])
+
+        self.assertEqual(process_outbox(), {'retried': 1, 'sent': 1})
+        failed = OutgoingEmail.objects.get(to=['malo@example.com'])
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('SMTPRecipientsRefused', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        # Aún no vence: no se reintenta
+        self.assertEqual(process_outbox(), {})
+
+        OutgoingEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('technova.outbox', 'ERROR'):
+            self.assertEqual(process_outbox(), {'failed': 1})
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('failed', 2))
+
+    def test_abandoned_claims_are_recovered(self):
+        email = enqueue_email('Hola', 'cuerpo', ['c@example.com'])
+        self.assertEqual(claim_batch(10), [email])
+        # Otro worker no puede tomar una reserva vigente
+        self.assertEqual(claim_batch(10), [])
+        OutgoingEmail.objects.filter(pk=email.pk).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim_batch(10), [email])
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser(username='admin', email='admin@example.com', password='x')
+        category = Category.objects.get(slug='laptops')
+        cls.products = [
+            Product.objects.create(category=category, name=f'Laptop {i}', slug=f'laptop-{i}', sku=f'LP-{i}', description='', price=Decimal('10.00'))
+            for i in range(2)
+        ]
+        cls.orders = []
+        for i in range(2):
+            order = Order.objects.create(
+                user=cls.staff, email='admin@example.com', phone='555', payment_method='paypal',
+                shipping_address={'address': f'Calle {i}', 'city': 'CDMX', 'postal_code': '01000'},
+                billing_address={},
+            )
+            for product in cls.products:
+                OrderItem.objects.create(order=order, product=product, quantity=i + 1, unit_price=product.price)
+            cls.orders.append(order)
+        Subscriber.objects.bulk_create([Subscriber(email='a@example.com'), Subscriber(email='ñ@example.com', is_active=False)])
+
+    def test_order_lines_flatten_addresses(self):
+        rows = list(csv.DictReader(StringIO(''.join(render(get_export('orders'), fmt='csv')))))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['order_number'], self.orders[0].order_number)
+        self.assertEqual((rows[0]['shipping_address'], rows[0]['shipping_city'], rows[0]['billing_city']), ('Calle 0', 'CDMX', ''))
+        self.assertEqual((rows[3]['product_sku'], rows[3]['quantity'], rows[3]['line_total']), ('LP-1', '2', '20.00'))
+
+    def test_admin_action_streams_selection(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'export_jsonl', '_selected_action': [self.orders[1].pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="pedidos-', response['Content-Disposition'])
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual({line['order_number'] for line in lines}, {self.orders[1].order_number})
+        self.assertEqual(lines[0]['shipping_address'], 'Calle 1')
+
+    def test_command_and_buffering(self):
+        out = StringIO()
+        call_command('export_data', 'subscribers', '--format', 'jsonl', stdout=out)
+        self.assertEqual([json.loads(line)['email'] for line in out.getvalue().splitlines()], ['a@example.com', 'ñ@example.com'])
+        self.assertEqual(list(buffered(['ab', 'cd', 'e'], size=4)), ['abcd', 'e'])
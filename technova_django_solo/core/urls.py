@@ -4,7 +4,7 @@ Configuración de rutas para funcionalidades centrales
 """
 
 from django.urls import path
-from . import views
+from . import instrumentation, page_cache, views
 
 app_name = 'core'
 
@@ -12,4 +12,7 @@ urlpatterns = [
     # APIs específicas del core si las hay
     path('', views.home, name='home'),
     path('contacto/', views.contact, name='contact'),
+    path('fragmentos/usuario/', views.user_fragments, name='user_fragments'),
+    path('_stats/peticiones/', instrumentation.stats_view, name='request_stats'),
+    path('_stats/paginas/', page_cache.stats_view, name='page_cache_stats'),
 ]
\ No newline at end of file
@@ -3,58 +3,87 @@ Vistas principales de TechNova Solutions
 Páginas principales del sitio web
 """
 
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Avg
 from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from products.models import Product, Category
+from orders.cart import CartSummary
 from orders.models import Cart, CartItem
+from products.search import search_products
+from products.category_tree import get_category_tree
+from core.cache import get_catalog_version, get_or_build
 from core.models import ContactMessage
+from core.conditional import conditional_page
+from core.page_cache import anonymous_page
+from core.instrumentation import query_budget
 from .forms import ContactForm
 
 
-def home(request):
-    """Página principal del sitio"""
+def _home_products(**filters):
+    return Product.objects.filter(status='active', **filters).cards()
+
+
+# Secciones de la portada: nombre -> función que devuelve la lista de productos
+HOME_SECTIONS = {
     # Productos destacados
-    featured_products = Product.objects.filter(
-        status='active'
-    ).order_by('-created_at')[:8]
-    
+    'featured_products': lambda: list(_home_products().order_by('-created_at')[:8]),
     # Productos en oferta
-    sale_products = Product.objects.filter(
-        status='active',
-        compare_at_price__isnull=False
-    ).order_by('-created_at')[:6]
-    
+    'sale_products': lambda: list(_home_products(compare_at_price__isnull=False).order_by('-created_at')[:6]),
     # Productos mejor valorados
-    top_rated_products = Product.objects.filter(
-        status='active',
-        average_rating__gte=4.0
-    ).order_by('-average_rating')[:6]
-    
-    # Categorías principales
-    main_categories = Category.objects.filter(
-        parent__isnull=True,
-        is_active=True
-    ).order_by('sort_order')[:6]
-    
-    context = {
-        'featured_products': featured_products,
-        'sale_products': sale_products,
-        'top_rated_products': top_rated_products,
-        'main_categories': main_categories,
+    'top_rated_products': lambda: list(_home_products(average_rating__gte=4.0).order_by('-average_rating')[:6]),
+}
+
+
+def get_home_sections():
+    """Secciones de la portada cacheadas bajo la versión actual del catálogo"""
+    version = get_catalog_version()
+    timeout = getattr(settings, 'HOME_SECTIONS_TIMEOUT', 900)
+    return {
+        name: get_or_build(f'home:{name}:{version}', builder, timeout=timeout)
+        for name, builder in HOME_SECTIONS.items()
     }
+
+
+def home_fingerprint(request):
+    """La portada sólo depende del catálogo: sus secciones se cachean bajo su versión"""
+    return 'home'
+
+
+@query_budget(8)
+@anonymous_page('home')
+@conditional_page(home_fingerprint, 'home')
+def home(request):
+    """Página principal del sitio"""
+    context = get_home_sections()
+    # Categorías principales
+    context['main_categories'] = get_category_tree().roots[:6]
     
     return render(request, 'home.html', context)
 
 
+@never_cache
+@query_budget(4)
+def user_fragments(request):
+    """Partes por visitante de una página cacheada: contador del carrito, mensajes y token CSRF"""
+    return JsonResponse({
+        'cart_count': CartSummary(request).count,
+        'messages': [{'tags': message.tags, 'text': str(message)} for message in messages.get_messages(request)],
+        'csrf_token': get_token(request),
+    })
+
+
 def about(request):
     """Página acerca de nosotros"""
     return render(request, 'core/about.html')
 
 
+@query_budget(6)
 def contact(request):
     """Página de contacto"""
     if request.method == 'POST':
@@ -87,17 +116,12 @@ def search(request):
     category_slug = request.GET.get('category', '')
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
-    sort_by = request.GET.get('sort', '-created_at')
+    sort_by = request.GET.get('sort', 'relevance' if query else '-created_at')
     
     products = Product.objects.filter(status='active')
     
     if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(brand__icontains=query) |
-            Q(sku__icontains=query)
-        )
+        products = search_products(products, query)
     
     if category_slug:
         products = products.filter(category__slug=category_slug)
@@ -108,10 +132,10 @@ def search(request):
     if max_price:
         products = products.filter(price__lte=max_price)
     
-    # Ordenamiento
+    # Ordenamiento (con búsqueda, 'relevance' conserva el orden del motor)
     if sort_by in ['price', '-price', 'name', '-name', 'average_rating', '-average_rating']:
         products = products.order_by(sort_by)
-    else:
+    elif sort_by != 'relevance' or not query:
         products = products.order_by('-created_at')
     
     # Paginación
@@ -1,10 +1,26 @@
 from django.contrib import admin
-from .models import Subscriber
+
+from core.exports import ExportAdminMixin
+from .exports import SubscriberExport
+from .models import Campaign, Subscriber
 
 @admin.register(Subscriber)
-class SubscriberAdmin(admin.ModelAdmin):
+class SubscriberAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ('email', 'subscribed_at', 'is_active')
     list_filter = ('is_active', 'subscribed_at')
     search_fields = ('email',)
     ordering = ('-subscribed_at',)
+    actions = ['export_csv', 'export_jsonl']
+    export_class = SubscriberExport
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'subject', 'status', 'sent_count', 'failed_count', 'throughput', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('name', 'subject')
+    readonly_fields = (
+        'status', 'checkpoint', 'sent_count', 'failed_count', 'elapsed_seconds', 'throughput',
+        'last_error', 'started_at', 'finished_at',
+    )
 
@@ -0,0 +1,209 @@
+"""
+Envío de campañas del newsletter
+Destinatarios de Subscriber y core.Newsletter sin duplicados, enviados en bloques por un pool de hilos con checkpoint
+"""
+
+import heapq
+import logging
+import string
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Value
+from django.db.models.functions import Lower
+from django.template import Context, Template
+from django.utils import timezone
+from django.utils.html import escape
+
+from core.models import Newsletter
+from .models import Campaign, Subscriber
+
+logger = logging.getLogger('technova.newsletter')
+
+Recipient = namedtuple('Recipient', 'email first_name')
+
+# (modelo, expresión del nombre) de cada lista de suscriptores
+SOURCES = [
+    (Subscriber, Value('')),
+    (Newsletter, F('first_name')),
+]
+
+
+def _source_stream(model, first_name, after, chunk_size):
+    """Suscriptores activos de una tabla en orden de email (en minúsculas), por keyset"""
+    queryset = (
+        model.objects.filter(is_active=True)
+        .annotate(key=Lower('email'), name=first_name)
+        .order_by('key')
+        .values_list('key', 'name')
+    )
+    while True:
+        rows = list(queryset.filter(key__gt=after)[:chunk_size])
+        yield from (Recipient(*row) for row in rows)
+        if len(rows) < chunk_size:
+            return
+        after = rows[-1][0]
+
+
+def iter_recipients(after='', chunk_size=1000):
+    """Destinatarios únicos por email, ordenados, a partir de ``after``
+
+    Cada tabla se lee por bloques y se mezclan con heapq.merge: la memoria no
+    depende del tamaño de la lista y los duplicados quedan adyacentes.
+    """
+    streams = [_source_stream(model, name, after, chunk_size) for model, name in SOURCES]
+    merged = heapq.merge(*streams, key=lambda recipient: recipient.email)
+    for email, group in groupby(merged, key=lambda recipient: recipient.email):
+        names = [recipient.first_name for recipient in group if recipient.first_name]
+        yield Recipient(email, names[0] if names else '')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_campaign(campaign):
+    """Renderizar la plantilla una sola vez; queda lista para sustituir por destinatario"""
+    html = Template(campaign.body).render(Context({
+        'campaign': campaign,
+        'site_name': settings.SITE_NAME,
+        'site_url': settings.SITE_URL,
+    }))
+    return string.Template(html)
+
+
+class SenderPool:
+    """Hilos de envío, cada uno con una conexión SMTP abierta durante toda la campaña"""
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='campaign')
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_connection()
+            connection.open()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            connection.open()
+
+    def send_chunk(self, campaign, template, recipients):
+        """Enviar un bloque; devuelve (enviados, fallidos, último error)"""
+        sent = failed = 0
+        error = ''
+        connection = self.connection()
+        for recipient in recipients:
+            message = EmailMessage(
+                subject=campaign.subject,
+                body=template.safe_substitute(email=escape(recipient.email), first_name=escape(recipient.first_name)),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient.email],
+                connection=connection,
+            )
+            message.content_subtype = 'html'
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                failed += 1
+                error = f'{recipient.email}: {type(exc).__name__}: {exc}'
+                logger.warning('Campaña %s: fallo al enviar a %s', campaign.pk, recipient.email, exc_info=True)
+                self.reset_connection()
+            else:
+                sent += 1
+        return sent, failed, error
+
+    def submit(self, *args):
+        return self.executor.submit(self.send_chunk, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for connection in self._connections:
+            connection.close()
+
+
+def _save_checkpoint(campaign, checkpoint, sent, failed, error, elapsed):
+    Campaign.objects.filter(pk=campaign.pk).update(
+        checkpoint=checkpoint,
+        sent_count=F('sent_count') + sent,
+        failed_count=F('failed_count') + failed,
+        elapsed_seconds=F('elapsed_seconds') + elapsed,
+        last_error=error or F('last_error'),
+    )
+
+
+def send_campaign(campaign, workers=None, chunk_size=None, max_chunks=None):
+    """Enviar (o reanudar) una campaña desde su checkpoint
+
+    El checkpoint sólo avanza cuando todos los bloques anteriores terminaron,
+    así que tras una caída se reenvía como mucho lo que estaba en vuelo.
+    Devuelve las métricas de esta ejecución.
+    """
+    workers = workers or getattr(settings, 'NEWSLETTER_SEND_WORKERS', 4)
+    chunk_size = chunk_size or getattr(settings, 'NEWSLETTER_CHUNK_SIZE', 500)
+    template = render_campaign(campaign)
+
+    Campaign.objects.filter(pk=campaign.pk).update(
+        status='sending', started_at=campaign.started_at or timezone.now(),
+    )
+    totals = {'sent': 0, 'failed': 0, 'chunks': 0}
+    start = last_save = time.perf_counter()
+    pool = SenderPool(workers)
+    in_flight = deque()
+
+    def confirm_oldest():
+        nonlocal last_save
+        future, checkpoint = in_flight.popleft()
+        sent, failed, error = future.result()
+        now = time.perf_counter()
+        _save_checkpoint(campaign, checkpoint, sent, failed, error, now - last_save)
+        last_save = now
+        totals['sent'] += sent
+        totals['failed'] += failed
+        totals['chunks'] += 1
+        logger.info(
+            'Campaña %s: %s enviados, %s fallidos, %.1f/s (checkpoint %s)',
+            campaign.pk, totals['sent'], totals['failed'], totals['sent'] / max(now - start, 1e-9), checkpoint,
+        )
+
+    finished = False
+    try:
+        chunks = chunked(iter_recipients(after=campaign.checkpoint, chunk_size=chunk_size), chunk_size)
+        for recipients in islice(chunks, max_chunks):
+            in_flight.append((pool.submit(campaign, template, recipients), recipients[-1].email))
+            # Tope de bloques en vuelo: el productor no se adelanta a los hilos
+            if len(in_flight) >= workers * 2:
+                confirm_oldest()
+        while in_flight:
+            confirm_oldest()
+        finished = max_chunks is None or totals['chunks'] < max_chunks
+    finally:
+        pool.close()
+        Campaign.objects.filter(pk=campaign.pk).update(
+            status='sent' if finished else 'paused',
+            finished_at=timezone.now() if finished else None,
+        )
+        campaign.refresh_from_db()
+
+    totals['elapsed'] = round(time.perf_counter() - start, 3)
+    totals['rate'] = round(totals['sent'] / totals['elapsed'], 1) if totals['elapsed'] else 0
+    return totals
@@ -0,0 +1,19 @@
+"""
+Exportación de suscriptores
+Columnas de Subscriber para core.exports (CSV/JSONL en streaming)
+"""
+
+from core.exports import Export
+from .models import Subscriber
+
+
+class SubscriberExport(Export):
+    name = 'suscriptores'
+    columns = [
+        ('email', 'email'),
+        ('is_active', 'is_active'),
+        ('subscribed_at', 'subscribed_at'),
+    ]
+
+    def get_queryset(self):
+        return Subscriber.objects.all()
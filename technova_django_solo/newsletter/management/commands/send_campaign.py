@@ -0,0 +1,44 @@
+"""
+Enviar o reanudar una campaña del newsletter
+Uso: python manage.py send_campaign 3 [--workers 8] [--chunk-size 500] [--restart]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from newsletter.campaigns import send_campaign
+from newsletter.models import Campaign
+
+
+class Command(BaseCommand):
+    help = 'Envía una campaña a los suscriptores activos, reanudando desde el último checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign', type=int)
+        parser.add_argument('--workers', type=int, help='Hilos de envío (una conexión SMTP cada uno)')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--max-chunks', type=int, help='Detenerse tras N bloques (queda en pausa)')
+        parser.add_argument('--restart', action='store_true', help='Descartar el checkpoint y empezar de cero')
+
+    def handle(self, *args, **options):
+        try:
+            campaign = Campaign.objects.get(pk=options['campaign'])
+        except Campaign.DoesNotExist:
+            raise CommandError(f"No existe la campaña {options['campaign']}")
+        if campaign.status == 'sent' and not options['restart']:
+            raise CommandError('La campaña ya se envió; usa --restart para repetirla')
+        if options['restart']:
+            Campaign.objects.filter(pk=campaign.pk).update(
+                checkpoint='', sent_count=0, failed_count=0, elapsed_seconds=0, last_error='',
+                started_at=None, finished_at=None,
+            )
+            campaign.refresh_from_db()
+        elif campaign.checkpoint:
+            self.stdout.write(f'Reanudando después de {campaign.checkpoint}')
+
+        totals = send_campaign(
+            campaign, workers=options['workers'], chunk_size=options['chunk_size'], max_chunks=options['max_chunks'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{campaign}: {totals['sent']} enviados, {totals['failed']} fallidos en {totals['elapsed']}s "
+            f"({totals['rate']}/s) - estado {campaign.get_status_display()}"
+        ))
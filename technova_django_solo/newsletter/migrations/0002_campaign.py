@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField(help_text='Plantilla HTML de Django (se renderiza una vez); $email y $first_name se sustituyen por destinatario')),
+                ('status', models.CharField(choices=[('draft', 'Borrador'), ('sending', 'Enviando'), ('paused', 'Pausada'), ('sent', 'Enviada')], default='draft', max_length=10)),
+                ('checkpoint', models.CharField(blank=True, help_text='Último email confirmado (orden alfabético)', max_length=254)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('elapsed_seconds', models.FloatField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -10,3 +10,39 @@ class Subscriber(models.Model):
     
     def __str__(self):
         return self.email
+
+
+class Campaign(models.Model):
+    """Envío masivo a los suscriptores (ver newsletter.campaigns)"""
+    STATUS_CHOICES = [
+        ('draft', 'Borrador'),
+        ('sending', 'Enviando'),
+        ('paused', 'Pausada'),
+        ('sent', 'Enviada'),
+    ]
+
+    name = models.CharField(max_length=200)
+    subject = models.CharField(max_length=255)
+    body = models.TextField(
+        help_text="Plantilla HTML de Django (se renderiza una vez); $email y $first_name se sustituyen por destinatario"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
+    checkpoint = models.CharField(max_length=254, blank=True, help_text="Último email confirmado (orden alfabético)")
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    elapsed_seconds = models.FloatField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def throughput(self):
+        """Correos por segundo acumulados"""
+        return round(self.sent_count / self.elapsed_seconds, 1) if self.elapsed_seconds else 0
+
+    def __str__(self):
+        return self.name
@@ -1,3 +1,135 @@
-from django.test import TestCase
+import socketserver
+import threading
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from core.models import Newsletter
+from .campaigns import iter_recipients, send_campaign
+from .models import Campaign, Subscriber
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Servidor SMTP mínimo en local: acepta todo salvo los destinatarios de ``refused``"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refused=()):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.refused = set(refused)
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stand-in')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'RCPT':
+                address = line.split(':', 1)[1].strip(' <>')
+                if address in server.refused:
+                    self.reply('550 rechazado')
+                    continue
+                recipients.append(address)
+                self.reply('250 ok')
+            elif command == 'DATA':
+                self.reply('354 go')
+                data = []
+                while (chunk := self.rfile.readline().decode()) not in ('.\r\n', ''):
+                    data.append(chunk)
+                with server.lock:
+                    server.messages.append((recipients, ''.join(data)))
+                recipients = []
+                self.reply('250 queued')
+            else:
+                # EHLO/HELO, MAIL, RSET, NOOP
+                recipients = [] if command in ('MAIL', 'RSET') else recipients
+                self.reply('250 ok')
+
+
+class CampaignTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Subscriber.objects.bulk_create([
+            Subscriber(email='ana@example.com'),
+            Subscriber(email='BETO@example.com'),
+            Subscriber(email='dora@example.com'),
+            Subscriber(email='inactivo@example.com', is_active=False),
+        ])
+        Newsletter.objects.bulk_create([
+            Newsletter(email='beto@example.com', first_name='Beto'),
+            Newsletter(email='carla@example.com', first_name='Carla'),
+            Newsletter(email='eva@example.com', first_name='Eva'),
+        ])
+
+    def setUp(self):
+        self.smtp = SMTPStandIn(refused={'dora@example.com'})
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        host, port = self.smtp.server_address
+        self.settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=host, EMAIL_PORT=port, EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.campaign = Campaign.objects.create(
+            name='Ofertas', subject='Ofertas de la semana',
+            body='<p>Hola $first_name ({{ site_name }})</p><p>Enviado a $email. Laptops desde $999</p>',
+        )
+
+    def test_recipients_deduplicated_across_lists(self):
+        recipients = list(iter_recipients(chunk_size=2))
+        self.assertEqual(
+            [recipient.email for recipient in recipients],
+            ['ana@example.com', 'beto@example.com', 'carla@example.com', 'dora@example.com', 'eva@example.com'],
+        )
+        self.assertEqual(recipients[1].first_name, 'Beto')
+        self.assertEqual([r.email for r in iter_recipients(after='carla@example.com')], ['dora@example.com', 'eva@example.com'])
+
+    def test_send_reuses_connections_and_substitutes(self):
+        with self.assertLogs('technova.newsletter', 'INFO'):
+            totals = send_campaign(self.campaign, workers=2, chunk_size=2)
+        self.assertEqual((totals['sent'], totals['failed'], totals['chunks']), (4, 1, 3))
+        self.assertEqual(len(self.smtp.messages), 4)
+        # Una conexión por hilo, más la que se reabre tras el rechazo
+        self.assertLessEqual(self.smtp.connections, 3)
+
+        recipients, data = next(message for message in self.smtp.messages if message[0] == ['carla@example.com'])
+        self.assertIn('Hola Carla (TechNova Solutions)', data)
+        self.assertIn('Enviado a carla@example.com. Laptops desde $999', data)
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'sent')
+        self.assertEqual((self.campaign.sent_count, self.campaign.failed_count), (4, 1))
+        self.assertEqual(self.campaign.checkpoint, 'eva@example.com')
+        self.assertIn('dora@example.com', self.campaign.last_error)
+
+    def test_resume_from_checkpoint(self):
+        with self.assertLogs('technova.newsletter', 'INFO'):
+            totals = send_campaign(self.campaign, workers=1, chunk_size=2, max_chunks=1)
+        self.assertEqual(totals['sent'], 2)
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.checkpoint), ('paused', 'beto@example.com'))
+
+        with self.assertLogs('technova.newsletter', 'INFO'):
+            send_campaign(self.campaign, workers=1, chunk_size=2)
+        sent_to = [recipients[0] for recipients, _ in self.smtp.messages]
+        self.assertEqual(sorted(sent_to), ['ana@example.com', 'beto@example.com', 'carla@example.com', 'eva@example.com'])
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.sent_count), ('sent', 4))
@@ -0,0 +1,37 @@
+from django.contrib import admin
+
+from core.exports import ExportAdminMixin
+from .exports import OrderLineExport
+from .models import Order, OrderItem, StockReservation
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ['product', 'product_name', 'quantity', 'unit_price', 'total_price']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(Order)
+class OrderAdmin(ExportAdminMixin, admin.ModelAdmin):
+    list_display = ('order_number', 'user', 'status', 'payment_status', 'payment_method', 'total_amount', 'created_at')
+    list_filter = ('status', 'payment_status', 'payment_method', 'created_at')
+    search_fields = ('order_number', 'email', 'user__username')
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    inlines = [OrderItemInline]
+    readonly_fields = ('order_number', 'created_at', 'updated_at')
+    actions = ['export_csv', 'export_jsonl']
+    export_class = OrderLineExport
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'product', 'quantity', 'status', 'expires_at', 'order', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('owner', 'product__name', 'product__sku')
+    list_select_related = ('product', 'order')
+    raw_id_fields = ('product', 'order')
+    readonly_fields = ('created_at', 'updated_at')
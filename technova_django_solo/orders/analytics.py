@@ -0,0 +1,203 @@
+"""
+Analítica de ventas
+Resúmenes diarios por categoría, producto y método de pago, mantenidos por marca de agua y reconstruidos por bloques de días
+"""
+
+import datetime
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, RollupWatermark, SalesRollup
+
+logger = logging.getLogger('technova.analytics')
+
+WATERMARK_NAME = 'sales_rollups'
+# Pedidos que no cuentan como venta
+EXCLUDED_STATUSES = ['cancelled', 'refunded']
+PAYMENT_LABELS = dict(Order.PAYMENT_METHOD_CHOICES)
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def average(revenue, orders):
+    """Ticket promedio"""
+    return (Decimal(revenue) / orders).quantize(Decimal('0.01')) if orders else Decimal('0.00')
+
+
+def _sales(start, end):
+    """Pedidos válidos creados en [start, end) (fechas locales)"""
+    return (
+        Order.objects.exclude(status__in=EXCLUDED_STATUSES)
+        .filter(created_at__date__gte=start, created_at__date__lt=end)
+        .order_by()
+    )
+
+
+def _lines(start, end):
+    return (
+        OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)
+        .filter(order__created_at__date__gte=start, order__created_at__date__lt=end)
+        .annotate(day=TruncDate('order__created_at'))
+        .order_by()
+    )
+
+
+def aggregate_days(start, end):
+    """Filas de SalesRollup para [start, end), agregadas con GROUP BY en la base de datos
+
+    Seis consultas por bloque, sin importar cuántos pedidos tenga. Los totales
+    y los métodos de pago suman Order.total_amount; categorías y productos, el
+    total de sus líneas (sin envío ni impuestos).
+    """
+    rows = {}
+
+    def row(day, dimension, key='', label=''):
+        key = str(key)
+        if (day, dimension, key) not in rows:
+            rows[day, dimension, key] = SalesRollup(date=day, dimension=dimension, key=key, label=label)
+        return rows[day, dimension, key]
+
+    orders = _sales(start, end).annotate(day=TruncDate('created_at'))
+    for entry in orders.values('day').annotate(count=Count('id'), revenue=Sum('total_amount')):
+        rollup = row(entry['day'], 'total', label='Total')
+        rollup.orders, rollup.revenue = entry['count'], entry['revenue']
+    for entry in orders.values('day', 'payment_method').annotate(count=Count('id'), revenue=Sum('total_amount')):
+        method = entry['payment_method']
+        rollup = row(entry['day'], 'payment_method', method, PAYMENT_LABELS.get(method, method))
+        rollup.orders, rollup.revenue = entry['count'], entry['revenue']
+
+    lines = _lines(start, end)
+    for entry in lines.values('day').annotate(units=Sum('quantity')):
+        row(entry['day'], 'total', label='Total').units = entry['units']
+    for entry in lines.values('day', 'order__payment_method').annotate(units=Sum('quantity')):
+        row(entry['day'], 'payment_method', entry['order__payment_method']).units = entry['units']
+    for dimension, key, label in (
+        ('category', 'product__category_id', 'product__category__name'),
+        ('product', 'product_id', 'product__name'),
+    ):
+        grouped = lines.values('day', key, label).annotate(
+            count=Count('order_id', distinct=True), units=Sum('quantity'), revenue=Sum('total_price'),
+        )
+        for entry in grouped:
+            rollup = row(entry['day'], dimension, entry[key], entry[label])
+            rollup.orders, rollup.units, rollup.revenue = entry['count'], entry['units'], entry['revenue']
+    return list(rows.values())
+
+
+def rebuild_days(start, end):
+    """Reemplazar los resúmenes de [start, end); devuelve las filas escritas"""
+    rollups = aggregate_days(start, end)
+    with transaction.atomic():
+        SalesRollup.objects.filter(date__gte=start, date__lt=end).delete()
+        SalesRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def _day_ranges(days):
+    """Agrupar fechas sueltas en rangos [inicio, fin) de días consecutivos"""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + ONE_DAY
+        else:
+            ranges.append([day, day + ONE_DAY])
+    return ranges
+
+
+def refresh_rollups():
+    """Recalcular los días con pedidos nuevos o modificados desde la marca de agua
+
+    Cada día afectado se reconstruye completo, así que una cancelación o un
+    cambio de estado deja el día correcto. Se relee un margen antes de la marca
+    (SALES_ROLLUP_LAG) para no perder pedidos guardados en transacciones que
+    confirmaron tarde; reprocesar un día es idempotente.
+    """
+    lag = datetime.timedelta(seconds=getattr(settings, 'SALES_ROLLUP_LAG', 300))
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        if watermark.value is None:
+            return backfill_rollups()
+        high = timezone.now()
+        changed = Order.objects.filter(updated_at__gt=watermark.value - lag, updated_at__lte=high)
+        days = set(changed.annotate(day=TruncDate('created_at')).values_list('day', flat=True).order_by().distinct())
+        rows = sum(rebuild_days(start, end) for start, end in _day_ranges(days))
+        watermark.value = high
+        watermark.save(update_fields=['value', 'updated_at'])
+    logger.info('Resúmenes de ventas: %s días recalculados (%s filas)', len(days), rows)
+    return {'days': len(days), 'rows': rows}
+
+
+def backfill_rollups(start=None, end=None, chunk_days=31, progress=None):
+    """Reconstruir el historial por bloques de ``chunk_days`` días
+
+    Sólo la reconstrucción completa (sin ``start`` ni ``end``) deja la marca de
+    agua al día: un rango no cubre los pedidos modificados fuera de él, que
+    refresh_rollups debe seguir viendo.
+    """
+    high = timezone.now()
+    full = start is None and end is None
+    bounds = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if bounds['first'] is None:
+        if full:
+            RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': high})
+        return {'days': 0, 'rows': 0}
+    start = start or timezone.localdate(bounds['first'])
+    end = end or timezone.localdate(bounds['last']) + ONE_DAY
+    step = datetime.timedelta(days=chunk_days)
+    totals = {'days': (end - start).days, 'rows': 0}
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        totals['rows'] += rebuild_days(chunk_start, chunk_end)
+        if progress:
+            progress(chunk_start, chunk_end, totals['rows'])
+        chunk_start = chunk_end
+    if full:
+        RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': high})
+    return totals
+
+
+def dashboard_data(days=30, top=10):
+    """Datos del panel leídos sólo de SalesRollup"""
+    end = timezone.localdate()
+    start = end - datetime.timedelta(days=days - 1)
+    rollups = SalesRollup.objects.filter(date__gte=start, date__lte=end)
+
+    daily = list(rollups.filter(dimension='total').order_by('date').values('date', 'orders', 'units', 'revenue'))
+    for entry in daily:
+        entry['aov'] = average(entry['revenue'], entry['orders'])
+
+    def breakdown(dimension):
+        grouped = (
+            rollups.filter(dimension=dimension)
+            .values('key')
+            .annotate(name=Max('label'), orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue')[:top]
+        )
+        return [{**entry, 'aov': average(entry['revenue'], entry['orders'])} for entry in grouped]
+
+    totals = defaultdict(int)
+    for entry in daily:
+        for field in ('orders', 'units', 'revenue'):
+            totals[field] += entry[field]
+    totals['aov'] = average(totals['revenue'], totals['orders'])
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('value', flat=True).first()
+    categories, products, payment_methods = breakdown('category'), breakdown('product'), breakdown('payment_method')
+    return {
+        'start': start,
+        'end': end,
+        'days': days,
+        'daily': daily,
+        'totals': dict(totals),
+        'categories': categories,
+        'products': products,
+        'payment_methods': payment_methods,
+        'breakdowns': [('Categorías', categories), ('Productos', products), ('Métodos de pago', payment_methods)],
+        'watermark': watermark,
+    }
@@ -0,0 +1,140 @@
+"""
+Resumen del carrito para TechNova Solutions
+Cantidad y total del carrito calculados de forma perezosa y cacheados por propietario
+"""
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from core.cache import bump_version, get_catalog_version, get_version
+from .cart_storage import get_cart_store, get_cart_token
+from .models import Cart, CartItem
+
+CART_SUMMARY_TIMEOUT = 60 * 60  # 1 hora
+
+
+def get_cart_owner(request):
+    """Identificador del propietario del carrito, o None si no puede tener uno"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    token = get_cart_token(request)
+    if token:
+        return f"anon:{token}"
+    return None
+
+
+def get_owner_carts(owner):
+    """Carritos en BD que pertenecen a un propietario (sin crearlos)"""
+    kind, _, value = owner.partition(':')
+    if kind == 'user':
+        return Cart.objects.filter(user_id=value)
+    return Cart.objects.filter(session_id=value)
+
+
+def _version_key(owner):
+    return f"cart_summary_version:{owner}"
+
+
+def _summary_key(owner, version):
+    # El total depende de los precios: un cambio en el catálogo también lo invalida
+    return f"cart_summary:{owner}:{version}:{get_catalog_version()}"
+
+
+def compute_cart_summary(owner):
+    """Calcular cantidad y total del carrito en una sola consulta"""
+    totals = CartItem.objects.filter(cart__in=get_owner_carts(owner)).aggregate(
+        count=Coalesce(Sum('quantity'), 0),
+        total=Coalesce(
+            Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Decimal('0.00'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+    return {'count': totals['count'], 'total': totals['total']}
+
+
+def refresh_cart_summary(owner, store=None):
+    """Invalidar y recalcular el resumen tras modificar el carrito"""
+    version = bump_version(_version_key(owner))
+    summary = store.summary() if store is not None else compute_cart_summary(owner)
+    cache.set(_summary_key(owner, version), summary, CART_SUMMARY_TIMEOUT)
+    return summary
+
+
+def refresh_request_cart(request):
+    """Atajo para las vistas que modifican el carrito del usuario actual"""
+    owner = get_cart_owner(request)
+    if owner:
+        return refresh_cart_summary(owner, get_cart_store(request))
+    return None
+
+
+def cart_fingerprint(request):
+    """Propietario y versión del resumen del carrito (cambia con cada modificación); sin consultas"""
+    owner = get_cart_owner(request)
+    if owner is None:
+        return ''
+    return f'{owner}:{get_version(_version_key(owner))}'
+
+
+def get_cart_contents(request):
+    """Líneas y totales del carrito de la petición, calculados una sola vez"""
+    contents = getattr(request, '_cart_contents', None)
+    if contents is None:
+        contents = request._cart_contents = get_cart_store(request).contents()
+    return contents
+
+
+class CartSummary:
+    """Resumen perezoso del carrito: sólo consulta cache/BD cuando se lee"""
+
+    def __init__(self, request):
+        self.request = request
+        self.owner = get_cart_owner(request)
+
+    @cached_property
+    def _data(self):
+        if self.owner is None:
+            return {'count': 0, 'total': Decimal('0.00')}
+        # Si la vista ya calculó las líneas, el resumen sale de ahí sin otra consulta
+        contents = getattr(self.request, '_cart_contents', None)
+        if contents is not None:
+            return contents.as_summary()
+        version = get_version(_version_key(self.owner))
+        key = _summary_key(self.owner, version)
+        summary = cache.get(key)
+        if summary is None:
+            summary = get_cart_store(self.request).summary()
+            # add() no pisa un resumen más reciente escrito por una vista
+            cache.add(key, summary, CART_SUMMARY_TIMEOUT)
+        return summary
+
+    @property
+    def count(self):
+        return self._data['count']
+
+    @property
+    def total(self):
+        return self._data['total']
+
+    @cached_property
+    def cart(self):
+        if self.owner is None:
+            return None
+        return get_cart_store(self.request).cart
+
+    @cached_property
+    def items(self):
+        if self.owner is None:
+            return CartItem.objects.none()
+        return get_cart_store(self.request).items()
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
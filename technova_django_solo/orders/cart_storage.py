@@ -0,0 +1,360 @@
+"""
+Almacenamiento del carrito
+Interfaz común para el carrito en BD (usuarios) y en cache (visitantes anónimos), con fusión al iniciar sesión
+"""
+
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from products.models import Product
+from .models import Cart, CartItem
+from .totals import ZERO, CartContents
+
+CART_TOKEN_SESSION_KEY = 'cart_token'
+ANONYMOUS_CART_TIMEOUT = 60 * 60 * 24 * 14  # 14 días
+
+
+def get_cart_token(request, create=False):
+    """Identificador del carrito anónimo guardado en la sesión
+
+    Se guarda en los datos de la sesión (no se usa la clave de sesión) porque
+    login() rota la clave y el carrito debe sobrevivir para fusionarse.
+    """
+    token = request.session.get(CART_TOKEN_SESSION_KEY)
+    if token is None and create:
+        token = request.session[CART_TOKEN_SESSION_KEY] = uuid.uuid4().hex
+    return token
+
+
+NOT_IN_CART = 'El producto no está en el carrito'
+
+
+def stock_error(product, quantity):
+    """Mensaje si la cantidad pedida no puede venderse, o None"""
+    if quantity <= 0:
+        return None
+    if product.status != 'active':
+        return f'{product.name} ya no está disponible'
+    if quantity > product.stock_quantity:
+        return f'Sólo hay {product.stock_quantity} unidades de {product.name}'
+    return None
+
+
+class CartLine:
+    """Línea de un carrito que no vive en la BD (mismos atributos que CartItem)"""
+    __slots__ = ('id', 'product', 'quantity')
+
+    def __init__(self, product, quantity):
+        self.id = product.pk
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def line_total(self):
+        return self.product.price * self.quantity
+
+    @property
+    def line_savings(self):
+        if self.product.is_on_sale:
+            return (self.product.compare_at_price - self.product.price) * self.quantity
+        return ZERO
+
+    total_price = line_total
+    total_savings = line_savings
+
+
+class BaseCartStore:
+    """Interfaz del carrito; ``line_id`` es el id que cada almacenamiento da a sus líneas"""
+
+    owner = None
+    cart = None
+
+    def lines(self):
+        """{product_id: cantidad}"""
+        raise NotImplementedError
+
+    def items(self):
+        """Líneas con su producto cargado, para las plantillas"""
+        raise NotImplementedError
+
+    def contents(self):
+        """Líneas con sus totales (ver orders.totals.CartContents)"""
+        raise NotImplementedError
+
+    def add(self, product, quantity=1):
+        """Sumar una cantidad; devuelve el aviso de inventario o None"""
+        return self.add_many({product.pk: quantity}).get(product.pk)
+
+    def add_many(self, quantities):
+        """Sumar cantidades {product_id: cantidad}, sin pasar del inventario
+
+        Una línea que superaría el stock se deja en el máximo disponible; los
+        avisos se devuelven como {product_id: mensaje}.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _capped(quantities, current):
+        """Cantidades finales {product_id: cantidad} limitadas al stock, y sus avisos"""
+        products = Product.objects.only('pk', 'name', 'stock_quantity', 'status').in_bulk(list(quantities))
+        targets, errors = {}, {}
+        for pk, product in products.items():
+            target = current.get(pk, 0) + quantities[pk]
+            error = stock_error(product, target)
+            if error:
+                errors[pk] = error
+                target = min(target, product.stock_quantity) if product.status == 'active' else 0
+            if target > current.get(pk, 0):
+                targets[pk] = target
+        return targets, errors
+
+    def update(self, quantities):
+        """Fijar cantidades {line_id: cantidad}; 0 o menos elimina la línea
+
+        Valida contra el inventario en la misma pasada. Las líneas inválidas no
+        se modifican y se devuelven como {line_id: mensaje}.
+        """
+        raise NotImplementedError
+
+    def remove(self, line_id):
+        """Eliminar una línea; devuelve la línea eliminada o None"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def summary(self):
+        """{'count', 'total'} del carrito"""
+        raise NotImplementedError
+
+
+class DatabaseCartStore(BaseCartStore):
+    """Carrito en Cart/CartItem: del usuario dado o, sin usuario, del token de la sesión"""
+
+    def __init__(self, request=None, user=None):
+        if user is not None:
+            self.owner = f'user:{user.pk}'
+            self.lookup = {'user': user}
+        else:
+            token = get_cart_token(request)
+            self.owner = f'anon:{token}' if token else None
+            self.lookup = {'session_id': token}
+            self.request = request
+
+    @cached_property
+    def cart(self):
+        if self.owner is None:
+            return None
+        return Cart.objects.filter(**self.lookup).first()
+
+    def _get_or_create_cart(self):
+        if self.cart is None:
+            if self.owner is None:
+                token = get_cart_token(self.request, create=True)
+                self.owner = f'anon:{token}'
+                self.lookup = {'session_id': token}
+            self.cart, _ = Cart.objects.get_or_create(**self.lookup)
+        return self.cart
+
+    def lines(self):
+        if self.cart is None:
+            return {}
+        return dict(self.cart.items.values_list('product_id', 'quantity'))
+
+    def items(self):
+        if self.cart is None:
+            return CartItem.objects.none()
+        return self.cart.items.select_related('product__category')
+
+    def contents(self):
+        if self.owner is None:
+            return CartContents([])
+        # Filtra por propietario en la misma consulta, sin leer antes el Cart
+        items = CartItem.objects.filter(cart__in=Cart.objects.filter(**self.lookup))
+        return CartContents.from_queryset(items.select_related('product__category').order_by('pk'))
+
+    def add_many(self, quantities):
+        existing = {}
+        if self.cart is not None:
+            existing = {item.product_id: item for item in self.cart.items.filter(product_id__in=list(quantities))}
+        targets, errors = self._capped(quantities, {pk: item.quantity for pk, item in existing.items()})
+        if not targets:
+            return errors
+        cart = self._get_or_create_cart()
+        now = timezone.now()
+        with transaction.atomic():
+            changed = [item for pk, item in existing.items() if pk in targets]
+            for item in changed:
+                item.quantity = targets[item.product_id]
+                item.updated_at = now
+            CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product_id=pk, quantity=quantity)
+                for pk, quantity in targets.items() if pk not in existing
+            ])
+        return errors
+
+    def update(self, quantities):
+        if self.cart is None:
+            return {line_id: NOT_IN_CART for line_id in quantities}
+        # Una lectura, un UPDATE en bloque y un DELETE, sin importar cuántas líneas cambien
+        items = self.cart.items.select_related('product').in_bulk(list(quantities))
+        changed, removed, errors = [], [], {}
+        now = timezone.now()
+        for line_id, quantity in quantities.items():
+            item = items.get(line_id)
+            error = NOT_IN_CART if item is None else stock_error(item.product, quantity)
+            if error:
+                errors[line_id] = error
+            elif quantity <= 0:
+                removed.append(line_id)
+            elif quantity != item.quantity:
+                item.quantity = quantity
+                item.updated_at = now
+                changed.append(item)
+        with transaction.atomic():
+            if changed:
+                CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+            if removed:
+                CartItem.objects.filter(pk__in=removed).delete()
+        return errors
+
+    def remove(self, line_id):
+        if self.cart is None:
+            return None
+        item = self.cart.items.select_related('product').filter(pk=line_id).first()
+        if item is not None:
+            item.delete()
+        return item
+
+    def clear(self):
+        if self.cart is not None:
+            self.cart.items.all().delete()
+
+    def summary(self):
+        from .cart import compute_cart_summary
+        return compute_cart_summary(self.owner)
+
+
+class CacheCartStore(BaseCartStore):
+    """Carrito anónimo en cache: un solo valor {product_id: cantidad} por visitante
+
+    No crea filas en la BD; se convierte en Cart/CartItem al iniciar sesión
+    (ver merge_anonymous_cart). Las líneas se identifican por el id del producto.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        token = get_cart_token(request)
+        self.owner = f'anon:{token}' if token else None
+
+    @property
+    def key(self):
+        return f'cart:{self.owner}'
+
+    def lines(self):
+        if self.owner is None:
+            return {}
+        return cache.get(self.key) or {}
+
+    def _save(self, lines):
+        if self.owner is None:
+            self.owner = f'anon:{get_cart_token(self.request, create=True)}'
+        if lines:
+            cache.set(self.key, lines, ANONYMOUS_CART_TIMEOUT)
+        else:
+            cache.delete(self.key)
+
+    def items(self):
+        lines = self.lines()
+        products = Product.objects.select_related('category').in_bulk(lines)
+        return [CartLine(products[pk], quantity) for pk, quantity in lines.items() if pk in products]
+
+    def contents(self):
+        return CartContents.from_lines(self.items())
+
+    def add_many(self, quantities):
+        lines = self.lines()
+        targets, errors = self._capped(quantities, lines)
+        if targets:
+            lines.update(targets)
+            self._save(lines)
+        return errors
+
+    def update(self, quantities):
+        lines = self.lines()
+        products = Product.objects.only('pk', 'name', 'stock_quantity', 'status').in_bulk(
+            [pk for pk in quantities if pk in lines]
+        )
+        errors = {}
+        for pk, quantity in quantities.items():
+            error = NOT_IN_CART if pk not in products else stock_error(products[pk], quantity)
+            if error:
+                errors[pk] = error
+            elif quantity <= 0:
+                del lines[pk]
+            else:
+                lines[pk] = quantity
+        if len(errors) < len(quantities):
+            self._save(lines)
+        return errors
+
+    def remove(self, line_id):
+        lines = self.lines()
+        if line_id not in lines:
+            return None
+        quantity = lines.pop(line_id)
+        self._save(lines)
+        product = Product.objects.filter(pk=line_id).first()
+        return CartLine(product, quantity) if product else None
+
+    def clear(self):
+        if self.owner is not None:
+            cache.delete(self.key)
+
+    def summary(self):
+        lines = self.lines()
+        prices = Product.objects.filter(pk__in=lines).values_list('pk', 'price') if lines else []
+        return {
+            'count': sum(lines[pk] for pk, _ in prices),
+            'total': sum((price * lines[pk] for pk, price in prices), Decimal('0.00')),
+        }
+
+
+def get_anonymous_store_class():
+    return import_string(getattr(settings, 'CART_ANONYMOUS_STORE', 'orders.cart_storage.CacheCartStore'))
+
+
+def get_cart_store(request):
+    """Almacenamiento del carrito de la petición (uno por petición)"""
+    store = getattr(request, '_cart_store', None)
+    if store is None:
+        if request.user.is_authenticated:
+            store = DatabaseCartStore(user=request.user)
+        else:
+            store = get_anonymous_store_class()(request)
+        request._cart_store = store
+    return store
+
+
+def merge_anonymous_cart(request, user):
+    """Pasar el carrito anónimo de la sesión al carrito en BD del usuario"""
+    if get_cart_token(request) is None:
+        return {}
+    anonymous = get_anonymous_store_class()(request)
+    lines = anonymous.lines()
+    if lines:
+        DatabaseCartStore(user=user).add_many(lines)
+    anonymous.clear()
+    if isinstance(anonymous, DatabaseCartStore) and anonymous.cart is not None:
+        anonymous.cart.delete()
+    del request.session[CART_TOKEN_SESSION_KEY]
+    request.__dict__.pop('_cart_store', None)
+    return lines
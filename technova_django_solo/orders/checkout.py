@@ -0,0 +1,276 @@
+"""
+Servicio de checkout
+Aparta inventario con vencimiento, crea el pedido, descuenta inventario y vacía el carrito en una sola transacción
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from core.cache import bump_catalog_version
+from products.models import Product
+from .models import CartItem, Order, OrderItem, StockReservation
+from .numbering import next_order_number
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCartError(CheckoutError):
+    pass
+
+
+class OutOfStockError(CheckoutError):
+    """Algún producto no tiene inventario suficiente"""
+
+    def __init__(self, products):
+        self.products = products
+        super().__init__(', '.join(product.name for product in products))
+
+
+def cart_quantities(cart_items):
+    """Cantidad total por producto (un producto puede repetirse en varias líneas)"""
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product.pk] = quantities.get(item.product.pk, 0) + item.quantity
+    return quantities
+
+
+def decrement_stock(quantities):
+    """Descontar inventario con un único UPDATE condicional
+
+    Cada fila sólo se actualiza si ``stock_quantity >= cantidad``; si alguna
+    no cumple, se lanza OutOfStockError y la transacción que envuelve la
+    llamada se revierte. La condición se evalúa dentro del UPDATE, así que dos
+    checkouts concurrentes nunca pueden vender más de lo que hay.
+    """
+    if not quantities:
+        return
+    requested = _per_product(quantities)
+    updated = (
+        Product.objects
+        .filter(id__in=list(quantities), stock_quantity__gte=requested)
+        .update(stock_quantity=F('stock_quantity') - requested)
+    )
+    if updated != len(quantities):
+        short = Product.objects.filter(id__in=list(quantities), stock_quantity__lt=requested)
+        raise OutOfStockError(list(short))
+    mark_sold_out(quantities)
+
+
+def restore_stock(quantities):
+    """Devolver al inventario las unidades de reservas liberadas, con un único UPDATE"""
+    if not quantities:
+        return
+    Product.objects.filter(id__in=list(quantities)).update(
+        stock_quantity=F('stock_quantity') + _per_product(quantities)
+    )
+    mark_restocked(quantities)
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def mark_sold_out(product_ids):
+    """Pasar a 'out_of_stock' los productos activos que se quedaron sin existencias"""
+    changed = Product.objects.filter(id__in=list(product_ids), status='active', stock_quantity=0).update(
+        status='out_of_stock', sold_out_automatically=True,
+    )
+    if changed:
+        # update() no dispara las señales del catálogo
+        bump_catalog_version()
+    return changed
+
+
+def mark_restocked(product_ids):
+    """Reactivar los productos que mark_sold_out agotó y vuelven a tener existencias
+
+    Los que un administrador marcó 'out_of_stock' a mano se quedan como están.
+    """
+    changed = Product.objects.filter(
+        id__in=list(product_ids), status='out_of_stock', sold_out_automatically=True, stock_quantity__gt=0,
+    ).update(status='active', sold_out_automatically=False)
+    if changed:
+        bump_catalog_version()
+    return changed
+
+
+def cart_owner(cart):
+    """Propietario del carrito con el formato de orders.cart.get_cart_owner"""
+    return f'user:{cart.user_id}' if cart.user_id else f'anon:{cart.session_id}'
+
+
+def hold_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_HOLD_TTL', 15 * 60))
+
+
+def hold_max_age():
+    return timedelta(seconds=getattr(settings, 'STOCK_HOLD_MAX_AGE', 45 * 60))
+
+
+def hold_window_key(owner):
+    return f'stock_hold_window:{owner}'
+
+
+def hold_window_start(owner, now):
+    """Inicio de la ventana de reservas del propietario; renovar o cambiar el carrito no la reinicia
+
+    La ventana dura STOCK_HOLD_MAX_AGE y, al terminar, el propietario pasa
+    STOCK_HOLD_COOLDOWN sin poder apartar nada (aún puede comprar: el pedido
+    descuenta el stock al confirmarse).
+    """
+    cooldown = getattr(settings, 'STOCK_HOLD_COOLDOWN', 15 * 60)
+    cache.add(hold_window_key(owner), now, int(hold_max_age().total_seconds()) + cooldown)
+    return cache.get(hold_window_key(owner)) or now
+
+
+def _held(owner):
+    return list(StockReservation.objects.select_for_update().filter(owner=owner, status='held'))
+
+
+def _held_quantities(holds):
+    quantities = {}
+    for hold in holds:
+        quantities[hold.product_id] = quantities.get(hold.product_id, 0) + hold.quantity
+    return quantities
+
+
+def _close(holds, status, **fields):
+    StockReservation.objects.filter(pk__in=[hold.pk for hold in holds], status='held').update(status=status, **fields)
+
+
+def _release(holds, status):
+    restore_stock(_held_quantities(holds))
+    _close(holds, status)
+
+
+def hold_stock(owner, quantities, ttl=None):
+    """Apartar el inventario del carrito al empezar el checkout
+
+    Descuenta el stock con el mismo UPDATE condicional que el pedido, así que
+    lo apartado deja de estar disponible para los demás hasta que se confirme
+    el pedido o venza la reserva. Si el propietario ya tiene reservas con las
+    mismas cantidades sólo se renueva su vencimiento; si el carrito cambió se
+    liberan y se vuelve a apartar. Lanza OutOfStockError sin tocar nada.
+
+    Para que nadie acapare un producto recargando el checkout, ninguna reserva
+    vence después del fin de la ventana del propietario (hold_window_start) y
+    sólo se apartan líneas de hasta STOCK_HOLD_MAX_QUANTITY unidades; el resto
+    se descuenta al confirmar el pedido.
+    """
+    now = timezone.now()
+    deadline = hold_window_start(owner, now) + hold_max_age()
+    expires_at = min(now + (ttl or hold_ttl()), deadline)
+    limit = getattr(settings, 'STOCK_HOLD_MAX_QUANTITY', 5)
+    holdable = {product_id: quantity for product_id, quantity in quantities.items() if quantity <= limit}
+    with transaction.atomic():
+        holds = _held(owner)
+        if holds and _held_quantities(holds) == holdable:
+            if now < deadline:
+                StockReservation.objects.filter(pk__in=[hold.pk for hold in holds]).update(expires_at=expires_at)
+            return holds
+        if holds:
+            _release(holds, 'released')
+        if now >= deadline or not holdable:
+            return []
+        decrement_stock(holdable)
+        return StockReservation.objects.bulk_create([
+            StockReservation(owner=owner, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in holdable.items()
+        ])
+
+
+def release_holds(owner):
+    """Liberar las reservas vigentes de un propietario; devuelve cuántas había"""
+    with transaction.atomic():
+        holds = _held(owner)
+        if holds:
+            _release(holds, 'released')
+    return len(holds)
+
+
+def release_expired_holds(batch_size=1000, now=None):
+    """Devolver al inventario las reservas vencidas, por lotes
+
+    Cada lote es una transacción con un UPDATE de stock para todos sus
+    productos. En PostgreSQL las filas que un checkout tiene bloqueadas se
+    saltan (skip_locked) y se liberan en la siguiente pasada si siguen vencidas.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            holds = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(status='held', expires_at__lte=now)
+                .order_by('expires_at')[:batch_size]
+            )
+            if holds:
+                _release(holds, 'expired')
+        released += len(holds)
+        if len(holds) < batch_size:
+            return released
+
+
+def place_order(cart, cart_items, order_number=None, **order_fields):
+    """Crear el pedido a partir de las líneas del carrito ya cargadas
+
+    ``cart_items`` debe venir con ``select_related('product')``: los datos del
+    producto (nombre, SKU, imagen, precio) se copian de esas filas sin nuevas
+    consultas. El número de consultas es fijo sin importar cuántas líneas
+    tenga el carrito: reservas del propietario, UPDATE de inventario de las
+    líneas sin reserva, INSERT del pedido, INSERT masivo de las líneas y
+    DELETE del carrito.
+    """
+    cart_items = list(cart_items)
+    if not cart_items:
+        raise EmptyCartError()
+
+    lines = []
+    subtotal = Decimal('0.00')
+    for item in cart_items:
+        product = item.product
+        line_total = product.price * item.quantity
+        subtotal += line_total
+        lines.append(OrderItem(
+            product=product,
+            quantity=item.quantity,
+            unit_price=product.price,
+            total_price=line_total,
+            product_name=product.name,
+            product_sku=product.sku or '',
+            product_image=product.primary_image.name if product.primary_image else None,
+        ))
+
+    # Se reserva fuera de la transacción para aprovechar el bloque en memoria
+    order_fields['order_number'] = order_number or next_order_number()
+
+    quantities = cart_quantities(cart_items)
+    with transaction.atomic():
+        # Las reservas del checkout ya descontaron el stock de las líneas que cubren;
+        # si alguna no coincide con el carrito actual se liberan todas
+        holds = _held(cart_owner(cart))
+        held = _held_quantities(holds)
+        if any(quantities.get(product_id) != quantity for product_id, quantity in held.items()):
+            _release(holds, 'released')
+            holds, held = [], {}
+        decrement_stock({product_id: quantity for product_id, quantity in quantities.items() if product_id not in held})
+        order = Order.objects.create(subtotal=subtotal, total_amount=subtotal, **order_fields)
+        if holds:
+            _close(holds, 'committed', order=order)
+        for line in lines:
+            line.order = order
+        OrderItem.objects.bulk_create(lines)
+        CartItem.objects.filter(cart=cart).delete()
+
+    return order
@@ -0,0 +1,53 @@
+"""
+Exportación de pedidos
+Una fila por línea de pedido, con los datos del pedido y las direcciones JSON aplanadas
+"""
+
+from core.exports import Export
+from .models import Order, OrderItem
+
+# Claves que guarda el checkout en shipping_address / billing_address
+ADDRESS_FIELDS = ['address', 'city', 'postal_code']
+ADDRESS_COLUMNS = [('shipping', 'order__shipping_address'), ('billing', 'order__billing_address')]
+
+
+class OrderLineExport(Export):
+    name = 'pedidos'
+    columns = [
+        ('order_number', 'order__order_number'),
+        ('created_at', 'order__created_at'),
+        ('status', 'order__status'),
+        ('payment_status', 'order__payment_status'),
+        ('payment_method', 'order__payment_method'),
+        ('user_id', 'order__user_id'),
+        ('email', 'order__email'),
+        ('phone', 'order__phone'),
+        ('order_subtotal', 'order__subtotal'),
+        ('order_total', 'order__total_amount'),
+        ('product_id', 'product_id'),
+        ('product_sku', 'product_sku'),
+        ('product_name', 'product_name'),
+        ('quantity', 'quantity'),
+        ('unit_price', 'unit_price'),
+        ('line_total', 'total_price'),
+        *ADDRESS_COLUMNS,
+    ]
+    ordering = ['order_id', 'pk']
+
+    @property
+    def headers(self):
+        plain = [header for header, _ in self.columns if header not in dict(ADDRESS_COLUMNS)]
+        return plain + [f'{prefix}_{field}' for prefix, _ in ADDRESS_COLUMNS for field in ADDRESS_FIELDS]
+
+    def get_queryset(self):
+        return Order.objects.all()
+
+    def source(self, queryset):
+        return OrderItem.objects.filter(order__in=queryset.values('pk'))
+
+    def transform(self, row):
+        for prefix, _ in ADDRESS_COLUMNS:
+            address = row.pop(prefix) or {}
+            for field in ADDRESS_FIELDS:
+                row[f'{prefix}_{field}'] = address.get(field, '') if isinstance(address, dict) else ''
+        return row
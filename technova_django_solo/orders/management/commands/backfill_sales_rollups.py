@@ -0,0 +1,42 @@
+"""
+Reconstruir el historial de resúmenes de ventas
+Uso: python manage.py backfill_sales_rollups [--start 2024-01-01] [--end 2024-12-31] [--chunk-days 31]
+"""
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.analytics import ONE_DAY, backfill_rollups
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value} (formato AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Agrega los pedidos por bloques de días; sin --start ni --end deja la marca de agua al día'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, help='Primer día (por defecto, el del primer pedido)')
+        parser.add_argument('--end', type=parse_date, help='Último día, incluido (por defecto, el del último pedido)')
+        parser.add_argument('--chunk-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(chunk_start, chunk_end, rows):
+            self.stdout.write(f'  {chunk_start} a {chunk_end - ONE_DAY}: {rows} filas acumuladas')
+
+        stats = backfill_rollups(
+            start=options['start'],
+            end=options['end'] + ONE_DAY if options['end'] else None,
+            chunk_days=options['chunk_days'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"{stats['days']} días, {stats['rows']} filas en {elapsed:.2f}s"))
@@ -0,0 +1,74 @@
+"""
+Benchmark de los totales del carrito
+Uso: python manage.py bench_cart_totals --sizes 1,10,50,100,200 --repeat 50 --output cart_totals.json
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmarks import benchmark_database, parse_sizes, seed_products, seed_users, timed, write_results
+from core.stats import summarize
+from orders.cart import compute_cart_summary
+from orders.cart_storage import DatabaseCartStore
+from orders.models import Cart, CartItem
+from products.models import Product
+
+
+def python_totals(cart):
+    """Esquema anterior por petición: la vista suma en Python y el procesador de contexto vuelve a agregar"""
+    items = list(cart.items.select_related('product__category'))
+    totals = (
+        sum(item.quantity for item in items),
+        sum(item.total_price for item in items),
+        sum(item.total_savings for item in items),
+    )
+    compute_cart_summary(f'user:{cart.user_id}')
+    return totals
+
+
+def database_totals(user):
+    contents = DatabaseCartStore(user=user).contents()
+    return contents.count, contents.subtotal, contents.savings
+
+
+class Command(BaseCommand):
+    help = 'Compara los totales del carrito sumados en Python con los agregados en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50,100,200', help='Líneas por carrito')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        sizes = parse_sizes(options['sizes'])
+        results = {'repeat': options['repeat'], 'sizes': []}
+
+        with benchmark_database():
+            seed_products(max(sizes))
+            products = list(Product.objects.order_by('pk')[:max(sizes)])
+            users = seed_users(len(sizes))
+            for size, user in zip(sizes, users):
+                cart = Cart.objects.create(user=user)
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, product=product, quantity=1 + index % 3)
+                    for index, product in enumerate(products[:size])
+                ])
+                count, total, savings = python_totals(cart)
+                if database_totals(user) != (count, total, savings):
+                    self.stderr.write(f'Totales distintos con {size} líneas')
+
+                row = {'lines': size}
+                for name, func in (('python', lambda: python_totals(cart)), ('database', lambda: database_totals(user))):
+                    with CaptureQueriesContext(connection) as queries:
+                        func()
+                    row[name] = {'queries': len(queries), **summarize(timed(func, repeat=options['repeat']))}
+                results['sizes'].append(row)
+                self.stdout.write(
+                    f"  {size:>4} líneas: python p50={row['python']['p50_ms']:>7.3f}ms ({row['python']['queries']} consultas)  "
+                    f"bd p50={row['database']['p50_ms']:>7.3f}ms ({row['database']['queries']} consulta)"
+                )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
@@ -0,0 +1,96 @@
+"""
+Benchmark del generador de números de pedido
+Uso: python manage.py bench_order_numbers --count 1000000 --block-sizes 10,100,1000 --threads 4
+"""
+
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from core.benchmarks import benchmark_database, parse_sizes, write_results
+from orders.models import OrderNumberSequence
+from orders.numbering import OrderNumberAllocator, format_order_number
+
+LEGACY_SPACE = 900000
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento y verifica la unicidad de los números de pedido reservados por bloques'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000, help='Números a generar por escenario')
+        parser.add_argument('--block-sizes', default='10,100,1000,10000')
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        threads = max(1, options['threads'])
+        results = {'count': count, 'threads': threads, 'legacy': self.legacy_collisions(count), 'blocks': []}
+        self.stdout.write(
+            f"Esquema anterior ORD + random(900000): {results['legacy']['duplicates']} duplicados en {count} números"
+        )
+
+        with benchmark_database():
+            for block_size in parse_sizes(options['block_sizes']):
+                row = self.run_scenario(count, block_size, threads)
+                results['blocks'].append(row)
+                self.stdout.write(
+                    f"  bloque {block_size:>6}: {row['per_second']:>12,.0f} números/s  "
+                    f"viajes a BD {row['round_trips']:>7}  únicos={row['unique']}  ordenados={row['ordered']}"
+                )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def legacy_collisions(self, count):
+        rng = random.Random(42)
+        seen = set()
+        duplicates = 0
+        for _ in range(count):
+            value = rng.randint(100000, 999999)
+            if value in seen:
+                duplicates += 1
+            seen.add(value)
+        return {'space': LEGACY_SPACE, 'duplicates': duplicates}
+
+    def run_scenario(self, count, block_size, threads):
+        allocator = OrderNumberAllocator(name=f'bench-{block_size}', block_size=block_size)
+        per_thread = [[] for _ in range(threads)]
+        quota = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+
+        def work(index):
+            values = per_thread[index]
+            try:
+                while len(values) < quota[index]:
+                    try:
+                        values.append(allocator.next_value())
+                    except OperationalError:
+                        # SQLite en memoria bloquea la tabla entera con varios hilos
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        values = [value for chunk in per_thread for value in chunk]
+        numbers = {format_order_number(value) for value in values}
+        return {
+            'block_size': block_size,
+            'seconds': round(elapsed, 3),
+            'per_second': round(len(values) / elapsed, 1) if elapsed else None,
+            'round_trips': -(-OrderNumberSequence.objects.get(name=allocator.name).last_value // block_size),
+            'unique': len(numbers) == len(values) == count,
+            # Cada hilo debe recibir valores estrictamente crecientes
+            'ordered': all(chunk == sorted(chunk) and len(set(chunk)) == len(chunk) for chunk in per_thread),
+        }
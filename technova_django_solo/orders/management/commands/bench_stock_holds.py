@@ -0,0 +1,129 @@
+"""
+Benchmark de reservas de inventario con un solo producto muy disputado (venta relámpago)
+Uso: python manage.py bench_stock_holds --buyers 2000 --stock 500 --threads 8 --output holds.json
+"""
+
+import datetime
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from core.benchmarks import benchmark_database, seed_categories, write_results
+from core.stats import summarize
+from orders.checkout import OutOfStockError, hold_stock, release_expired_holds
+from orders.models import StockReservation
+from products.models import Product
+
+
+def naive_hold(product_id):
+    """Esquema ingenuo: leer el stock, comprobarlo en Python y escribir el nuevo valor"""
+    stock = Product.objects.values_list('stock_quantity', flat=True).get(pk=product_id)
+    if stock < 1:
+        raise OutOfStockError([])
+    Product.objects.filter(pk=product_id).update(stock_quantity=stock - 1)
+
+
+class Command(BaseCommand):
+    help = 'Compradores concurrentes apartando un mismo producto: rendimiento, rechazos y sobreventa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=2000)
+        parser.add_argument('--stock', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        results = {key: options[key] for key in ('buyers', 'stock', 'threads')}
+        with benchmark_database():
+            category = seed_categories(1)[0]
+            product = Product.objects.create(
+                name='Consola edición limitada', slug='consola-limitada', description='', category=category,
+                price=499, stock_quantity=options['stock'],
+            )
+            for name, hold in (
+                ('lectura y escritura', lambda owner: naive_hold(product.pk)),
+                ('reserva condicional', lambda owner: hold_stock(owner, {product.pk: 1})),
+            ):
+                Product.objects.filter(pk=product.pk).update(stock_quantity=options['stock'], status='active')
+                StockReservation.objects.all().delete()
+                row = self.run_scenario(name, hold, product, options)
+                results.setdefault('scenarios', []).append(row)
+                self.stdout.write(
+                    f"  {name:20} {row['per_second']:>8,.0f} intentos/s  apartados={row['held']:>5}  "
+                    f"agotado={row['sold_out']:>5}  reintentos={row['retries']:>6}  "
+                    f"sobreventa={row['oversold']:>5}  p50={row['latency']['p50_ms']}ms  p99={row['latency']['p99_ms']}ms"
+                )
+
+            # Todas las reservas vencen: el barrido devuelve el stock por lotes
+            start = time.perf_counter()
+            released = release_expired_holds(now=timezone.now() + datetime.timedelta(days=1))
+            elapsed = time.perf_counter() - start
+            product.refresh_from_db()
+            results['sweep'] = {
+                'released': released, 'seconds': round(elapsed, 3),
+                'stock_after': product.stock_quantity, 'status_after': product.status,
+            }
+            self.stdout.write(
+                f"  barrido: {released} reservas liberadas en {elapsed * 1000:.1f}ms  "
+                f"stock={product.stock_quantity} estado={product.status}"
+            )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def run_scenario(self, name, hold, product, options):
+        threads = max(1, options['threads'])
+        buyers = list(range(options['buyers']))
+        lock = threading.Lock()
+        outcomes = {'held': 0, 'sold_out': 0, 'retries': 0}
+        latencies = []
+        barrier = threading.Barrier(threads)
+
+        def work(index):
+            try:
+                barrier.wait()
+                for buyer in buyers[index::threads]:
+                    start = time.perf_counter()
+                    while True:
+                        try:
+                            hold(f'bench:{buyer}')
+                            outcome = 'held'
+                            break
+                        except OutOfStockError:
+                            outcome = 'sold_out'
+                            break
+                        except OperationalError:
+                            # SQLite bloquea la base entera con varios escritores: reintentar
+                            with lock:
+                                outcomes['retries'] += 1
+                            time.sleep(0.001)
+                    with lock:
+                        outcomes[outcome] += 1
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        return {
+            'mode': name,
+            'seconds': round(elapsed, 3),
+            'per_second': round(len(buyers) / elapsed, 1) if elapsed else None,
+            **outcomes,
+            # Unidades entregadas por encima del stock inicial
+            'oversold': max(0, outcomes['held'] - options['stock']),
+            'stock_after': product.stock_quantity,
+            'status_after': product.status,
+            'latency': summarize(latencies),
+        }
@@ -0,0 +1,44 @@
+"""
+Eliminar carritos abandonados de la base de datos
+Uso: python manage.py purge_carts [--days 30] [--batch-size 1000] [--dry-run]
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from orders.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Borra carritos anónimos y carritos vacíos sin actividad desde hace --days días'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Sólo contar, sin borrar')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Anónimos (de sesión) inactivos, o de usuario pero vacíos. Los almacenes modifican las
+        # líneas sin guardar el Cart: la última actividad es la de su línea más reciente
+        stale = (
+            Cart.objects.filter(updated_at__lt=cutoff)
+            .annotate(last_activity=Max('items__updated_at'))
+            .filter(Q(last_activity__isnull=True) | Q(user__isnull=True, last_activity__lt=cutoff))
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{stale.count()} carritos por borrar (anteriores a {cutoff:%Y-%m-%d})')
+            return
+
+        deleted = 0
+        while True:
+            # Lotes por id: cada DELETE es corto y no bloquea la tabla entera
+            ids = list(stale.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            Cart.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+        self.stdout.write(self.style.SUCCESS(f'{deleted} carritos borrados'))
@@ -0,0 +1,19 @@
+"""
+Devolver al inventario las reservas de checkout vencidas
+Uso: python manage.py release_stock_holds [--batch-size 1000]  (desde cron, p. ej. cada minuto)
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.checkout import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Libera en lotes las reservas de inventario cuyo plazo (STOCK_HOLD_TTL) ya venció'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        released = release_expired_holds(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{released} reservas liberadas'))
@@ -0,0 +1,16 @@
+"""
+Actualizar los resúmenes de ventas desde la marca de agua
+Uso: python manage.py update_sales_rollups  (desde cron, p. ej. cada 10 minutos)
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.analytics import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los días con pedidos nuevos o modificados desde la última ejecución'
+
+    def handle(self, *args, **options):
+        stats = refresh_rollups()
+        self.stdout.write(self.style.SUCCESS(f"{stats['days']} días recalculados ({stats['rows']} filas)"))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    OrderNumberSequence = apps.get_model('orders', 'OrderNumberSequence')
+    OrderNumberSequence.objects.get_or_create(name='orders')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Pedidos',
+                'verbose_name_plural': 'Secuencias de Pedidos',
+            },
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
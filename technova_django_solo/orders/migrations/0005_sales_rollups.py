@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de Agua',
+                'verbose_name_plural': 'Marcas de Agua',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('category', 'Categoría'), ('product', 'Producto'), ('payment_method', 'Método de pago')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=50)),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Ventas',
+                'verbose_name_plural': 'Resúmenes de Ventas',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='orders_orde_updated_94e16c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesrollup',
+            index=models.Index(fields=['dimension', 'date'], name='orders_sale_dimensi_0e99ef_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salesrollup',
+            unique_together={('dimension', 'key', 'date')},
+        ),
+    ]
@@ -3,14 +3,16 @@ Orders app models
 Modelos para gestión de pedidos, carritos y listas de deseos
 """
 
+from decimal import Decimal
+
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-import uuid
 
 
 def generate_order_number():
-    return f"TN{uuid.uuid4().hex[:10].upper()}"
+    from .numbering import next_order_number
+    return next_order_number()
 
 
 def get_order_item_image_path(instance, filename):
@@ -144,6 +146,9 @@ class Order(models.Model):
             models.Index(fields=['order_number']),
             models.Index(fields=['user', 'status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at', 'id']),
+            # Pedidos nuevos o modificados desde la marca de agua (ver orders.analytics)
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
@@ -188,3 +193,104 @@ class OrderItem(models.Model):
             
         self.total_price = self.unit_price * self.quantity
         super().save(*args, **kwargs)
+
+
+class OrderNumberSequence(models.Model):
+    """Contador compartido para los números de pedido (ver orders.numbering)"""
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Secuencia de Pedidos"
+        verbose_name_plural = "Secuencias de Pedidos"
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+
+class SalesRollup(models.Model):
+    """Ventas agregadas por día y dimensión (ver orders.analytics)"""
+
+    DIMENSION_CHOICES = [
+        ('total', 'Total'),
+        ('category', 'Categoría'),
+        ('product', 'Producto'),
+        ('payment_method', 'Método de pago'),
+    ]
+
+    date = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    # id de la categoría o del producto, clave del método de pago; vacío en 'total'
+    key = models.CharField(max_length=50, blank=True)
+    label = models.CharField(max_length=200, blank=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['dimension', 'key', 'date']
+        indexes = [
+            models.Index(fields=['dimension', 'date']),
+        ]
+        verbose_name = "Resumen de Ventas"
+        verbose_name_plural = "Resúmenes de Ventas"
+
+    def __str__(self):
+        return f"{self.date} {self.dimension}:{self.key} {self.revenue}"
+
+    @property
+    def average_order_value(self):
+        """Ticket promedio"""
+        if not self.orders:
+            return Decimal('0.00')
+        return (Decimal(self.revenue) / self.orders).quantize(Decimal('0.01'))
+
+
+class RollupWatermark(models.Model):
+    """Hasta dónde se procesaron los pedidos en cada resumen incremental"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Marca de Agua"
+        verbose_name_plural = "Marcas de Agua"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class StockReservation(models.Model):
+    """Inventario apartado para un carrito durante el checkout (ver orders.checkout)"""
+
+    STATUS_CHOICES = [
+        ('held', 'Apartado'),
+        ('committed', 'Confirmado'),
+        ('released', 'Liberado'),
+        ('expired', 'Expirado'),
+    ]
+
+    # Propietario del carrito: "user:<id>" o "anon:<token>"
+    owner = models.CharField(max_length=60)
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'status']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+        verbose_name = "Reserva de Inventario"
+        verbose_name_plural = "Reservas de Inventario"
+
+    def __str__(self):
+        return f"{self.owner} {self.product_id} x{self.quantity} ({self.status})"
@@ -3,4 +3,17 @@ Signals para la aplicación orders
 Maneja funcionalidades de pedidos y carritos
 """
 
-# Placeholder for orders signals
\ No newline at end of file
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .cart import refresh_cart_summary
+from .cart_storage import merge_anonymous_cart
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """Fusionar el carrito anónimo con el del usuario al iniciar sesión"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    if merge_anonymous_cart(request, user):
+        refresh_cart_summary(f'user:{user.pk}')
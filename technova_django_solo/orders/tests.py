@@ -0,0 +1,697 @@
+import datetime
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Category, Product
+from .analytics import backfill_rollups, refresh_rollups
+from .cart import CartSummary, get_cart_owner, refresh_cart_summary
+from .cart_storage import DatabaseCartStore
+from .checkout import OutOfStockError, hold_window_key, hold_stock, place_order, release_expired_holds
+from .models import (
+    Cart, CartItem, Order, OrderItem, OrderNumberSequence, RollupWatermark, SalesRollup, StockReservation,
+)
+from .numbering import OrderNumberAllocator, format_order_number
+from .totals import CartContents
+from . import views
+
+User = get_user_model()
+
+
+class CartSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.product = Product.objects.create(
+            name='Laptop', slug='laptop', description='Laptop', category=cls.category,
+            price=Decimal('100.00'), stock_quantity=10,
+        )
+        cls.user = User.objects.create_user(username='ana', email='ana@example.com', password='secreto123')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_visit_creates_no_cart_or_session(self):
+        response = self.client.get(reverse('core:contact'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_summary_is_lazy(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            summary = CartSummary(request)
+        with self.assertNumQueries(1):
+            self.assertEqual(summary.count, 0)
+            self.assertEqual(summary.total, Decimal('0.00'))
+        self.assertFalse(Cart.objects.exists())
+
+    def test_summary_is_cached_and_refreshed_by_views(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('orders:add_to_cart', args=[self.product.slug]), {'quantity': 3})
+        request = self.client.get(reverse('core:contact')).wsgi_request
+        with self.assertNumQueries(0):
+            summary = CartSummary(request)
+            self.assertEqual(summary.count, 3)
+            self.assertEqual(summary.total, Decimal('300.00'))
+
+        item = CartItem.objects.get()
+        self.client.post(reverse('orders:remove_from_cart', args=[item.id]))
+        self.assertEqual(CartSummary(request).count, 0)
+
+    def test_refresh_invalidates_previous_version(self):
+        cart = Cart.objects.create(user=self.user)
+        owner = f"user:{self.user.pk}"
+        self.assertEqual(refresh_cart_summary(owner)['count'], 0)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.assertEqual(refresh_cart_summary(owner)['count'], 2)
+        request = RequestFactory().get('/')
+        request.user = self.user
+        self.assertEqual(get_cart_owner(request), owner)
+        self.assertEqual(CartSummary(request).count, 2)
+
+    def test_price_change_invalidates_cached_total(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('orders:add_to_cart', args=[self.product.slug]), {'quantity': 2})
+        request = self.client.get(reverse('core:contact')).wsgi_request
+        self.assertEqual(CartSummary(request).total, Decimal('200.00'))
+        self.product.price = Decimal('90.00')
+        self.product.save()
+        self.assertEqual(CartSummary(request).total, Decimal('180.00'))
+
+
+class OrderListTests(TestCase):
+
+    def test_cursor_pagination(self):
+        user = User.objects.create_user(username='luis', email='luis@example.com', password='secreto123')
+        for _ in range(12):
+            Order.objects.create(user=user, email=user.email, phone='555', payment_method='paypal')
+        self.client.force_login(user)
+
+        first = self.client.get(reverse('orders:orders'))
+        self.assertEqual(len(first.context['orders']), 10)
+        self.assertContains(first, 'Siguiente')
+        second = self.client.get(reverse('orders:orders') + '?' + first.context['page_obj'].next_querystring)
+        self.assertEqual(len(second.context['orders']), 2)
+        self.assertContains(second, 'Anterior')
+
+
+class SalesRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ventas', email='ventas@example.com', password='x')
+        laptops = Category.objects.get(slug='laptops')
+        audio = Category.objects.get(slug='audio-video')
+        cls.laptop = Product.objects.create(category=laptops, name='Laptop', slug='laptop', description='', price=Decimal('1000.00'))
+        cls.speaker = Product.objects.create(category=audio, name='Bocina', slug='bocina', description='', price=Decimal('50.00'))
+        today = timezone.localdate()
+        cls.days = [today - datetime.timedelta(days=2), today - datetime.timedelta(days=1)]
+        cls.orders = [
+            cls.order(cls.days[0], 'paypal', [(cls.laptop, 1), (cls.speaker, 2)]),
+            cls.order(cls.days[0], 'credit_card', [(cls.speaker, 1)]),
+            cls.order(cls.days[1], 'paypal', [(cls.laptop, 2)]),
+            cls.order(cls.days[1], 'paypal', [(cls.speaker, 4)], status='cancelled'),
+        ]
+
+    @classmethod
+    def order(cls, day, payment_method, lines, status='confirmed'):
+        total = sum(product.price * quantity for product, quantity in lines)
+        order = Order.objects.create(
+            user=cls.user, email=cls.user.email, phone='555', payment_method=payment_method, status=status,
+            subtotal=total, total_amount=total,
+        )
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=product.price)
+        created = timezone.make_aware(datetime.datetime.combine(day, datetime.time(12)))
+        Order.objects.filter(pk=order.pk).update(created_at=created)
+        return order
+
+    def rollup(self, day, dimension, key=''):
+        row = SalesRollup.objects.get(date=day, dimension=dimension, key=str(key))
+        return row.orders, row.units, row.revenue
+
+    def test_backfill_aggregates_by_dimension(self):
+        stats = backfill_rollups(chunk_days=1)
+        self.assertEqual(stats['days'], 2)
+        first, second = self.days
+        self.assertEqual(self.rollup(first, 'total'), (2, 4, Decimal('1150.00')))
+        self.assertEqual(self.rollup(first, 'payment_method', 'paypal'), (1, 3, Decimal('1100.00')))
+        self.assertEqual(self.rollup(first, 'category', self.speaker.category_id), (2, 3, Decimal('150.00')))
+        self.assertEqual(self.rollup(second, 'product', self.laptop.pk), (1, 2, Decimal('2000.00')))
+        # El pedido cancelado no cuenta
+        self.assertEqual(self.rollup(second, 'total'), (1, 2, Decimal('2000.00')))
+        self.assertFalse(SalesRollup.objects.filter(date=second, dimension='product', key=str(self.speaker.pk)).exists())
+        self.assertIsNotNone(RollupWatermark.objects.get(name='sales_rollups').value)
+
+    @override_settings(SALES_ROLLUP_LAG=0)
+    def test_refresh_recomputes_changed_days_only(self):
+        backfill_rollups()
+        SalesRollup.objects.filter(date=self.days[1]).update(revenue=0)
+        untouched = SalesRollup.objects.filter(date=self.days[1]).count()
+
+        order = Order.objects.get(pk=self.orders[0].pk)
+        order.status = 'cancelled'
+        order.save()
+        with self.assertLogs('technova.analytics', 'INFO'):
+            stats = refresh_rollups()
+        self.assertEqual(stats['days'], 1)
+        self.assertEqual(self.rollup(self.days[0], 'total'), (1, 1, Decimal('50.00')))
+        self.assertFalse(SalesRollup.objects.filter(date=self.days[0], dimension='payment_method', key='paypal').exists())
+        self.assertEqual(SalesRollup.objects.filter(date=self.days[1], revenue=0).count(), untouched)
+
+    @override_settings(SALES_ROLLUP_LAG=0)
+    def test_ranged_backfill_leaves_watermark_unchanged(self):
+        backfill_rollups()
+        watermark = RollupWatermark.objects.get(name='sales_rollups').value
+        order = Order.objects.get(pk=self.orders[2].pk)
+        order.status = 'cancelled'
+        order.save()
+        backfill_rollups(start=self.days[0], end=self.days[1])
+        self.assertEqual(RollupWatermark.objects.get(name='sales_rollups').value, watermark)
+        # El pedido modificado fuera del rango sigue pendiente para refresh_rollups
+        with self.assertLogs('technova.analytics', 'INFO'):
+            self.assertEqual(refresh_rollups()['days'], 1)
+        self.assertFalse(SalesRollup.objects.filter(date=self.days[1], dimension='total').exists())
+
+    def test_dashboard_staff_only_and_reads_rollups(self):
+        backfill_rollups()
+        url = reverse('orders:sales_dashboard')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user(username='jefa', email='jefa@example.com', password='x', is_staff=True)
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['totals']['orders'], 3)
+        self.assertEqual(response.context['totals']['aov'], Decimal('1050.00'))
+        self.assertEqual(response.context['categories'][0]['name'], 'Laptops')
+        self.assertFalse([query for query in queries if 'orders_order' in query['sql'] and 'orders_orderitem' not in query['sql']])
+
+
+class AnonymousCartTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.user = User.objects.create_user(username='rosa', email='rosa@example.com', password='secreto123')
+        cls.laptop, cls.tablet = [
+            Product.objects.create(
+                name=name, slug=name.lower(), description='', category=cls.category,
+                price=Decimal(price), stock_quantity=10,
+            )
+            for name, price in (('Laptop', '100.00'), ('Tablet', '50.00'))
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, product, quantity):
+        return self.client.post(reverse('orders:add_to_cart', args=[product.slug]), {'quantity': quantity})
+
+    def test_anonymous_cart_lives_in_cache(self):
+        self.add(self.laptop, 2)
+        self.add(self.tablet, 1)
+        self.add(self.laptop, 1)
+        self.assertFalse(Cart.objects.exists())
+
+        response = self.client.get(reverse('orders:cart'))
+        self.assertEqual([(item.product, item.quantity) for item in response.context['cart_items']], [(self.laptop, 3), (self.tablet, 1)])
+        self.assertEqual(response.context['cart_total'], Decimal('350.00'))
+        self.assertEqual(response.context['cart_summary'].count, 4)
+
+        # Las líneas anónimas se identifican por el id del producto
+        self.client.post(reverse('orders:update_cart'), {f'quantity_{self.laptop.pk}': 1})
+        self.client.post(reverse('orders:remove_from_cart', args=[self.tablet.pk]))
+        response = self.client.get(reverse('orders:cart'))
+        self.assertEqual([(item.product, item.quantity) for item in response.context['cart_items']], [(self.laptop, 1)])
+        self.assertEqual(response.context['cart_summary'].total, Decimal('100.00'))
+
+    def test_login_merges_into_user_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.laptop, quantity=1)
+        self.add(self.laptop, 2)
+        self.add(self.tablet, 1)
+
+        self.assertTrue(self.client.login(username='rosa', password='secreto123'))
+        self.assertEqual(
+            dict(cart.items.values_list('product__slug', 'quantity')), {'laptop': 3, 'tablet': 1},
+        )
+        self.assertEqual(Cart.objects.count(), 1)
+        self.assertNotIn('cart_token', self.client.session)
+        response = self.client.get(reverse('orders:cart'))
+        self.assertEqual(response.context['cart_summary'].count, 4)
+
+    @override_settings(CART_ANONYMOUS_STORE='orders.cart_storage.DatabaseCartStore')
+    def test_database_store_for_anonymous(self):
+        self.add(self.tablet, 2)
+        anonymous = Cart.objects.get(user__isnull=True)
+        self.assertEqual(anonymous.session_id, self.client.session['cart_token'])
+
+        self.client.login(username='rosa', password='secreto123')
+        self.assertFalse(Cart.objects.filter(pk=anonymous.pk).exists())
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 2)
+
+    def test_add_caps_quantity_at_stock(self):
+        response = self.add(self.laptop, 999)
+        self.assertRedirects(response, reverse('orders:cart'), fetch_redirect_response=False)
+        self.add(self.laptop, 1)
+        self.client.login(username='rosa', password='secreto123')
+        self.assertEqual(CartItem.objects.get(cart__user=self.user, product=self.laptop).quantity, 10)
+        messages = [str(message) for message in self.client.get(reverse('orders:cart')).context['messages']]
+        self.assertIn('Sólo hay 10 unidades de Laptop', messages)
+
+    @override_settings(CART_ANONYMOUS_STORE='orders.cart_storage.DatabaseCartStore')
+    def test_database_store_caps_quantity_at_stock(self):
+        self.add(self.tablet, 8)
+        self.add(self.tablet, 8)
+        self.assertEqual(CartItem.objects.get(product=self.tablet).quantity, 10)
+        Product.objects.filter(pk=self.tablet.pk).update(stock_quantity=0)
+        self.add(self.tablet, 1)
+        self.assertEqual(CartItem.objects.get(product=self.tablet).quantity, 10)
+
+    def test_purge_stale_carts(self):
+        old = timezone.now() - datetime.timedelta(days=40)
+        stale_anonymous = Cart.objects.create(session_id='viejo')
+        CartItem.objects.create(cart=stale_anonymous, product=self.laptop)
+        stale_empty = Cart.objects.create(user=self.user)
+        active = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=active, product=self.laptop)
+        recent = Cart.objects.create(session_id='reciente')
+        Cart.objects.exclude(pk=recent.pk).update(updated_at=old)
+        CartItem.objects.update(updated_at=old)
+
+        call_command('purge_carts', days=30, stdout=StringIO())
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {active.pk, recent.pk})
+
+    @override_settings(CART_ANONYMOUS_STORE='orders.cart_storage.DatabaseCartStore')
+    def test_purge_keeps_old_carts_modified_recently(self):
+        self.add(self.laptop, 1)
+        cart = Cart.objects.get()
+        old = timezone.now() - datetime.timedelta(days=40)
+        Cart.objects.update(created_at=old, updated_at=old)
+        CartItem.objects.update(updated_at=old)
+        # Cambiar la cantidad sólo toca la línea, no el Cart
+        self.add(self.laptop, 1)
+        call_command('purge_carts', days=30, stdout=StringIO())
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+        CartItem.objects.update(updated_at=old)
+        call_command('purge_carts', days=30, stdout=StringIO())
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+
+
+class CartUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.user = User.objects.create_user(username='iris', email='iris@example.com', password='secreto123')
+        Product.objects.bulk_create([
+            Product(name=f'Mouse {i}', slug=f'mouse-{i}', description='', category=cls.category,
+                    price=Decimal('10.00'), stock_quantity=5)
+            for i in range(30)
+        ])
+        cls.products = list(Product.objects.filter(slug__startswith='mouse-').order_by('pk'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def fill_cart(self, products):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1) for product in products])
+        return list(cart.items.order_by('pk'))
+
+    def post_json(self, items):
+        return self.client.post(
+            reverse('orders:update_cart'), {'items': items}, content_type='application/json',
+        )
+
+    def test_query_count_does_not_depend_on_lines(self):
+        counts = []
+        for size in (3, 30):
+            Cart.objects.all().delete()
+            items = self.fill_cart(self.products[:size])
+            # La mitad cambia de cantidad y la otra mitad se elimina
+            data = {f'quantity_{item.pk}': (2 if i % 2 else 0) for i, item in enumerate(items)}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('orders:update_cart'), data)
+            self.assertRedirects(response, reverse('orders:cart'), fetch_redirect_response=False)
+            self.assertEqual(CartItem.objects.aggregate(total=Sum('quantity'))['total'], 2 * (size // 2))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        # Usuario, carrito y líneas, UPDATE + DELETE, resumen y guardado de la sesión (con savepoints)
+        self.assertLessEqual(counts[0], views.update_cart.query_budget)
+
+    def test_stock_is_validated_in_same_pass(self):
+        first, second = self.fill_cart(self.products[:2])
+        response = self.post_json([{'id': first.pk, 'quantity': 6}, {'id': second.pk, 'quantity': 4}])
+        self.assertEqual(response.status_code, 409)
+        payload = response.json()
+        self.assertEqual(list(payload['errors']), [str(first.pk)])
+        self.assertIn('Sólo hay 5', payload['errors'][str(first.pk)])
+        self.assertEqual((payload['count'], payload['total']), (5, '50.00'))
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 1)
+
+    def test_json_update_and_single_item_form(self):
+        first, second = self.fill_cart(self.products[:2])
+        response = self.post_json([{'id': first.pk, 'quantity': 3}, {'id': second.pk, 'quantity': 0}])
+        self.assertEqual(response.json(), {'ok': True, 'errors': {}, 'count': 3, 'total': '30.00'})
+        self.assertFalse(CartItem.objects.filter(pk=second.pk).exists())
+
+        self.client.post(reverse('orders:update_cart'), {'item_id': first.pk, 'quantity': 2})
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 2)
+        self.assertEqual(self.post_json('no es una lista').status_code, 400)
+
+    def test_user_without_cart(self):
+        response = self.post_json([{'id': 999, 'quantity': 1}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['count'], 0)
+        self.assertFalse(Cart.objects.exists())
+
+
+class CartContentsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.user = User.objects.create_user(username='olga', email='olga@example.com', password='secreto123')
+        cls.on_sale = Product.objects.create(
+            name='Monitor', slug='monitor', description='', category=cls.category,
+            price=Decimal('80.00'), compare_at_price=Decimal('100.00'), stock_quantity=10,
+        )
+        cls.regular = Product.objects.create(
+            name='Teclado', slug='teclado', description='', category=cls.category,
+            price=Decimal('50.00'), stock_quantity=10,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def fill(self):
+        self.client.post(reverse('orders:add_to_cart', args=[self.on_sale.slug]), {'quantity': 2})
+        self.client.post(reverse('orders:add_to_cart', args=[self.regular.slug]), {'quantity': 3})
+
+    def assertContents(self, contents):
+        self.assertEqual((contents.count, contents.subtotal, contents.savings), (5, Decimal('310.00'), Decimal('40.00')))
+        self.assertEqual([line.line_total for line in contents], [Decimal('160.00'), Decimal('150.00')])
+        self.assertEqual([line.line_savings for line in contents], [Decimal('40.00'), Decimal('0.00')])
+
+    def test_database_contents_in_one_query(self):
+        self.client.force_login(self.user)
+        self.fill()
+        store = DatabaseCartStore(user=self.user)
+        with self.assertNumQueries(1):
+            contents = store.contents()
+        self.assertContents(contents)
+        self.assertEqual(DatabaseCartStore(user=self.user).contents().count, 5)
+        with self.assertNumQueries(1):
+            self.assertFalse(DatabaseCartStore(user=User(pk=0)).contents())
+
+    def test_anonymous_contents_match(self):
+        self.fill()
+        response = self.client.get(reverse('orders:cart'))
+        self.assertContents(CartContents.from_lines(response.context['cart_items']))
+        self.assertEqual(response.context['cart_savings'], Decimal('40.00'))
+
+    def test_views_reuse_contents(self):
+        self.client.force_login(self.user)
+        self.fill()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:cart'))
+        self.assertEqual((response.context['cart_count'], response.context['cart_total']), (5, Decimal('310.00')))
+        # El contador de la cabecera usa las mismas líneas: no hay consulta agregada aparte
+        self.assertEqual(response.context['cart_summary'].count, 5)
+        self.assertEqual(sum('FROM "orders_cartitem"' in query['sql'] for query in queries), 1)
+        self.assertContains(response, 'Ahorras:')
+
+
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='laptops')
+        cls.user = User.objects.create_user(username='eva', email='eva@example.com', password='secreto123')
+        cls.products = [
+            Product.objects.create(
+                name=f'Laptop {i}', slug=f'laptop-{i}', sku=f'LP-{i}', description='Laptop',
+                category=cls.category, price=Decimal('100.00') + i, stock_quantity=5,
+            )
+            for i in range(5)
+        ]
+
+    def _cart(self, products, quantity=1):
+        cart = Cart.objects.create(user=self.user)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        return cart, list(cart.items.select_related('product'))
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        counts = []
+        for products in (self.products[:1], self.products):
+            cart, items = self._cart(products)
+            with CaptureQueriesContext(connection) as queries:
+                place_order(cart, items, user=self.user, email='eva@example.com', phone='1', payment_method='paypal')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_snapshot_and_totals(self):
+        cart, items = self._cart(self.products[:2], quantity=2)
+        order = place_order(cart, items, user=self.user, email='eva@example.com', phone='1', payment_method='paypal')
+        self.assertEqual(order.total_amount, Decimal('402.00'))
+        self.assertTrue(order.order_number.startswith('TN'))
+        lines = {line.product_sku: line for line in order.items.all()}
+        self.assertEqual(lines['LP-1'].product_name, 'Laptop 1')
+        self.assertEqual(lines['LP-1'].total_price, Decimal('202.00'))
+        self.assertFalse(cart.items.exists())
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 3)
+
+    def test_insufficient_stock_rolls_back(self):
+        cart, items = self._cart(self.products[:2], quantity=6)
+        with self.assertRaises(OutOfStockError) as ctx:
+            place_order(cart, items, user=self.user, email='eva@example.com', phone='1', payment_method='paypal')
+        self.assertEqual(len(ctx.exception.products), 2)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 2)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 5)
+
+    def test_stale_cart_rows_cannot_oversell(self):
+        first, first_items = self._cart(self.products[:1], quantity=4)
+        second, second_items = self._cart(self.products[:1], quantity=4)
+        place_order(first, first_items, user=self.user, email='eva@example.com', phone='1', payment_method='paypal')
+        # second_items aún ve stock_quantity=5 en memoria
+        with self.assertRaises(OutOfStockError):
+            place_order(second, second_items, user=self.user, email='eva@example.com', phone='1', payment_method='paypal')
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock_quantity, 1)
+
+    def test_checkout_confirm_view(self):
+        self._cart(self.products[:1], quantity=6)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('orders:checkout_confirm'), {
+            'email': 'eva@example.com', 'phone': '1', 'payment_method': 'paypal', 'same_as_shipping': 'on',
+        })
+        self.assertRedirects(response, reverse('orders:cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+class StockReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.get(slug='laptops')
+        cls.user = User.objects.create_user(username='flash', email='flash@example.com', password='x')
+        cls.product = Product.objects.create(
+            name='Consola Flash', slug='consola-flash', description='', category=category,
+            price=Decimal('300.00'), stock_quantity=3,
+        )
+
+    def _stock(self):
+        return Product.objects.values_list('stock_quantity', 'status').get(pk=self.product.pk)
+
+    def test_hold_takes_stock_and_marks_sold_out(self):
+        hold_stock('user:1', {self.product.pk: 2})
+        hold_stock('user:2', {self.product.pk: 1})
+        self.assertEqual(self._stock(), (0, 'out_of_stock'))
+        with self.assertRaises(OutOfStockError):
+            hold_stock('user:3', {self.product.pk: 1})
+        self.assertEqual(StockReservation.objects.filter(status='held').count(), 2)
+
+    def test_repeated_hold_renews_and_changed_cart_rebooks(self):
+        first = hold_stock('user:1', {self.product.pk: 1})
+        again = hold_stock('user:1', {self.product.pk: 1})
+        self.assertEqual([hold.pk for hold in first], [hold.pk for hold in again])
+        self.assertEqual(self._stock()[0], 2)
+        hold_stock('user:1', {self.product.pk: 3})
+        self.assertEqual(self._stock(), (0, 'out_of_stock'))
+        self.assertEqual(StockReservation.objects.get(pk=first[0].pk).status, 'released')
+
+    @override_settings(STOCK_HOLD_TTL=15 * 60, STOCK_HOLD_MAX_AGE=45 * 60, STOCK_HOLD_COOLDOWN=15 * 60)
+    def test_renewals_stop_at_the_owner_window(self):
+        owner = 'user:renueva'
+        cache.delete(hold_window_key(owner))
+        hold_stock(owner, {self.product.pk: 1})
+        now = timezone.now()
+        # Ventana abierta hace 40 minutos: la renovación sólo llega a su fin
+        cache.set(hold_window_key(owner), now - datetime.timedelta(minutes=40))
+        hold_stock(owner, {self.product.pk: 1})
+        hold = StockReservation.objects.get(owner=owner)
+        self.assertLessEqual(hold.expires_at, now + datetime.timedelta(minutes=5, seconds=1))
+        # Cambiar el carrito tampoco reinicia la ventana
+        hold_stock(owner, {self.product.pk: 2})
+        self.assertLessEqual(StockReservation.objects.get(owner=owner, status='held').expires_at,
+                             now + datetime.timedelta(minutes=5, seconds=1))
+        # Ventana agotada: la reserva vence, se libera y no se puede volver a apartar
+        cache.set(hold_window_key(owner), now - datetime.timedelta(minutes=50))
+        release_expired_holds(now=now + datetime.timedelta(minutes=6))
+        self.assertEqual(self._stock()[0], 3)
+        self.assertEqual(hold_stock(owner, {self.product.pk: 2}), [])
+        self.assertEqual(self._stock()[0], 3)
+
+    @override_settings(STOCK_HOLD_MAX_QUANTITY=2)
+    def test_large_lines_are_not_held(self):
+        cache.delete(hold_window_key('user:1'))
+        self.assertEqual(hold_stock('user:1', {self.product.pk: 3}), [])
+        self.assertEqual(self._stock(), (3, 'active'))
+
+    def test_sweeper_releases_expired_holds_in_bulk(self):
+        hold_stock('user:1', {self.product.pk: 2}, ttl=datetime.timedelta(seconds=-1))
+        hold_stock('user:2', {self.product.pk: 1})
+        self.assertEqual(self._stock(), (0, 'out_of_stock'))
+        self.assertEqual(release_expired_holds(batch_size=1), 1)
+        self.assertEqual(self._stock(), (2, 'active'))
+        statuses = dict(StockReservation.objects.values_list('owner', 'status'))
+        self.assertEqual(statuses, {'user:1': 'expired', 'user:2': 'held'})
+
+    def test_released_hold_keeps_manual_sold_out(self):
+        self.product.status = 'out_of_stock'
+        self.product.save()
+        hold_stock('user:1', {self.product.pk: 1}, ttl=datetime.timedelta(seconds=-1))
+        release_expired_holds()
+        # Tenía existencias: sólo un administrador lo había dado por agotado
+        self.assertEqual(self._stock(), (3, 'out_of_stock'))
+
+    def test_order_commits_holds_without_decrementing_again(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('orders:checkout')).status_code, 200)
+        self.assertEqual(self._stock()[0], 1)
+        order = place_order(cart, cart.items.select_related('product'), user=self.user,
+                            email='flash@example.com', phone='1', payment_method='paypal')
+        self.assertEqual(self._stock()[0], 1)
+        hold = StockReservation.objects.get()
+        self.assertEqual((hold.status, hold.order), ('committed', order))
+        self.assertEqual(release_expired_holds(now=timezone.now() + datetime.timedelta(days=1)), 0)
+
+    def test_checkout_redirects_when_stock_is_held_by_others(self):
+        hold_stock('user:999', {self.product.pk: 3})
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('orders:checkout'))
+        self.assertRedirects(response, reverse('orders:cart'), fetch_redirect_response=False)
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    """Prueba de estrés: muchos compradores simultáneos sobre el mismo producto"""
+    serialized_rollback = True
+    buyers = 12
+    stock = 5
+
+    def test_no_oversell(self):
+        category = Category.objects.create(name='Stress', slug='stress')
+        product = Product.objects.create(
+            name='Consola', slug='consola', description='Consola', category=category,
+            price=Decimal('300.00'), stock_quantity=self.stock,
+        )
+        carts = []
+        for i in range(self.buyers):
+            user = User.objects.create_user(username=f'comprador{i}', email=f'c{i}@example.com', password='x')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            carts.append((user, cart))
+
+        barrier = threading.Barrier(self.buyers)
+        results = []
+
+        def buy(user, cart):
+            try:
+                items = list(cart.items.select_related('product'))
+                barrier.wait()
+                for _ in range(50):
+                    try:
+                        place_order(cart, items, user=user, email=user.email, phone='1', payment_method='paypal')
+                        results.append('ok')
+                        return
+                    except OutOfStockError:
+                        results.append('agotado')
+                        return
+                    except OperationalError:
+                        # SQLite bloquea la tabla completa: reintentar
+                        time.sleep(0.01)
+                results.append('bloqueado')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=pair) for pair in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        self.assertGreaterEqual(product.stock_quantity, 0)
+        self.assertEqual(sold + product.stock_quantity, self.stock)
+        self.assertEqual(results.count('ok'), sold)
+        self.assertEqual(results.count('agotado'), self.buyers - sold)
+        self.assertEqual(Order.objects.count(), sold)
+
+
+class OrderNumberTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def setUp(self):
+        OrderNumberSequence.objects.create(name='test')
+
+    def test_blocks_are_disjoint_across_allocators(self):
+        # Dos allocators simulan dos workers de gunicorn
+        first = OrderNumberAllocator(name='test', block_size=10)
+        second = OrderNumberAllocator(name='test', block_size=10)
+        # BEGIN, UPDATE, SELECT, COMMIT: un solo viaje por bloque
+        with self.assertNumQueries(4):
+            values = [first.next_value() for _ in range(5)]
+        values += [second.next_value() for _ in range(15)] + [first.next_value() for _ in range(10)]
+        self.assertEqual(len(set(values)), len(values))
+        self.assertEqual(values[:5], [1, 2, 3, 4, 5])
+        self.assertEqual(values[5], 11)
+        self.assertEqual(OrderNumberSequence.objects.get(name='test').last_value, 40)
+
+    def test_inside_transaction_reserves_single_values(self):
+        allocator = OrderNumberAllocator(name='test', block_size=10)
+        with transaction.atomic():
+            self.assertEqual(allocator.next_value(), 1)
+            self.assertEqual(allocator.next_value(), 2)
+        self.assertEqual(OrderNumberSequence.objects.get(name='test').last_value, 2)
+
+    def test_format_is_time_ordered(self):
+        when = datetime.datetime(2025, 3, 14, tzinfo=datetime.timezone.utc)
+        self.assertEqual(format_order_number(1234, when), 'TN25031400001234')
+        self.assertLess(format_order_number(99, when), format_order_number(100, when))
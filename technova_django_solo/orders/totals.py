@@ -0,0 +1,94 @@
+"""
+Totales del carrito
+Cantidad, subtotal, ahorro y total por línea calculados por la base de datos en una sola consulta
+"""
+
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Value, When, Window
+
+ZERO = Decimal('0.00')
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def line_total_expression():
+    return ExpressionWrapper(F('quantity') * F('product__price'), output_field=MONEY)
+
+
+def line_savings_expression():
+    """Ahorro de la línea; mismo criterio que Product.is_on_sale"""
+    return Case(
+        When(
+            product__compare_at_price__gt=F('product__price'),
+            then=ExpressionWrapper(
+                (F('product__compare_at_price') - F('product__price')) * F('quantity'), output_field=MONEY,
+            ),
+        ),
+        default=Value(ZERO),
+        output_field=MONEY,
+    )
+
+
+def annotate_cart_lines(queryset):
+    """Anotar total y ahorro por línea y, con funciones de ventana, los del carrito entero
+
+    Cada fila lleva ``cart_count``, ``cart_subtotal`` y ``cart_savings``: las
+    líneas y los agregados salen de la misma consulta.
+    """
+    return queryset.annotate(
+        line_total=line_total_expression(),
+        line_savings=line_savings_expression(),
+        cart_count=Window(Sum('quantity')),
+        cart_subtotal=Window(Sum(line_total_expression()), output_field=MONEY),
+        cart_savings=Window(Sum(line_savings_expression()), output_field=MONEY),
+    )
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+class CartContents:
+    """Líneas del carrito y sus totales, calculados una vez por petición"""
+
+    def __init__(self, items, count=0, subtotal=ZERO, savings=ZERO):
+        self.items = items
+        self.count = count
+        self.subtotal = _money(subtotal)
+        self.savings = _money(savings)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        items = list(annotate_cart_lines(queryset))
+        if not items:
+            return cls([])
+        first = items[0]
+        return cls(items, first.cart_count, first.cart_subtotal, first.cart_savings)
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Para líneas que no están en la BD (ver cart_storage.CartLine)"""
+        lines = list(lines)
+        return cls(
+            lines,
+            sum(line.quantity for line in lines),
+            sum((line.line_total for line in lines), ZERO),
+            sum((line.line_savings for line in lines), ZERO),
+        )
+
+    @property
+    def total(self):
+        return self.subtotal
+
+    def as_summary(self):
+        """Formato del resumen cacheado (ver cart.CartSummary)"""
+        return {'count': self.count, 'total': self.subtotal}
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
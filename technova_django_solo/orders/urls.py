@@ -31,4 +31,7 @@ urlpatterns = [
     path('wishlist/', views.wishlist, name='wishlist'),
     path('wishlist/add/<slug:product_slug>/', views.add_to_wishlist, name='add_to_wishlist'),
     path('wishlist/remove/<int:item_id>/', views.remove_from_wishlist, name='remove_from_wishlist'),
+
+    # Analítica de ventas (personal)
+    path('ventas/', views.sales_dashboard, name='sales_dashboard'),
 ]
\ No newline at end of file
@@ -2,122 +2,147 @@
 Vistas para la aplicación orders
 Gestión de carritos, pedidos y listas de deseos
 """
-import random
+import json
+from decimal import Decimal
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction
-from django.core.paginator import Paginator
+from django.contrib.admin.views.decorators import staff_member_required
+from core.instrumentation import query_budget
+from core.pagination import paginate
 from products.models import Product
-from .models import Cart, CartItem, Order, OrderItem, Wishlist
+from .models import Cart, Order, Wishlist
+from .analytics import dashboard_data
+from .cart import get_cart_contents, get_cart_owner, refresh_request_cart
+from .cart_storage import get_cart_store
+from .checkout import EmptyCartError, OutOfStockError, cart_quantities, hold_stock, hold_ttl, place_order
 
 
-@login_required
+@query_budget(9)
 def cart_view(request):
-    """Ver carrito de compras"""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = cart.items.select_related('product').all()
-    cart_total = sum(item.total_price for item in cart_items)
-    cart_count = sum(item.quantity for item in cart_items)
+    """Ver carrito de compras (usuarios y visitantes anónimos)"""
+    contents = get_cart_contents(request)
     
     context = {
-        'cart': cart,
-        'cart_items': cart_items,
-        'cart_total': cart_total,
-        'cart_count': cart_count,
+        'cart_items': contents.items,
+        'cart_total': contents.subtotal,
+        'cart_count': contents.count,
+        'cart_savings': contents.savings,
     }
     
     return render(request, 'cart.html', context)
 
 
-@login_required
 def add_to_cart(request, product_slug):
     """Agregar producto al carrito"""
-    product = get_object_or_404(Product, slug=product_slug, status='active')
+    product = get_object_or_404(Product.objects.select_related('category'), slug=product_slug, status='active')
     
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
         
         if quantity <= 0:
             messages.error(request, 'La cantidad debe ser mayor a 0')
-            return redirect('products:product_detail', category_slug=product.category.slug, product_slug=product_slug)
+            return redirect('products:detail', category_slug=product.category.slug, product_slug=product_slug)
         
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        # Suma la cantidad si el producto ya está en el carrito, sin pasar del stock
+        error = get_cart_store(request).add(product, quantity)
         
-        # Verificar si el producto ya está en el carrito
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            # Si ya existe, sumar la cantidad
-            cart_item.quantity += quantity
-            cart_item.save()
-        
-        messages.success(request, f'{product.name} agregado al carrito')
+        refresh_request_cart(request)
+        if error:
+            messages.warning(request, error)
+        else:
+            messages.success(request, f'{product.name} agregado al carrito')
         return redirect('orders:cart')
     
     return redirect('products:detail', category_slug=product.category.slug, product_slug=product_slug)
 
 
-@login_required
 def remove_from_cart(request, item_id):
     """Remover item del carrito"""
-    cart_item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
-    product_name = cart_item.product.name
-    cart_item.delete()
+    removed = get_cart_store(request).remove(item_id)
+    if removed is None:
+        raise Http404('El producto no está en el carrito')
+    refresh_request_cart(request)
     
-    messages.success(request, f'{product_name} removido del carrito')
+    messages.success(request, f'{removed.product.name} removido del carrito')
     return redirect('orders:cart')
 
 
-@login_required
+def _parse_quantities(request):
+    """{line_id: cantidad} desde el formulario o un cuerpo JSON
+
+    Formulario: ``quantity_<id>=n`` (varias líneas) o ``item_id`` + ``quantity``.
+    JSON: ``{"items": [{"id": 12, "quantity": 2}, ...]}``.
+    """
+    if request.content_type == 'application/json':
+        payload = json.loads(request.body or b'{}')
+        return {int(line['id']): int(line['quantity']) for line in payload.get('items', [])}
+    quantities = {}
+    for key, value in request.POST.items():
+        if key.startswith('quantity_'):
+            quantities[int(key.split('_', 1)[1])] = int(value)
+    if 'item_id' in request.POST:
+        quantities[int(request.POST['item_id'])] = int(request.POST.get('quantity', 0))
+    return quantities
+
+
+@query_budget(11)
 def update_cart(request):
-    """Actualizar cantidades del carrito"""
-    if request.method == 'POST':
-        cart = Cart.objects.get(user=request.user)
-        
-        for key, value in request.POST.items():
-            if key.startswith('quantity_'):
-                item_id = key.split('_')[1]
-                try:
-                    quantity = int(value)
-                    cart_item = CartItem.objects.get(id=item_id, cart=cart)
-                    
-                    if quantity <= 0:
-                        cart_item.delete()
-                    else:
-                        cart_item.quantity = quantity
-                        cart_item.save()
-                        
-                except (ValueError, CartItem.DoesNotExist):
-                    continue
-        
-        messages.success(request, 'Carrito actualizado')
+    """Actualizar varias cantidades del carrito en un número fijo de consultas"""
+    if request.method != 'POST':
+        return redirect('orders:cart')
+    
+    wants_json = request.content_type == 'application/json'
+    try:
+        quantities = _parse_quantities(request)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        if wants_json:
+            return JsonResponse({'error': 'Formato de cantidades inválido'}, status=400)
+        messages.error(request, 'Cantidades inválidas')
         return redirect('orders:cart')
     
+    errors = get_cart_store(request).update(quantities)
+    summary = refresh_request_cart(request) or {'count': 0, 'total': Decimal('0.00')}
+    
+    if wants_json:
+        return JsonResponse({
+            'ok': not errors,
+            'errors': {str(line_id): message for line_id, message in errors.items()},
+            'count': summary['count'],
+            'total': f"{summary['total']:.2f}",
+        }, status=409 if errors else 200)
+    
+    for message in errors.values():
+        messages.warning(request, message)
+    if len(errors) < len(quantities):
+        messages.success(request, 'Carrito actualizado')
     return redirect('orders:cart')
 
 
+@query_budget(12)
 @login_required
 def checkout(request):
     """Página de checkout"""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = cart.items.select_related('product').all()
+    contents = get_cart_contents(request)
     
-    if not cart_items:
+    if not contents:
         messages.warning(request, 'Tu carrito está vacío')
         return redirect('core:home')
     
-    cart_total = sum(item.total_price for item in cart_items)
+    # Apartar el inventario mientras se completa el pedido (STOCK_HOLD_TTL)
+    try:
+        hold_stock(get_cart_owner(request), cart_quantities(contents.items))
+    except OutOfStockError as exc:
+        messages.error(request, f'Inventario insuficiente para: {exc}')
+        return redirect('orders:cart')
     
     context = {
-        'cart': cart,
-        'cart_items': cart_items,
-        'cart_total': cart_total,
+        'cart_items': contents.items,
+        'cart_total': contents.subtotal,
+        'cart_savings': contents.savings,
+        'hold_minutes': int(hold_ttl().total_seconds() // 60),
     }
     
     return render(request, 'checkout.html', context)
@@ -136,12 +161,13 @@ def checkout_confirm(request):
         messages.warning(request, 'Tu carrito está vacío')
         return redirect('core:home')
     
-    # Generar número de pedido
-    order_number = f"ORD{random.randint(100000, 999999)}"
-    
-    with transaction.atomic():
-        # Crear orden
-        order = Order.objects.create(
+    same_as_shipping = bool(request.POST.get('same_as_shipping'))
+    prefix = 'shipping' if same_as_shipping else 'billing'
+
+    try:
+        order = place_order(
+            cart,
+            cart_items,
             user=request.user,
             email=request.POST.get('email'),
             phone=request.POST.get('phone'),
@@ -151,29 +177,21 @@ def checkout_confirm(request):
                 'postal_code': request.POST.get('shipping_postal'),
             },
             billing_address={
-                'address': request.POST.get('billing_address') if not request.POST.get('same_as_shipping') else request.POST.get('shipping_address'),
-                'city': request.POST.get('billing_city') if not request.POST.get('same_as_shipping') else request.POST.get('shipping_city'),
-                'postal_code': request.POST.get('billing_postal') if not request.POST.get('same_as_shipping') else request.POST.get('shipping_postal'),
+                'address': request.POST.get(f'{prefix}_address'),
+                'city': request.POST.get(f'{prefix}_city'),
+                'postal_code': request.POST.get(f'{prefix}_postal'),
             },
             payment_method=request.POST.get('payment_method'),
-            subtotal=sum(item.total_price for item in cart_items),
-            total_amount=sum(item.total_price for item in cart_items),
-            order_number=order_number,
         )
-        
-        # Crear items de la orden
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                unit_price=cart_item.product.price,
-                total_price=cart_item.total_price,
-            )
-        
-        # Limpiar carrito
-        cart.items.all().delete()
-    
+    except OutOfStockError as exc:
+        messages.error(request, f'Inventario insuficiente para: {exc}')
+        return redirect('orders:cart')
+    except EmptyCartError:
+        messages.warning(request, 'Tu carrito está vacío')
+        return redirect('core:home')
+    order_number = order.order_number
+
+    refresh_request_cart(request)
     messages.success(request, f'Orden {order_number} creada exitosamente')
     return redirect('orders:order_success', order_number=order_number)
 
@@ -190,14 +208,12 @@ def order_success(request, order_number):
     return render(request, 'success.html', context)
 
 
+@query_budget(8)
 @login_required
 def order_list(request):
     """Lista de pedidos del usuario"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    
-    paginator = Paginator(orders, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    orders = Order.objects.filter(user=request.user)
+    page_obj = paginate(request, orders, 10, '-created_at')
     
     context = {
         'orders': page_obj,
@@ -207,10 +223,11 @@ def order_list(request):
     return render(request, 'order_list.html', context)
 
 
+@query_budget(9)
 @login_required
 def order_detail(request, order_number):
     """Detalle de un pedido"""
-    order = get_object_or_404(Order, order_number=order_number, user=request.user)
+    order = get_object_or_404(Order.objects.prefetch_related('items'), order_number=order_number, user=request.user)
     
     context = {
         'order': order,
@@ -235,6 +252,7 @@ def cancel_order(request, order_number):
     return redirect('orders:order_detail', order_number=order_number)
 
 
+@query_budget(8)
 @login_required
 def wishlist(request):
     """Lista de deseos del usuario"""
@@ -279,9 +297,7 @@ def remove_from_wishlist(request, item_id):
 @login_required
 def contact_info(request):
     """Vista para información de contacto"""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = cart.items.select_related('product').all()
-    cart_total = sum(item.total_price for item in cart_items)
+    contents = get_cart_contents(request)
     
     if request.method == 'POST':
         # Guardar información de contacto en la sesión
@@ -292,8 +308,22 @@ def contact_info(request):
         return redirect('orders:checkout')
     
     context = {
-        'cart_items': cart_items,
-        'cart_total': cart_total,
+        'cart_items': contents.items,
+        'cart_total': contents.subtotal,
+        'cart_savings': contents.savings,
     }
     
     return render(request, 'contact_info.html', context)
+
+
+@query_budget(12)
+@staff_member_required
+def sales_dashboard(request):
+    """Panel de ventas (sólo personal); lee únicamente los resúmenes diarios"""
+    try:
+        days = min(max(int(request.GET.get('dias', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    context = dashboard_data(days=days)
+    context['day_options'] = [7, 30, 90, 365]
+    return render(request, 'sales_dashboard.html', context)
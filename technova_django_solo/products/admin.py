@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from core.exports import ExportAdminMixin
+from .exports import ProductExport
 from .models import Category, Product, ProductImage, Review
+from .ratings import set_reviews_approval
+from .templatetags.product_images import image_url
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
@@ -26,7 +30,7 @@ class CategoryAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ExportAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'category', 'brand', 'price', 'compare_at_price', 'stock_quantity', 'status', 'is_on_sale')
     list_filter = ('status', 'condition', 'category', 'brand', 'created_at')
     search_fields = ('name', 'description', 'brand')
@@ -34,6 +38,8 @@ class ProductAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
     inlines = [ProductImageInline]
     readonly_fields = ('created_at', 'updated_at', 'discount_percentage')
+    actions = ['export_csv', 'export_jsonl']
+    export_class = ProductExport
     
     fieldsets = (
         ('Información Básica', {
@@ -91,7 +97,7 @@ class ProductImageAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />',
-                obj.image.url
+                image_url(obj, 'thumbnail')
             )
         return "Sin imagen"
     image_preview.short_description = 'Vista previa'
@@ -103,6 +109,8 @@ class ReviewAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'user__username', 'title', 'comment')
     ordering = ('-created_at',)
     list_editable = ('is_approved', 'is_verified_purchase')
+    list_select_related = ('product', 'user')
+    actions = ['approve_reviews', 'unapprove_reviews']
     
     fieldsets = (
         ('Información', {
@@ -112,3 +120,13 @@ class ReviewAdmin(admin.ModelAdmin):
             'fields': ('is_approved', 'is_verified_purchase')
         }),
     )
+    
+    @admin.action(description='Aprobar reseñas seleccionadas')
+    def approve_reviews(self, request, queryset):
+        updated = set_reviews_approval(queryset, True)
+        self.message_user(request, f'{updated} reseñas aprobadas')
+    
+    @admin.action(description='Desaprobar reseñas seleccionadas')
+    def unapprove_reviews(self, request, queryset):
+        updated = set_reviews_approval(queryset, False)
+        self.message_user(request, f'{updated} reseñas desaprobadas')
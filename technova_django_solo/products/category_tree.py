@@ -0,0 +1,86 @@
+"""
+Árbol de categorías en memoria
+Instantánea por proceso del árbol completo, invalidada al guardar/borrar categorías
+"""
+
+import threading
+
+from core.cache import bump_version, get_version
+from .models import Category
+
+TREE_VERSION_KEY = 'category_tree_version'
+
+# Iconos del menú principal por slug
+CATEGORY_ICONS = {
+    'smartphones': 'fa-mobile-alt',
+    'laptops': 'fa-laptop',
+    'tablets': 'fa-tablet-alt',
+    'audio-video': 'fa-headphones',
+}
+DEFAULT_ICON = 'fa-tag'
+
+
+class CategoryTree:
+    """Índices del árbol construidos con una sola consulta
+
+    Las categorías son instancias normales de ``Category``; se comparten entre
+    peticiones, así que deben tratarse como sólo lectura.
+    """
+
+    def __init__(self, categories):
+        self.by_id = {}
+        self.by_slug = {}
+        self.children = {}
+        for category in categories:
+            category.icon = CATEGORY_ICONS.get(category.slug, DEFAULT_ICON)
+            self.by_id[category.pk] = category
+            self.by_slug[category.slug] = category
+            self.children.setdefault(category.parent_id, []).append(category)
+
+        # Conjunto de descendientes (incluida la propia categoría) por id
+        self.descendants = {pk: {pk} for pk in self.by_id}
+        for category in self.by_id.values():
+            for ancestor_id in self._ancestor_ids(category):
+                self.descendants[ancestor_id].add(category.pk)
+
+        self.roots = [c for c in self.children.get(None, []) if c.is_active]
+
+    def _ancestor_ids(self, category):
+        return [int(segment) for segment in category.path.split('/')[:-2]]
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def get_children(self, category, active_only=True):
+        children = self.children.get(category.pk, [])
+        return [c for c in children if c.is_active] if active_only else list(children)
+
+    def get_ancestors(self, category):
+        """Ancestros desde la raíz (para migas de pan)"""
+        return [self.by_id[pk] for pk in self._ancestor_ids(category) if pk in self.by_id]
+
+    def descendant_ids(self, category):
+        """Ids de la categoría y de todo su subárbol, a cualquier profundidad"""
+        pk = getattr(category, 'pk', category)
+        return self.descendants.get(pk, {pk})
+
+
+_local = {'version': None, 'tree': None}
+_lock = threading.Lock()
+
+
+def get_category_tree():
+    """Instantánea del árbol; se reconstruye si otro proceso la invalidó"""
+    version = get_version(TREE_VERSION_KEY)
+    if _local['version'] != version:
+        with _lock:
+            if _local['version'] != version:
+                categories = Category.objects.order_by('depth', 'sort_order', 'name')
+                _local['tree'] = CategoryTree(categories)
+                _local['version'] = version
+    return _local['tree']
+
+
+def invalidate_category_tree():
+    _local['version'] = None
+    bump_version(TREE_VERSION_KEY)
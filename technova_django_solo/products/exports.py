@@ -0,0 +1,33 @@
+"""
+Exportación del catálogo
+Columnas de Product para core.exports (CSV/JSONL en streaming)
+"""
+
+from core.exports import Export
+from .models import Product
+
+
+class ProductExport(Export):
+    name = 'productos'
+    columns = [
+        ('id', 'id'),
+        ('sku', 'sku'),
+        ('name', 'name'),
+        ('slug', 'slug'),
+        ('category', 'category__slug'),
+        ('brand', 'brand'),
+        ('model', 'model'),
+        ('condition', 'condition'),
+        ('status', 'status'),
+        ('price', 'price'),
+        ('compare_at_price', 'compare_at_price'),
+        ('cost_price', 'cost_price'),
+        ('stock_quantity', 'stock_quantity'),
+        ('average_rating', 'average_rating'),
+        ('review_count', 'review_count'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]
+
+    def get_queryset(self):
+        return Product.objects.all()
@@ -0,0 +1,253 @@
+"""
+Navegación por facetas del catálogo
+Atributos aplanados de Product.specifications más marca, condición y rangos de precio
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.text import slugify
+
+from .models import Product, ProductAttribute
+
+BRAND_KEY = 'brand'
+CONDITION_KEY = 'condition'
+PRICE_KEY = 'precio'
+FILTER_PREFIX = 'f_'
+
+DEFAULT_FACETS = [BRAND_KEY, CONDITION_KEY, 'ram', 'almacenamiento', 'color']
+MAX_KEY_LENGTH = 50
+MAX_VALUE_LENGTH = 100
+
+# (mínimo, máximo exclusivo); None = sin límite superior
+PRICE_BUCKETS = [
+    (Decimal('0'), Decimal('500')),
+    (Decimal('500'), Decimal('1000')),
+    (Decimal('1000'), Decimal('5000')),
+    (Decimal('5000'), Decimal('10000')),
+    (Decimal('10000'), None),
+]
+
+CONDITION_LABELS = dict(Product.CONDITION_CHOICES)
+
+FACET_LABELS = {
+    BRAND_KEY: 'Marca',
+    CONDITION_KEY: 'Condición',
+    PRICE_KEY: 'Precio',
+}
+
+
+def normalize_key(key):
+    return slugify(str(key))[:MAX_KEY_LENGTH]
+
+
+def flatten_specifications(specifications, prefix=''):
+    """Pares (clave, valor) de un JSON libre; listas y objetos anidados incluidos"""
+    if isinstance(specifications, dict):
+        for key, value in specifications.items():
+            name = normalize_key(key)
+            yield from flatten_specifications(value, f'{prefix}-{name}' if prefix else name)
+    elif isinstance(specifications, (list, tuple)):
+        for value in specifications:
+            yield from flatten_specifications(value, prefix)
+    elif prefix and specifications not in (None, ''):
+        if isinstance(specifications, bool):
+            specifications = 'Sí' if specifications else 'No'
+        yield prefix[:MAX_KEY_LENGTH], str(specifications).strip()[:MAX_VALUE_LENGTH]
+
+
+def build_attributes(product):
+    attributes = set(flatten_specifications(product.specifications or {}))
+    if product.brand:
+        attributes.add((BRAND_KEY, product.brand.strip()[:MAX_VALUE_LENGTH]))
+    attributes.add((CONDITION_KEY, product.condition))
+    return attributes
+
+
+def _attribute_rows(products):
+    for product in products:
+        for key, value in build_attributes(product):
+            yield ProductAttribute(product_id=product.pk, key=key, value=value)
+
+
+def index_product_facets(products):
+    """Regenerar los atributos de facetas de los productos dados"""
+    products = list(products)
+    with transaction.atomic():
+        ProductAttribute.objects.filter(product_id__in=[p.pk for p in products]).delete()
+        ProductAttribute.objects.bulk_create(_attribute_rows(products), batch_size=1000)
+
+
+def rebuild_facet_index(batch_size=2000):
+    """Reconstruir la tabla de atributos completa; devuelve el número de productos"""
+    products = (
+        Product.objects.only('id', 'brand', 'condition', 'specifications')
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+    count = 0
+    pending = []
+    with transaction.atomic():
+        ProductAttribute.objects.all().delete()
+        for product in products:
+            count += 1
+            pending.extend(_attribute_rows([product]))
+            if len(pending) >= batch_size * 5:
+                ProductAttribute.objects.bulk_create(pending, batch_size=batch_size)
+                pending = []
+        ProductAttribute.objects.bulk_create(pending, batch_size=batch_size)
+    return count
+
+
+def price_bucket_key(bucket):
+    low, high = bucket
+    return f'{low:.0f}-{high:.0f}' if high is not None else f'{low:.0f}-'
+
+
+def price_bucket_label(bucket):
+    low, high = bucket
+    if high is None:
+        return f'Más de ${low:,.0f}'
+    return f'${low:,.0f} - ${high:,.0f}'
+
+
+class FacetQuery:
+    """Filtrado por facetas con conteos en vivo
+
+    Los valores de una misma faceta se combinan con OR y las facetas entre sí
+    con AND. El conteo de cada faceta ignora su propio filtro, de modo que el
+    usuario ve cuántos productos obtendría al marcar otra opción. El número de
+    consultas está acotado: una para las facetas sin selección, una por cada
+    faceta seleccionada y una para los rangos de precio.
+    """
+
+    def __init__(self, queryset, filters=None, price=None, facets=None, price_buckets=None):
+        self.queryset = queryset
+        self.facets = [normalize_key(key) for key in (facets or getattr(settings, 'PRODUCT_FACETS', DEFAULT_FACETS))]
+        self.filters = {
+            normalize_key(key): list(values)
+            for key, values in (filters or {}).items()
+            if values
+        }
+        self.price_buckets = price_buckets or PRICE_BUCKETS
+        self.price = None
+        if price:
+            self.price = next((b for b in self.price_buckets if price_bucket_key(b) == price), None)
+
+    @classmethod
+    def from_querydict(cls, queryset, querydict, **kwargs):
+        """Construir a partir de ``request.GET`` (?f_ram=8GB&f_brand=Sony&precio=500-1000)"""
+        filters = {
+            key[len(FILTER_PREFIX):]: querydict.getlist(key)
+            for key in querydict
+            if key.startswith(FILTER_PREFIX)
+        }
+        return cls(queryset, filters=filters, price=querydict.get(PRICE_KEY), **kwargs)
+
+    def _restrict(self, queryset, exclude=None):
+        for key, values in self.filters.items():
+            if key == exclude:
+                continue
+            queryset = queryset.filter(
+                id__in=ProductAttribute.objects.filter(key=key, value__in=values).values('product_id')
+            )
+        if self.price and exclude != PRICE_KEY:
+            queryset = queryset.filter(self._price_q(self.price))
+        return queryset
+
+    def _price_q(self, bucket):
+        low, high = bucket
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        return condition
+
+    def _ids(self, exclude=None):
+        return self._restrict(self.queryset, exclude).order_by().values('id')
+
+    @property
+    def products(self):
+        """Queryset filtrado (perezoso); el orden y la paginación siguen aplicando"""
+        return self._restrict(self.queryset)
+
+    def product_ids(self):
+        return list(self.products.values_list('id', flat=True))
+
+    def counts(self):
+        """Conteos por faceta: {clave: [{'value', 'count', 'selected'}, ...]}"""
+        counts = {key: [] for key in self.facets}
+
+        groups = [(None, [key for key in self.facets if key not in self.filters])]
+        groups += [(key, [key]) for key in self.facets if key in self.filters]
+        for exclude, keys in groups:
+            if not keys:
+                continue
+            rows = (
+                ProductAttribute.objects
+                .filter(key__in=keys, product_id__in=self._ids(exclude))
+                .values('key', 'value')
+                .annotate(count=Count('product_id'))
+                .order_by('key', '-count', 'value')
+            )
+            for row in rows:
+                counts[row['key']].append({
+                    'value': row['value'],
+                    'label': CONDITION_LABELS.get(row['value'], row['value']) if row['key'] == CONDITION_KEY else row['value'],
+                    'count': row['count'],
+                    'selected': row['value'] in self.filters.get(row['key'], []),
+                })
+
+        buckets = self._restrict(self.queryset, exclude=PRICE_KEY).order_by().aggregate(**{
+            f'bucket_{i}': Count('id', filter=self._price_q(bucket))
+            for i, bucket in enumerate(self.price_buckets)
+        })
+        counts[PRICE_KEY] = [
+            {
+                'value': price_bucket_key(bucket),
+                'label': price_bucket_label(bucket),
+                'count': buckets[f'bucket_{i}'],
+                'selected': bucket == self.price,
+            }
+            for i, bucket in enumerate(self.price_buckets)
+        ]
+        return counts
+
+
+def toggle_querystring(querydict, key, value):
+    """Query string de la URL que marca/desmarca un valor de faceta"""
+    params = querydict.copy()
+    params.pop('page', None)
+    params.pop('cursor', None)
+    if key == PRICE_KEY:
+        if params.get(PRICE_KEY) == value:
+            params.pop(PRICE_KEY)
+        else:
+            params[PRICE_KEY] = value
+        return params.urlencode()
+
+    name = FILTER_PREFIX + key
+    values = params.getlist(name)
+    if value in values:
+        values.remove(value)
+    else:
+        values.append(value)
+    params.setlist(name, values)
+    return params.urlencode()
+
+
+def facet_groups(facet_query, querydict):
+    """Facetas listas para la plantilla, con la URL para marcar/desmarcar cada valor"""
+    groups = []
+    for key, values in facet_query.counts().items():
+        if not values:
+            continue
+        for value in values:
+            value['query'] = toggle_querystring(querydict, key, value['value'])
+        groups.append({
+            'key': key,
+            'label': FACET_LABELS.get(key, key.replace('-', ' ').capitalize()),
+            'values': values,
+        })
+    return groups
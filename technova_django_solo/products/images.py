@@ -0,0 +1,185 @@
+"""
+Derivados de imágenes del catálogo
+Miniaturas de tamaño fijo y sus anchos para srcset (JPEG/PNG y WebP), con nombres por hash de contenido, generadas en segundo plano
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.cache import bump_catalog_version
+
+logger = logging.getLogger('technova.images')
+
+DERIVATIVES_DIR = 'derivatives'
+
+# nombre -> (ancho, alto, recortar al tamaño exacto)
+DERIVATIVE_SIZES = {
+    'thumbnail': (150, 150, True),
+    'card': (400, 400, True),
+    'detail': (1200, 1200, False),
+}
+# Anchos adicionales de cada tamaño para su srcset, con el mismo recorte y proporción
+SRCSET_WIDTHS = {
+    'thumbnail': (300,),
+    'card': (300, 800),
+    'detail': (600,),
+}
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'png', {'optimize': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+# Campo de imagen de cada modelo con derivados
+IMAGE_FIELDS = {
+    'Category': 'image',
+    'Product': 'primary_image',
+    'ProductImage': 'image',
+}
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def image_file(obj):
+    """FieldFile de la imagen principal del objeto (o None)"""
+    field = IMAGE_FIELDS.get(type(obj).__name__)
+    return getattr(obj, field, None) if field else None
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        return ImageOps.fit(image, (width, height), Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.LANCZOS)
+    return resized
+
+
+def render_derivatives(source_name, storage=None):
+    """Generar todos los tamaños de una imagen y devolver el manifiesto
+
+    No toca la base de datos, así que puede ejecutarse en otro proceso. Los
+    nombres incluyen el hash del contenido: si el archivo cambia, las URLs
+    cambian y los caches del navegador/CDN no sirven la versión vieja.
+    """
+    storage = storage or default_storage
+    with storage.open(source_name, 'rb') as fh:
+        data = fh.read()
+    digest = content_digest(data)
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    fallback = 'png' if _has_alpha(image) else 'jpeg'
+    image = image.convert('RGBA' if fallback == 'png' else 'RGB')
+
+    source = PurePosixPath(source_name)
+    sizes = {}
+    def save(resized, label):
+        entry = {'width': resized.width, 'height': resized.height}
+        for key, fmt in (('fallback', fallback), ('webp', 'webp')):
+            pil_format, extension, options = FORMATS[fmt]
+            name = f'{DERIVATIVES_DIR}/{source.parent}/{source.stem}-{label}-{digest}.{extension}'
+            if not storage.exists(name):
+                buffer = BytesIO()
+                resized.save(buffer, pil_format, **options)
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            entry[key] = name
+        return entry
+
+    for size, (width, height, crop) in DERIVATIVE_SIZES.items():
+        entry = save(_resize(image, width, height, crop), size)
+        # Escalera de anchos del srcset: sólo derivados de este tamaño, sin ampliar la original
+        ladder = {entry['width']: entry}
+        for extra in SRCSET_WIDTHS.get(size, ()):
+            box = (extra, round(extra * height / width))
+            if extra in ladder or (crop and (image.width < box[0] or image.height < box[1])):
+                continue
+            resized = _resize(image, *box, crop)
+            if resized.width not in ladder:
+                ladder[resized.width] = save(resized, f'{size}-{extra}w')
+        entry['srcset'] = [
+            {key: ladder[w][key] for key in ('width', 'fallback', 'webp')} for w in sorted(ladder)
+        ]
+        sizes[size] = entry
+    return {'source': source_name, 'digest': digest, 'sizes': sizes}
+
+
+def needs_derivatives(obj):
+    file = image_file(obj)
+    source = file.name if file else None
+    return source != ((obj.image_variants or {}).get('source'))
+
+
+def current_variants(obj):
+    """Manifiesto de derivados sólo si corresponde a la imagen actual"""
+    variants = getattr(obj, 'image_variants', None) or {}
+    file = image_file(obj)
+    if not file or variants.get('source') != file.name:
+        return None
+    return variants
+
+
+def generate_derivatives(obj):
+    """Generar y guardar los derivados de un objeto (sin disparar señales)"""
+    file = image_file(obj)
+    variants = {}
+    if file:
+        try:
+            variants = render_derivatives(file.name)
+        except (OSError, UnidentifiedImageError):
+            logger.exception('No se pudieron generar derivados de %s', file.name)
+            return None
+    type(obj).objects.filter(pk=obj.pk).update(image_variants=variants)
+    obj.image_variants = variants
+    bump_catalog_version()
+    return variants
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+                thread_name_prefix='image-derivatives',
+            )
+    return _executor
+
+
+def _generate_in_worker(model, pk):
+    close_old_connections()
+    try:
+        obj = model.objects.filter(pk=pk).first()
+        if obj is not None and needs_derivatives(obj):
+            generate_derivatives(obj)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(obj):
+    """Encolar la generación tras el commit (o ejecutarla ya si no es asíncrona)"""
+    if not needs_derivatives(obj):
+        return
+    if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        generate_derivatives(obj)
+        return
+    model, pk = type(obj), obj.pk
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_worker, model, pk))
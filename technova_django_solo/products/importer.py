@@ -0,0 +1,297 @@
+"""
+Importación masiva del catálogo
+Feeds CSV/JSONL de proveedores leídos en streaming, validados en paralelo y aplicados por lotes con upsert por SKU
+"""
+
+import csv
+import hashlib
+import json
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from core.cache import bump_catalog_version
+from .facets import index_product_facets
+from .models import Category, Product
+from .search import INDEXED_FIELDS, get_search_backend
+
+CATEGORY_SEPARATOR = '>'
+TEXT_FIELDS = {
+    'name': 200, 'brand': 100, 'model': 100, 'short_description': 300, 'dimensions': 100,
+}
+# Límite exclusivo de cada campo decimal según sus dígitos en la base de datos
+DECIMAL_LIMITS = {
+    name: Decimal(10) ** (Product._meta.get_field(name).max_digits - Product._meta.get_field(name).decimal_places)
+    for name in ['price', 'compare_at_price', 'cost_price', 'weight']
+}
+CATEGORY_NAME_LENGTH = Category._meta.get_field('name').max_length
+CONDITIONS = {key for key, _ in Product.CONDITION_CHOICES}
+STATUSES = {key for key, _ in Product.STATUS_CHOICES}
+# Columnas que el import escribe; en productos existentes se conservan slug y fecha de alta
+UPDATE_FIELDS = [
+    'name', 'description', 'short_description', 'category', 'brand', 'model',
+    'price', 'compare_at_price', 'cost_price', 'stock_quantity', 'condition', 'status',
+    'specifications', 'features', 'weight', 'dimensions', 'import_hash', 'updated_at',
+]
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def read_rows(path, fmt=None):
+    """Filas del feed como diccionarios, leídas en streaming"""
+    fmt = fmt or Path(path).suffix.lstrip('.').lower()
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+        elif fmt in ('jsonl', 'ndjson'):
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f'Formato no soportado: {fmt}')
+
+
+def _text(row, field, max_length=None, required=False):
+    value = str(row.get(field) or '').strip()
+    if required and not value:
+        raise ImportRowError(f'{field} es obligatorio')
+    if max_length and len(value) > max_length:
+        raise ImportRowError(f'{field} supera {max_length} caracteres')
+    return value
+
+
+def _decimal(row, field, required=False):
+    value = row.get(field)
+    if value in (None, ''):
+        if required:
+            raise ImportRowError(f'{field} es obligatorio')
+        return None
+    try:
+        number = Decimal(str(value).replace(',', '')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ImportRowError(f'{field} no es un número: {value!r}')
+    if number < 0 or number >= DECIMAL_LIMITS[field]:
+        raise ImportRowError(f'{field} fuera de rango: {value}')
+    return number
+
+
+def _json(row, field, expected):
+    value = row.get(field)
+    if value in (None, ''):
+        return expected()
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ImportRowError(f'{field} no es JSON válido')
+    if not isinstance(value, expected):
+        raise ImportRowError(f'{field} debe ser {"un objeto" if expected is dict else "una lista"}')
+    return value
+
+
+def clean_row(row):
+    """Validar y normalizar una fila del feed; devuelve (datos, None) o (None, error)
+
+    Función de módulo sin acceso a la base de datos para poder ejecutarse en
+    otros procesos.
+    """
+    try:
+        data = {'sku': _text(row, 'sku', 50, required=True)}
+        data.update({field: _text(row, field, max_length, required=field == 'name') for field, max_length in TEXT_FIELDS.items()})
+        data['description'] = _text(row, 'description')
+        data['category'] = tuple(
+            part.strip() for part in _text(row, 'category', required=True).split(CATEGORY_SEPARATOR) if part.strip()
+        )
+        for name in data['category']:
+            if len(name) > CATEGORY_NAME_LENGTH:
+                raise ImportRowError(f'category: {name[:20]}... supera {CATEGORY_NAME_LENGTH} caracteres')
+        for field in DECIMAL_LIMITS:
+            data[field] = _decimal(row, field, required=field == 'price')
+        try:
+            data['stock_quantity'] = int(row.get('stock_quantity') or 0)
+        except (TypeError, ValueError):
+            raise ImportRowError(f"stock_quantity no es un entero: {row.get('stock_quantity')!r}")
+        if data['stock_quantity'] < 0:
+            raise ImportRowError('stock_quantity no puede ser negativo')
+        data['condition'] = _text(row, 'condition') or 'new'
+        data['status'] = _text(row, 'status') or 'active'
+        if data['condition'] not in CONDITIONS:
+            raise ImportRowError(f"condition inválida: {data['condition']}")
+        if data['status'] not in STATUSES:
+            raise ImportRowError(f"status inválido: {data['status']}")
+        data['specifications'] = _json(row, 'specifications', dict)
+        data['features'] = _json(row, 'features', list)
+    except ImportRowError as exc:
+        return None, f"{row.get('sku') or '(sin sku)'}: {exc}"
+    data['import_hash'] = content_hash(data)
+    return data, None
+
+
+def content_hash(data):
+    """Huella estable del contenido normalizado de la fila"""
+    payload = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _unique_slug(base, taken, max_length):
+    base = base[:max_length] or 'producto'
+    slug, suffix = base, 2
+    while slug in taken:
+        tail = f'-{suffix}'
+        slug = f'{base[:max_length - len(tail)]}{tail}'
+        suffix += 1
+    taken.add(slug)
+    return slug
+
+
+class CategoryResolver:
+    """Rutas "Padre > Hija" -> id de categoría, creando las que falten
+
+    Category.name es único en todo el catálogo: una categoría existente se
+    reutiliza por nombre aunque cuelgue de otro padre.
+    """
+
+    def __init__(self):
+        self.by_name = dict(Category.objects.values_list('name', 'id'))
+        self.slugs = set(Category.objects.values_list('slug', flat=True))
+        self.created = 0
+
+    def resolve(self, path):
+        parent_id = None
+        for name in path:
+            if name not in self.by_name:
+                # create() y no bulk_create() para que las señales calculen la ruta del árbol
+                category = Category.objects.create(
+                    name=name, slug=_unique_slug(slugify(name), self.slugs, 120), parent_id=parent_id,
+                )
+                self.by_name[name] = category.pk
+                self.created += 1
+            parent_id = self.by_name[name]
+        return parent_id
+
+
+class ImportStats:
+
+    def __init__(self):
+        self.rows = self.created = self.updated = self.unchanged = 0
+        self.errors = []
+        self.error_count = 0
+        self.categories = 0
+        self.start = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows, 'created': self.created, 'updated': self.updated, 'unchanged': self.unchanged,
+            'errors': self.error_count, 'categories': self.categories,
+            'elapsed': round(self.elapsed, 2), 'rows_per_second': round(self.rate),
+        }
+
+
+def _chunked(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ProductImporter:
+    """Upsert por SKU en lotes; las filas cuya huella no cambió no se escriben"""
+
+    def __init__(self, batch_size=1000, workers=0, max_errors=100):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_errors = max_errors
+        self.stats = ImportStats()
+        self.categories = CategoryResolver()
+        self.slugs = set(Product.objects.values_list('slug', flat=True))
+
+    def _clean(self, executor, batch):
+        if executor is None:
+            return [clean_row(row) for row in batch]
+        return list(executor.map(clean_row, batch, chunksize=max(1, len(batch) // (self.workers * 4))))
+
+    def _apply(self, cleaned):
+        stats = self.stats
+        rows = {}
+        for data, error in cleaned:
+            if error:
+                stats.error_count += 1
+                if len(stats.errors) < self.max_errors:
+                    stats.errors.append(error)
+            else:
+                # Un SKU repetido en el feed: gana la última fila
+                rows[data['sku']] = data
+        existing = {
+            sku: (slug, digest)
+            for sku, slug, digest in Product.objects.filter(sku__in=list(rows)).values_list('sku', 'slug', 'import_hash')
+        }
+        products = []
+        for sku, data in rows.items():
+            current = existing.get(sku)
+            if current and current[1] == data['import_hash']:
+                stats.unchanged += 1
+                continue
+            if current:
+                stats.updated += 1
+                slug = current[0]
+            else:
+                stats.created += 1
+                slug = _unique_slug(slugify(data['name']), self.slugs, 220)
+            fields = {key: value for key, value in data.items() if key != 'category'}
+            products.append(Product(slug=slug, category_id=self.categories.resolve(data['category']), **fields))
+        if not products:
+            return
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products, batch_size=self.batch_size,
+                update_conflicts=True, unique_fields=['sku'], update_fields=UPDATE_FIELDS,
+            )
+            # bulk_create no dispara señales: índice de búsqueda y facetas del lote
+            written = Product.objects.filter(sku__in=[product.sku for product in products])
+            get_search_backend().index_products(written.select_related('category').only(*INDEXED_FIELDS))
+            index_product_facets(written.only('id', 'brand', 'condition', 'specifications'))
+
+    def run(self, rows, dry_run=False, progress=None):
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            # Cada lote se confirma por separado; en modo de prueba todo se deshace al final
+            with transaction.atomic() if dry_run else nullcontext():
+                for batch in _chunked(rows, self.batch_size):
+                    self.stats.rows += len(batch)
+                    self._apply(self._clean(executor, batch))
+                    if progress:
+                        progress(self.stats)
+                self.stats.categories = self.categories.created
+                if dry_run:
+                    transaction.set_rollback(True)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            # También si un lote falla: los anteriores ya se confirmaron
+            if not dry_run and (self.stats.created or self.stats.updated or self.categories.created):
+                bump_catalog_version()
+        return self.stats
+
+
+def import_products(rows, batch_size=1000, workers=0, dry_run=False, progress=None):
+    """Importar filas del feed; devuelve ImportStats"""
+    return ProductImporter(batch_size=batch_size, workers=workers).run(rows, dry_run=dry_run, progress=progress)
@@ -0,0 +1,96 @@
+"""
+Benchmark de la navegación por facetas
+Uso: python manage.py bench_facets --sizes 10000,100000,500000
+"""
+
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmarks import benchmark_database, parse_sizes, seed_categories, seed_products, timed, write_results
+from core.stats import summarize
+from products.facets import FacetQuery, rebuild_facet_index
+from products.models import Product
+
+SCENARIOS = {
+    'sin filtros': {},
+    'marca': {'filters': {'brand': ['Samsung']}},
+    'ram + marca': {'filters': {'ram': ['8GB', '16GB'], 'brand': ['Samsung', 'Apple']}},
+    'ram + precio': {'filters': {'ram': ['32GB']}, 'price': '1000-5000'},
+}
+
+
+def json_filter(queryset, filters, exclude=None):
+    for key, values in filters.items():
+        if key == exclude:
+            continue
+        if key == 'brand':
+            queryset = queryset.filter(brand__in=values)
+        else:
+            queryset = queryset.filter(**{f'specifications__{key}__in': values})
+    return queryset
+
+
+def json_baseline(queryset, filters, price=None):
+    """Enfoque ad hoc con la misma semántica: filtros sobre claves JSON y conteo en Python
+
+    Como FacetQuery, cada faceta seleccionada se cuenta sin su propio filtro,
+    lo que obliga a recorrer las especificaciones una vez por grupo.
+    """
+    if price:
+        low, _, high = price.partition('-')
+        queryset = queryset.filter(price__gte=low, **({'price__lt': high} if high else {}))
+    counts = Counter()
+    for exclude in [None, *filters]:
+        rows = json_filter(queryset, filters, exclude).values_list('brand', 'specifications')
+        for brand, specifications in rows.iterator(chunk_size=2000):
+            for key, value in [('brand', brand), *specifications.items()]:
+                if (exclude is None and key not in filters) or key == exclude:
+                    counts[(key, value)] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Mide FacetQuery (ids + conteos) frente a consultas JSON ad hoc'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,500000')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--skip-baseline', action='store_true')
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database():
+            categories = seed_categories()
+            seeded = 0
+            for size in parse_sizes(options['sizes']):
+                seeded += seed_products(size - seeded, start=seeded, categories=categories)
+                start = time.perf_counter()
+                rebuild_facet_index()
+                self.stdout.write(f'\n{size} productos (índice de facetas {time.perf_counter() - start:.1f}s)')
+
+                base = Product.objects.filter(status='active')
+                for name, params in SCENARIOS.items():
+                    def run():
+                        facet_query = FacetQuery(base, **params)
+                        page = list(facet_query.products.order_by('-created_at').values_list('id', flat=True)[:24])
+                        return page, facet_query.counts()
+
+                    with CaptureQueriesContext(connection) as queries:
+                        run()
+                    row = {'size': size, 'scenario': name, 'queries': len(queries), 'facets': summarize(timed(run, options['repeat']))}
+                    if not options['skip_baseline']:
+                        row['json'] = summarize(timed(lambda: json_baseline(base, params.get('filters', {}), params.get('price')), options['repeat']))
+                    results.append(row)
+                    self.stdout.write(
+                        f"  {name:14} facetas p50={row['facets']['p50_ms']:>9.2f}ms ({row['queries']} consultas)"
+                        + (f"  json p50={row['json']['p50_ms']:>9.2f}ms" if 'json' in row else '')
+                    )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
@@ -0,0 +1,73 @@
+"""
+Benchmark de la proyección de tarjetas de producto
+Uso: python manage.py bench_product_cards --sizes 1000,10000,100000 --repeat 3 --output product_cards.json
+"""
+
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import benchmark_database, parse_sizes, seed_categories, seed_products, timed, write_results
+from core.stats import summarize
+from products.models import Product
+
+PAGE_SIZE = 24
+
+
+def full_rows():
+    """Consulta anterior de los listados: filas completas más la galería"""
+    return Product.objects.filter(status='active', stock_quantity__gt=0).select_related('category').prefetch_related('additional_images')
+
+
+def card_rows():
+    return Product.objects.filter(status='active', stock_quantity__gt=0).cards()
+
+
+def peak_memory(func):
+    """Pico de memoria (bytes) asignada por Python durante ``func``"""
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+class Command(BaseCommand):
+    help = 'Compara latencia y memoria de los listados con filas completas frente a ProductQuerySet.cards()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database():
+            categories = seed_categories()
+            seeded = 0
+            for size in parse_sizes(options['sizes']):
+                seeded += seed_products(size - seeded, start=seeded, categories=categories)
+                self.stdout.write(f'\n{size} productos')
+                for name, build in (('completo', full_rows), ('tarjetas', card_rows)):
+                    page = lambda: list(build()[:PAGE_SIZE])
+                    listing = lambda: list(build())
+                    row = {
+                        'size': size,
+                        'projection': name,
+                        'page': summarize(timed(page, options['repeat'])),
+                        'listing': summarize(timed(listing, options['repeat'])),
+                        'listing_peak_bytes': peak_memory(listing),
+                    }
+                    results.append(row)
+                    self.stdout.write(
+                        f"  {name:9} página p50={row['page']['p50_ms']:>8.2f}ms  "
+                        f"listado p50={row['listing']['p50_ms']:>10.2f}ms  "
+                        f"memoria pico={row['listing_peak_bytes'] / 2 ** 20:>8.1f} MiB"
+                    )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
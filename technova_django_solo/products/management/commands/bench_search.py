@@ -0,0 +1,64 @@
+"""
+Benchmark del motor de búsqueda: índice invertido vs. icontains del ORM
+Uso: python manage.py bench_search --sizes 10000,100000,1000000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import benchmark_database, parse_sizes, seed_categories, seed_products, timed, write_results
+from core.stats import summarize
+from products.search import InvertedIndexBackend, ORMSearchBackend
+
+DEFAULT_QUERIES = ['samsung', 'portatil ligero', 'audífonos inalámbrico', 'bateria', 'BN-00000042', 'cam']
+
+
+class Command(BaseCommand):
+    help = 'Compara el índice invertido con la búsqueda icontains en catálogos de distinto tamaño'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000')
+        parser.add_argument('--queries', nargs='*', default=DEFAULT_QUERIES)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--output', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        backends = {'orm': ORMSearchBackend(), 'index': InvertedIndexBackend()}
+        results = []
+
+        with benchmark_database():
+            categories = seed_categories()
+            seeded = 0
+            for size in parse_sizes(options['sizes']):
+                start = time.perf_counter()
+                seeded += seed_products(size - seeded, start=seeded, categories=categories)
+                seed_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                backends['index'].rebuild()
+                index_seconds = time.perf_counter() - start
+                self.stdout.write(
+                    f'\n{size} productos (carga {seed_seconds:.1f}s, índice {index_seconds:.1f}s)'
+                )
+
+                for query in options['queries']:
+                    row = {'size': size, 'query': query, 'index_build_s': round(index_seconds, 3)}
+                    for name, backend in backends.items():
+                        samples = timed(
+                            lambda: backend.search(query, limit=options['limit']),
+                            repeat=options['repeat'],
+                        )
+                        row[name] = summarize(samples)
+                        row[f'{name}_hits'] = len(backend.search(query, limit=options['limit']))
+                    results.append(row)
+                    self.stdout.write(
+                        f"  {query!r:28} orm p50={row['orm']['p50_ms']:>9.2f}ms "
+                        f"index p50={row['index']['p50_ms']:>9.2f}ms "
+                        f"hits orm={row['orm_hits']} index={row['index_hits']}"
+                    )
+
+        if options['output']:
+            write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
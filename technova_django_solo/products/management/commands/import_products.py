@@ -0,0 +1,51 @@
+"""
+Importar o actualizar productos desde un feed de proveedor
+Uso: python manage.py import_products feed.csv [--format jsonl] [--batch-size 1000] [--workers 4] [--dry-run]
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upsert por SKU en lotes; crea las categorías por ruta ("Padre > Hija") y omite las filas sin cambios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Por defecto, según la extensión del archivo')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=0, help='Procesos para validar las filas (0 = en este proceso)')
+        parser.add_argument('--dry-run', action='store_true', help='Validar y contar sin guardar nada')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"No existe el archivo {options['path']}")
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {stats.rows} filas ({stats.rate:.0f}/s)')
+
+        try:
+            stats = import_products(
+                read_rows(options['path'], options['format']),
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+                progress=progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for error in stats.errors:
+            self.stderr.write(f'  {error}')
+        if stats.error_count > len(stats.errors):
+            self.stderr.write(f'  ... y {stats.error_count - len(stats.errors)} errores más')
+        summary = stats.as_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[prueba] ' if options['dry_run'] else ''}{summary['rows']} filas en {summary['elapsed']}s "
+            f"({summary['rows_per_second']}/s): {summary['created']} nuevas, {summary['updated']} actualizadas, "
+            f"{summary['unchanged']} sin cambios, {summary['errors']} con errores, {summary['categories']} categorías creadas"
+        ))
@@ -0,0 +1,23 @@
+"""
+Reconstruir la tabla de atributos para facetas
+Uso: python manage.py rebuild_facet_index [--batch-size 2000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.facets import rebuild_facet_index
+
+
+class Command(BaseCommand):
+    help = 'Aplana Product.specifications, marca y condición en la tabla de facetas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_facet_index(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'{count} productos indexados en {elapsed:.2f}s'))
@@ -0,0 +1,26 @@
+"""
+Reconstruir el índice de búsqueda de productos
+Uso: python manage.py rebuild_search_index [--batch-size 2000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye en bloque el índice de búsqueda de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        start = time.perf_counter()
+        count = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} productos indexados con {type(backend).__name__} en {elapsed:.2f}s'
+        ))
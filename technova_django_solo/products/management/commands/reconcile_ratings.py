@@ -0,0 +1,32 @@
+"""
+Conciliar la calificación de los productos con sus reseñas aprobadas
+Uso: python manage.py reconcile_ratings [--dry-run] [--product 12 --product 15]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcula suma, conteo y promedio de reseñas y corrige los productos desviados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products', help='Limitar a estos ids')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Sólo informar, sin escribir')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        fixed = reconcile_ratings(
+            product_ids=options['products'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        elapsed = time.perf_counter() - start
+        verb = 'desviados' if options['dry_run'] else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(f'{len(fixed)} productos {verb} en {elapsed:.2f}s'))
+        if fixed and options['verbosity'] > 1:
+            self.stdout.write(', '.join(str(pk) for pk in fixed))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = {c.pk: c for c in Category.objects.all()}
+
+    def build(category):
+        if category.path:
+            return category.path
+        parent = categories.get(category.parent_id)
+        category.path = (build(parent) if parent else '') + f'{category.pk:06d}/'
+        category.depth = category.path.count('/') - 1
+        return category.path
+
+    for category in categories.values():
+        build(category)
+    Category.objects.bulk_update(categories.values(), ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_productsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50)),
+                ('value', models.CharField(max_length=100)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attributes', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Atributo de Producto',
+                'verbose_name_plural': 'Atributos de Productos',
+                'indexes': [models.Index(fields=['key', 'value', 'product'], name='products_pr_key_e6945f_idx')],
+                'unique_together': {('product', 'key', 'value')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_productattribute'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='products_pr_name_37bd5c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['average_rating', 'id'], name='products_pr_average_a6a1d6_idx'),
+        ),
+    ]
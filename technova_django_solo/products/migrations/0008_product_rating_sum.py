@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rating_sums(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    rows = (
+        Review.objects.filter(is_approved=True)
+        .order_by().values('product_id')
+        .annotate(total=Sum('rating'), count=Count('id'))
+    )
+    for row in rows:
+        Product.objects.filter(pk=row['product_id']).update(rating_sum=row['total'], review_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Suma de las calificaciones aprobadas'),
+        ),
+        migrations.RunPython(populate_rating_sums, migrations.RunPython.noop),
+    ]
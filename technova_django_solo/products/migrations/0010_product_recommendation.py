@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('source', models.CharField(choices=[('copurchase', 'Comprados juntos'), ('category', 'Misma categoría')], default='copurchase', max_length=10)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='products.product')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Recomendación de Producto',
+                'verbose_name_plural': 'Recomendaciones de Productos',
+                'ordering': ['rank'],
+                'unique_together': {('product', 'rank')},
+            },
+        ),
+    ]
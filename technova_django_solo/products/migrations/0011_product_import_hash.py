@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
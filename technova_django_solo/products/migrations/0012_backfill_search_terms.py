@@ -0,0 +1,37 @@
+from django.db import migrations
+
+from products.search import build_postings
+
+
+def index_existing_products(apps, schema_editor):
+    """Indexar los productos creados antes del índice de búsqueda (0004)"""
+    Product = apps.get_model('products', 'Product')
+    ProductSearchTerm = apps.get_model('products', 'ProductSearchTerm')
+
+    products = (
+        Product.objects.filter(search_terms__isnull=True)
+        .select_related('category')
+        .order_by()
+        .iterator(chunk_size=2000)
+    )
+    pending = []
+    for product in products:
+        pending.extend(
+            ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+            for term, weight in build_postings(product).items()
+        )
+        if len(pending) >= 20000:
+            ProductSearchTerm.objects.bulk_create(pending, batch_size=2000)
+            pending = []
+    ProductSearchTerm.objects.bulk_create(pending, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_import_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
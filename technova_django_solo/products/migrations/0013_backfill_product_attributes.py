@@ -0,0 +1,37 @@
+from django.db import migrations
+
+from products.facets import build_attributes
+
+
+def index_existing_products(apps, schema_editor):
+    """Generar los atributos de facetas de los productos creados antes de 0006"""
+    Product = apps.get_model('products', 'Product')
+    ProductAttribute = apps.get_model('products', 'ProductAttribute')
+
+    products = (
+        Product.objects.filter(attributes__isnull=True)
+        .only('id', 'brand', 'condition', 'specifications')
+        .order_by()
+        .iterator(chunk_size=2000)
+    )
+    pending = []
+    for product in products:
+        pending.extend(
+            ProductAttribute(product_id=product.pk, key=key, value=value)
+            for key, value in build_attributes(product)
+        )
+        if len(pending) >= 10000:
+            ProductAttribute.objects.bulk_create(pending, batch_size=2000)
+            pending = []
+    ProductAttribute.objects.bulk_create(pending, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_backfill_search_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
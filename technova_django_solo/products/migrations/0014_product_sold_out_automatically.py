@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+def flag_checkout_sold_out(apps, schema_editor):
+    """Los agotados sin existencias son los que dejaba mark_sold_out; los demás los marcó un administrador"""
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(status='out_of_stock', stock_quantity=0).update(sold_out_automatically=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_backfill_product_attributes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sold_out_automatically',
+            field=models.BooleanField(default=False, editable=False, help_text='Agotado por el checkout, no por un administrador'),
+        ),
+        migrations.RunPython(flag_checkout_sold_out, migrations.RunPython.noop),
+    ]
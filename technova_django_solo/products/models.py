@@ -4,6 +4,9 @@ Modelos para gestión de productos y categorías
 """
 
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import uuid
@@ -21,6 +24,10 @@ def get_product_gallery_path(instance, filename):
     return f'products/gallery/{instance.product.slug}/{filename}'
 
 
+def category_path_segment(pk):
+    return f'{pk:06d}/'
+
+
 def default_specifications():
     return {}
 
@@ -35,9 +42,13 @@ class Category(models.Model):
     slug = models.SlugField(max_length=120, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to=get_category_image_path, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Derivados generados (ver products.images)")
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
     is_active = models.BooleanField(default=True)
     sort_order = models.IntegerField(default=0)
+    # Ruta materializada (ids de los ancestros, p. ej. "000001/000007/")
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -48,6 +59,47 @@ class Category(models.Model):
 
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        if self.parent_id and self.pk and (
+            self.parent_id == self.pk or (self.path and self.parent.path.startswith(self.path))
+        ):
+            raise ValidationError({'parent': 'Una categoría no puede colgar de sí misma ni de sus subcategorías'})
+    
+    def update_path(self):
+        """Recalcular la ruta materializada propia y la de todos los descendientes"""
+        parent_path = self.parent.path if self.parent_id else ''
+        new_path = parent_path + category_path_segment(self.pk)
+        new_depth = new_path.count('/') - 1
+        old_path = self.path
+        if new_path == old_path and new_depth == self.depth:
+            return
+        
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            # Mover el subárbol con una sola consulta
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - self.depth),
+            )
+        self.path = new_path
+        self.depth = new_depth
+
+
+# Columnas que pintan las tarjetas de los listados (ver ProductQuerySet.cards)
+CARD_FIELDS = [
+    'id', 'name', 'slug', 'short_description', 'brand', 'price', 'compare_at_price',
+    'stock_quantity', 'low_stock_threshold', 'status', 'average_rating', 'review_count',
+    'primary_image', 'image_variants', 'created_at',
+    'category', 'category__name', 'category__slug',
+]
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def cards(self):
+        """Proyección para tarjetas: sin descripción, especificaciones, características ni SEO"""
+        return self.select_related('category').only(*CARD_FIELDS)
 
 
 class Product(models.Model):
@@ -84,6 +136,7 @@ class Product(models.Model):
     # Inventario
     stock_quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     low_stock_threshold = models.IntegerField(default=10, validators=[MinValueValidator(0)])
+    sold_out_automatically = models.BooleanField(default=False, editable=False, help_text="Agotado por el checkout, no por un administrador")
     
     # Especificaciones técnicas
     specifications = models.JSONField(default=default_specifications, blank=True, help_text="Especificaciones técnicas en formato JSON")
@@ -91,6 +144,7 @@ class Product(models.Model):
     
     # Imágenes
     primary_image = models.ImageField(upload_to=get_product_image_path, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Derivados generados (ver products.images)")
     
     # Propiedades del producto
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='new')
@@ -106,11 +160,17 @@ class Product(models.Model):
     # Rating y reviews
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, validators=[MinValueValidator(0), MaxValueValidator(5)])
     review_count = models.IntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, help_text="Suma de las calificaciones aprobadas")
+    
+    # Huella de la última fila importada (ver products.importer)
+    import_hash = models.CharField(max_length=40, blank=True, editable=False)
     
     # Fechas
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -119,11 +179,20 @@ class Product(models.Model):
             models.Index(fields=['category', 'status']),
             models.Index(fields=['price']),
             models.Index(fields=['created_at']),
+            # Paginación por cursor (orden + id como desempate)
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['average_rating', 'id']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.brand})"
     
+    def save(self, *args, **kwargs):
+        # Un cambio manual de estado deja de ser el agotado automático del checkout
+        if self.status != 'out_of_stock':
+            self.sold_out_automatically = False
+        super().save(*args, **kwargs)
+    
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse('product_detail', args=[self.category.slug, self.slug])
@@ -151,6 +220,7 @@ class ProductImage(models.Model):
     """Imágenes adicionales de productos"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='additional_images')
     image = models.ImageField(upload_to=get_product_gallery_path)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Derivados generados (ver products.images)")
     alt_text = models.CharField(max_length=200, blank=True)
     sort_order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -188,3 +258,78 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Reseña de {self.user.username} para {self.product.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado tal como está en la base de datos, para calcular deltas de rating
+        if {'product_id', 'rating', 'is_approved'}.issubset(field_names):
+            instance._rating_state = instance.rating_state
+        return instance
+
+    @property
+    def rating_state(self):
+        """(producto, calificación) si la reseña cuenta para el promedio; si no, None"""
+        fields = self.__dict__
+        if not fields.get('is_approved') or fields.get('product_id') is None or fields.get('rating') is None:
+            return None
+        return fields['product_id'], int(fields['rating'])
+
+
+class ProductSearchTerm(models.Model):
+    """Índice invertido de búsqueda: término normalizado -> producto con peso"""
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'product']),
+        ]
+        verbose_name = "Término de Búsqueda"
+        verbose_name_plural = "Términos de Búsqueda"
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id} ({self.weight})"
+
+
+class ProductAttribute(models.Model):
+    """Especificaciones aplanadas (clave/valor) para la navegación por facetas"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='attributes')
+    key = models.CharField(max_length=50)
+    value = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ['product', 'key', 'value']
+        indexes = [
+            models.Index(fields=['key', 'value', 'product']),
+        ]
+        verbose_name = "Atributo de Producto"
+        verbose_name_plural = "Atributos de Productos"
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
+class ProductRecommendation(models.Model):
+    """Vecinos precalculados de un producto (ver products.recommendations)"""
+
+    SOURCE_CHOICES = [
+        ('copurchase', 'Comprados juntos'),
+        ('category', 'Misma categoría'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(default=0)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='copurchase')
+
+    class Meta:
+        ordering = ['rank']
+        unique_together = ['product', 'rank']
+        verbose_name = "Recomendación de Producto"
+        verbose_name_plural = "Recomendaciones de Productos"
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
@@ -0,0 +1,114 @@
+"""
+Calificación promedio de productos
+Suma y conteo de reseñas aprobadas mantenidos con deltas atómicos (F) y conciliación por lotes
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+from core.cache import bump_catalog_version
+from .models import Product, Review
+
+CENTS = Decimal('0.01')
+
+
+def average_expression(rating_sum, review_count):
+    """Promedio redondeado a dos decimales; 0 si no hay reseñas"""
+    return Coalesce(
+        Round(Cast(rating_sum, FloatField()) / NullIf(review_count, Value(0)), 2),
+        Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def expected_average(rating_sum, review_count):
+    if not review_count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / review_count).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def apply_rating_delta(product_id, sum_delta, count_delta):
+    """Sumar el delta en un solo UPDATE; el promedio se recalcula con los valores nuevos"""
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('review_count') + count_delta
+    return Product.objects.filter(pk=product_id).update(
+        rating_sum=new_sum,
+        review_count=new_count,
+        average_rating=average_expression(new_sum, new_count),
+    )
+
+
+def rating_deltas(old_state, new_state):
+    """{producto: (delta_suma, delta_conteo)} entre dos estados de una reseña"""
+    deltas = {}
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state:
+            product_id, rating = state
+            total, count = deltas.get(product_id, (0, 0))
+            deltas[product_id] = (total + sign * rating, count + sign)
+    return {pk: delta for pk, delta in deltas.items() if delta != (0, 0)}
+
+
+def review_changed(review, old_state, new_state):
+    """Aplicar el cambio de una reseña: a lo sumo dos UPDATE, ninguno si no cuenta"""
+    deltas = rating_deltas(old_state, new_state)
+    for product_id, (sum_delta, count_delta) in deltas.items():
+        apply_rating_delta(product_id, sum_delta, count_delta)
+    if deltas:
+        bump_catalog_version()
+    review._rating_state = new_state
+
+
+def set_reviews_approval(queryset, approved):
+    """Aprobar/desaprobar en bloque: un UPDATE de reseñas y uno por producto afectado"""
+    sign = 1 if approved else -1
+    with transaction.atomic():
+        changing = queryset.exclude(is_approved=approved)
+        rows = list(
+            changing.order_by().values('product_id').annotate(total=Sum('rating'), count=Count('id'))
+        )
+        updated = changing.update(is_approved=approved)
+        for row in rows:
+            apply_rating_delta(row['product_id'], sign * row['total'], sign * row['count'])
+    if rows:
+        bump_catalog_version()
+    return updated
+
+
+def _actual_totals():
+    approved = Review.objects.filter(product=OuterRef('pk'), is_approved=True).order_by().values('product')
+    return {
+        'actual_sum': Coalesce(Subquery(approved.annotate(total=Sum('rating')).values('total')), 0),
+        'actual_count': Coalesce(Subquery(approved.annotate(count=Count('id')).values('count')), 0),
+    }
+
+
+def reconcile_ratings(product_ids=None, batch_size=1000, dry_run=False):
+    """Recalcular desde las reseñas y corregir los productos desviados
+
+    Devuelve la lista de ids corregidos (o que se corregirían con ``dry_run``).
+    """
+    products = Product.objects.order_by('pk').annotate(**_actual_totals())
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    rows = products.values_list('pk', 'rating_sum', 'review_count', 'average_rating', 'actual_sum', 'actual_count')
+
+    fixed = []
+    pending = []
+    for pk, rating_sum, review_count, average, actual_sum, actual_count in rows.iterator(chunk_size=batch_size):
+        expected = expected_average(actual_sum, actual_count)
+        if (rating_sum, review_count) == (actual_sum, actual_count) and abs(Decimal(average) - expected) < CENTS:
+            continue
+        fixed.append(pk)
+        pending.append(Product(pk=pk, rating_sum=actual_sum, review_count=actual_count, average_rating=expected))
+        if len(pending) >= batch_size and not dry_run:
+            Product.objects.bulk_update(pending, ['rating_sum', 'review_count', 'average_rating'])
+            pending = []
+    if pending and not dry_run:
+        Product.objects.bulk_update(pending, ['rating_sum', 'review_count', 'average_rating'])
+    if fixed and not dry_run:
+        bump_catalog_version()
+    return fixed
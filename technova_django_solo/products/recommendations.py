@@ -0,0 +1,153 @@
+"""
+Productos relacionados
+Vecinos por compras conjuntas (pedidos y listas de deseos) calculados fuera de línea, con relleno por categoría
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from core.cache import bump_catalog_version
+from orders.models import OrderItem, Wishlist
+from .models import Product, ProductRecommendation
+
+ORDER_WEIGHT = 1.0
+# Desear un producto dice menos que comprarlo
+WISHLIST_WEIGHT = 0.5
+EXCLUDED_ORDER_STATUSES = ['cancelled']
+
+
+def _baskets(queryset, key, chunk_size):
+    """Conjuntos de productos agrupados por ``key``, leídos en bloques sin cargar la tabla"""
+    rows = queryset.order_by(key, 'product_id').values_list(key, 'product_id').iterator(chunk_size=chunk_size)
+    for _, group in groupby(rows, key=itemgetter(0)):
+        yield {product_id for _, product_id in group}
+
+
+def order_baskets(chunk_size=5000):
+    return _baskets(OrderItem.objects.exclude(order__status__in=EXCLUDED_ORDER_STATUSES), 'order_id', chunk_size)
+
+
+def wishlist_baskets(chunk_size=5000):
+    return _baskets(Wishlist.objects.all(), 'user_id', chunk_size)
+
+
+class CooccurrenceMatrix:
+    """Matriz dispersa producto x producto: {a: {b: peso}} y el peso total de cada producto
+
+    Sólo guarda los pares que aparecen juntos alguna vez, así que la memoria
+    depende de los pares distintos y no del número de líneas leídas.
+    """
+
+    def __init__(self, max_basket=50):
+        self.max_basket = max_basket
+        self.pairs = defaultdict(Counter)
+        self.weights = Counter()
+        self.baskets = 0
+        self.skipped = 0
+
+    def add(self, basket, weight=1.0):
+        # Las cestas enormes (pedidos mayoristas) cuestan O(n²) y dicen poco de cada par:
+        # se descartan enteras, porque recortarlas favorecería a unos productos sobre otros
+        if len(basket) > self.max_basket:
+            self.skipped += 1
+            return
+        items = list(basket)
+        self.baskets += 1
+        for product_id in items:
+            self.weights[product_id] += weight
+        for a, b in combinations(items, 2):
+            self.pairs[a][b] += weight
+            self.pairs[b][a] += weight
+
+    def neighbours(self, product_id, k, allowed=None):
+        """Los k vecinos con mayor similitud coseno: [(producto, puntuación)]"""
+        pairs = self.pairs.get(product_id)
+        if not pairs:
+            return []
+        norm = self.weights[product_id]
+        scores = (
+            (other, weight / math.sqrt(norm * self.weights[other]))
+            for other, weight in pairs.items()
+            if allowed is None or other in allowed
+        )
+        return heapq.nlargest(k, scores, key=lambda item: (item[1], -item[0]))
+
+
+def category_candidates(k):
+    """Los k+1 mejores productos vendibles de cada categoría, por valoración"""
+    rows = (
+        Product.objects.filter(status='active', stock_quantity__gt=0)
+        .order_by('category_id', '-average_rating', '-review_count', 'pk')
+        .values_list('category_id', 'pk')
+    )
+    return {
+        category_id: [pk for _, pk in group][:k + 1]
+        for category_id, group in groupby(rows.iterator(), key=itemgetter(0))
+    }
+
+
+def build_recommendations(top_k=None, chunk_size=5000, max_basket=50):
+    """Reconstruir ProductRecommendation para todo el catálogo; devuelve las métricas
+
+    Los pedidos y las listas de deseos se recorren una vez, por bloques. La
+    tabla se reemplaza en una transacción: las páginas leen la versión anterior
+    hasta que termina.
+    """
+    top_k = top_k or getattr(settings, 'PRODUCT_RECOMMENDATIONS_TOP_K', 8)
+    matrix = CooccurrenceMatrix(max_basket=max_basket)
+    for basket in order_baskets(chunk_size):
+        matrix.add(basket, ORDER_WEIGHT)
+    for basket in wishlist_baskets(chunk_size):
+        matrix.add(basket, WISHLIST_WEIGHT)
+
+    allowed = set(Product.objects.filter(status='active').values_list('pk', flat=True))
+    fallback = category_candidates(top_k)
+    stats = {'products': 0, 'baskets': matrix.baskets, 'skipped': matrix.skipped, 'copurchase': 0, 'category': 0}
+    pending = []
+    products = Product.objects.order_by('pk').values_list('pk', 'category_id').iterator(chunk_size=chunk_size)
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        for product_id, category_id in products:
+            stats['products'] += 1
+            neighbours = [(pk, score, 'copurchase') for pk, score in matrix.neighbours(product_id, top_k, allowed)]
+            chosen = {product_id, *(pk for pk, _, _ in neighbours)}
+            for pk in fallback.get(category_id, []):
+                if len(neighbours) >= top_k:
+                    break
+                if pk not in chosen:
+                    neighbours.append((pk, 0.0, 'category'))
+            for rank, (pk, score, source) in enumerate(neighbours):
+                stats[source] += 1
+                pending.append(ProductRecommendation(
+                    product_id=product_id, recommended_id=pk, rank=rank, score=score, source=source,
+                ))
+            if len(pending) >= chunk_size:
+                ProductRecommendation.objects.bulk_create(pending, batch_size=1000)
+                pending = []
+        ProductRecommendation.objects.bulk_create(pending, batch_size=1000)
+    # Las fichas muestran los relacionados: invalida su cache y sus ETag
+    bump_catalog_version()
+    return stats
+
+
+def related_products(product, limit=4):
+    """Relacionados precalculados en una consulta por índice; sin precálculo, los de su categoría"""
+    related = list(
+        Product.objects.filter(recommended_for__product=product, status='active', stock_quantity__gt=0)
+        .cards()
+        .order_by('recommended_for__rank')[:limit]
+    )
+    if related:
+        return related
+    # Producto nuevo todavía sin calcular
+    return list(
+        Product.objects.filter(category_id=product.category_id, status='active', stock_quantity__gt=0)
+        .exclude(pk=product.pk)
+        .cards()[:limit]
+    )
@@ -0,0 +1,258 @@
+"""
+Motor de búsqueda de productos
+Índice invertido con normalización de acentos y ranking por peso de campo
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, ExpressionWrapper, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.utils.module_loading import import_string
+
+from .models import Product, ProductSearchTerm
+
+DEFAULT_BACKEND = 'products.search.InvertedIndexBackend'
+DEFAULT_MAX_RESULTS = 1000
+
+# Peso de cada campo en el ranking (título y SKU pesan más que la descripción)
+FIELD_WEIGHTS = {
+    'name': 10,
+    'sku': 8,
+    'brand': 6,
+    'model': 5,
+    'category': 4,
+    'short_description': 2,
+    'description': 1,
+}
+MAX_TERM_FREQUENCY = 3
+MAX_QUERY_TOKENS = 8
+MAX_TERM_LENGTH = 64
+
+STOPWORDS = frozenset([
+    'de', 'la', 'el', 'en', 'y', 'a', 'los', 'las', 'del', 'un', 'una', 'con',
+    'por', 'para', 'al', 'lo', 'se', 'su', 'sus', 'es', 'o', 'que', 'sin',
+])
+
+TOKEN_RE = re.compile(r'\w+')
+
+INDEXED_FIELDS = ('id', 'name', 'sku', 'brand', 'model', 'short_description', 'description', 'category__name')
+
+
+def fold(text):
+    """Pasar a minúsculas y quitar acentos (camión -> camion, año -> ano)"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """Dividir un texto en términos normalizados sin palabras vacías"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold(text))
+        if token not in STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+def build_postings(product):
+    """Términos de un producto con su peso acumulado por campo"""
+    fields = {
+        'name': product.name,
+        'sku': product.sku,
+        'brand': product.brand,
+        'model': product.model,
+        'category': product.category.name,
+        'short_description': product.short_description,
+        'description': product.description,
+    }
+    weights = Counter()
+    for field, text in fields.items():
+        for term, frequency in Counter(tokenize(text)).items():
+            weights[term] += FIELD_WEIGHTS[field] * min(frequency, MAX_TERM_FREQUENCY)
+
+    # El SKU completo sin separadores también se indexa (ABC-123 -> abc123)
+    compact_sku = ''.join(tokenize(product.sku))[:MAX_TERM_LENGTH]
+    if compact_sku and compact_sku not in weights:
+        weights[compact_sku] = FIELD_WEIGHTS['sku']
+    return weights
+
+
+def prefix_lookup(prefix):
+    """Búsqueda por prefijo como rango, para que use el índice B-tree
+
+    ``startswith`` se traduce a LIKE, que en SQLite (y en PostgreSQL sin
+    ``varchar_pattern_ops``) no aprovecha el índice de ``term``.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(term__gte=prefix, term__lt=upper)
+
+
+class BaseSearchBackend:
+    """Interfaz común de los motores de búsqueda"""
+
+    def search(self, query, limit=None):
+        """Ids de productos que coinciden con la consulta, por relevancia (como mucho ``limit``)"""
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        """Restringir ``queryset`` a la consulta y anotar ``search_rank`` (menor = más relevante)
+
+        Implementación genérica sobre search(): sólo ve los primeros
+        PRODUCT_SEARCH_MAX_RESULTS ids; los motores la sustituyen para filtrar
+        en la base de datos sin recorte.
+        """
+        ids = self.search(query)
+        if not ids:
+            return queryset.none()
+        ranking = Case(
+            *[When(id=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(id__in=ids).annotate(search_rank=ranking).order_by('search_rank')
+
+    def index_products(self, products):
+        """Indexar (o reindexar) productos"""
+
+    def remove_products(self, product_ids):
+        """Quitar productos del índice"""
+
+    def rebuild(self, batch_size=2000):
+        """Reconstruir el índice completo; devuelve el número de productos"""
+        return 0
+
+    def get_limit(self, limit):
+        return limit or getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', DEFAULT_MAX_RESULTS)
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """Búsqueda original con icontains sobre la tabla de productos (sin índice)"""
+
+    def _matches(self, query):
+        return (
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(brand__icontains=query) |
+            Q(sku__icontains=query) |
+            Q(category__name__icontains=query)
+        )
+
+    def search(self, query, limit=None):
+        if not query.strip():
+            return []
+        matches = Product.objects.filter(self._matches(query)).order_by('-created_at')
+        return list(matches.values_list('id', flat=True)[:self.get_limit(limit)])
+
+    def filter(self, queryset, query):
+        if not query.strip():
+            return queryset.none()
+        # Sin puntuación: los más recientes primero (id descendente), paginable por cursor
+        return queryset.filter(self._matches(query)).annotate(
+            search_rank=ExpressionWrapper(Value(0) - F('id'), output_field=IntegerField())
+        ).order_by('search_rank', 'pk')
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """Búsqueda sobre la tabla ProductSearchTerm
+
+    Todos los términos de la consulta deben aparecer en el producto; el último
+    se compara por prefijo para soportar búsqueda mientras se escribe.
+    """
+
+    def _scores(self, query):
+        """Productos con todos los términos y su puntuación (GROUP BY product_id), o None"""
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+        if not tokens:
+            return None
+
+        *exact, prefix = tokens
+        lookups = [Q(term=token) for token in exact] + [prefix_lookup(prefix)]
+        # Con un solo término no hace falta comprobar que coincidan todos
+        matched = {
+            f'match_{i}': Max(Case(When(lookup, then=Value(1)), default=Value(0), output_field=IntegerField()))
+            for i, lookup in enumerate(lookups)
+        } if len(lookups) > 1 else {}
+        return (
+            ProductSearchTerm.objects
+            .filter(reduce(or_, lookups))
+            .values('product_id')
+            .annotate(score=Sum('weight'), **matched)
+            .filter(**{name: 1 for name in matched})
+        )
+
+    def search(self, query, limit=None):
+        rows = self._scores(query)
+        if rows is None:
+            return []
+        rows = rows.order_by('-score', 'product_id')
+        return [row['product_id'] for row in rows[:self.get_limit(limit)]]
+
+    def filter(self, queryset, query):
+        """Filtrar y ordenar en la base de datos: el límite de resultados no aplica
+
+        Los filtros del queryset (estado, stock, facetas) se combinan con la
+        coincidencia antes de ordenar, así que una consulta amplia no pierde
+        productos válidos.
+        """
+        rows = self._scores(query)
+        if rows is None:
+            return queryset.none()
+        score = Subquery(rows.filter(product_id=OuterRef('pk')).values('score')[:1], output_field=IntegerField())
+        return (
+            queryset.filter(id__in=rows.values('product_id'))
+            .annotate(search_rank=Value(0) - score)
+            .order_by('search_rank', 'pk')
+        )
+
+    def _terms_for(self, products):
+        for product in products:
+            for term, weight in build_postings(product).items():
+                yield ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+
+    def index_products(self, products):
+        products = list(products)
+        with transaction.atomic():
+            ProductSearchTerm.objects.filter(product_id__in=[p.pk for p in products]).delete()
+            ProductSearchTerm.objects.bulk_create(self._terms_for(products), batch_size=1000)
+
+    def remove_products(self, product_ids):
+        ProductSearchTerm.objects.filter(product_id__in=list(product_ids)).delete()
+
+    def rebuild(self, batch_size=2000):
+        products = (
+            Product.objects.select_related('category')
+            .only(*INDEXED_FIELDS)
+            .order_by()
+            .iterator(chunk_size=batch_size)
+        )
+        count = 0
+        pending = []
+        with transaction.atomic():
+            ProductSearchTerm.objects.all().delete()
+            for product in products:
+                count += 1
+                pending.extend(self._terms_for([product]))
+                if len(pending) >= batch_size * 10:
+                    ProductSearchTerm.objects.bulk_create(pending, batch_size=batch_size)
+                    pending = []
+            ProductSearchTerm.objects.bulk_create(pending, batch_size=batch_size)
+        return count
+
+
+def get_search_backend():
+    """Motor configurado en settings.PRODUCT_SEARCH_BACKEND"""
+    return import_string(getattr(settings, 'PRODUCT_SEARCH_BACKEND', DEFAULT_BACKEND))()
+
+
+def search_products(queryset, query):
+    """Filtrar un queryset por la consulta y ordenarlo por relevancia
+
+    Los filtros, el ordenamiento y la paginación posteriores siguen aplicando
+    sobre el queryset devuelto.
+    """
+    return get_search_backend().filter(queryset, query)
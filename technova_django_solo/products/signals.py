@@ -5,47 +5,98 @@ Maneja actualizaciones automáticas de productos
 
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg, Count
-from .models import Review, Product
+from core.cache import bump_catalog_version
+from .models import Review, Product, Category, ProductImage
+from .search import INDEXED_FIELDS, get_search_backend
+from .category_tree import invalidate_category_tree
+from .facets import index_product_facets
+from .ratings import reconcile_ratings, review_changed
+from .images import schedule_derivatives
 
 
 @receiver(post_save, sender=Review)
-def update_product_rating(sender, instance, **kwargs):
-    """Actualizar rating promedio del producto cuando se agrega/actualiza una review"""
-    product = instance.product
-    
-    # Calcular nuevo promedio
-    reviews = product.reviews.filter(is_approved=True)
-    if reviews.exists():
-        avg_rating = reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-        review_count = reviews.count()
+def update_product_rating(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Aplicar el delta de la reseña sobre la suma y el conteo del producto"""
+    if raw:
+        return
+    if update_fields is not None and not {'product', 'rating', 'is_approved'} & set(update_fields):
+        return
+    if created:
+        review_changed(instance, None, instance.rating_state)
+    elif hasattr(instance, '_rating_state'):
+        review_changed(instance, instance._rating_state, instance.rating_state)
     else:
-        avg_rating = 0
-        review_count = 0
-    
-    # Actualizar producto
-    Product.objects.filter(id=product.id).update(
-        average_rating=avg_rating,
-        review_count=review_count
-    )
+        # Instancia sin estado previo conocido: recalcular sólo este producto
+        reconcile_ratings([instance.product_id])
+        instance._rating_state = instance.rating_state
 
 
 @receiver(post_delete, sender=Review)
 def update_product_rating_on_delete(sender, instance, **kwargs):
-    """Actualizar rating promedio cuando se elimina una review"""
-    product = instance.product
-    
-    # Recalcular
-    reviews = product.reviews.filter(is_approved=True)
-    if reviews.exists():
-        avg_rating = reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-        review_count = reviews.count()
-    else:
-        avg_rating = 0
-        review_count = 0
-    
-    # Actualizar producto
-    Product.objects.filter(id=product.id).update(
-        average_rating=avg_rating,
-        review_count=review_count
-    )
\ No newline at end of file
+    """Restar la reseña eliminada si contaba para el promedio"""
+    state = instance._rating_state if hasattr(instance, '_rating_state') else instance.rating_state
+    review_changed(instance, state, None)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    """Invalidar los fragmentos cacheados que dependen del catálogo"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Generar miniaturas y variantes WebP cuando cambia la imagen"""
+    if raw:
+        return
+    schedule_derivatives(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """Mantener actualizado el índice de búsqueda al guardar un producto"""
+    if raw:
+        return
+    get_search_backend().index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+def update_product_facets(sender, instance, raw=False, **kwargs):
+    """Aplanar las especificaciones del producto en la tabla de facetas"""
+    if raw:
+        return
+    index_product_facets([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Quitar el producto del índice de búsqueda"""
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    """Reindexar los productos de una categoría (su nombre forma parte del índice)"""
+    if created or raw:
+        return
+    get_search_backend().index_products(
+        instance.products.select_related('category').only(*INDEXED_FIELDS)
+    )
+
+
+@receiver(post_save, sender=Category)
+def update_category_tree(sender, instance, raw=False, **kwargs):
+    """Mantener la ruta materializada e invalidar la instantánea del árbol"""
+    if not raw:
+        instance.update_path()
+    invalidate_category_tree()
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_tree_on_delete(sender, instance, **kwargs):
+    invalidate_category_tree()
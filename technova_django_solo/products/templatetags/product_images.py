@@ -0,0 +1,67 @@
+"""
+Etiquetas de plantilla para imágenes responsivas
+{% load product_images %} y luego {% responsive_image product 'card' class='card-img-top' alt=product.name %}
+"""
+
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..images import DERIVATIVE_SIZES, current_variants, image_file
+
+register = template.Library()
+
+DEFAULT_SIZES = {
+    'thumbnail': '150px',
+    'card': '(max-width: 576px) 100vw, 400px',
+    'detail': '(max-width: 768px) 100vw, 50vw',
+}
+
+
+def _original_url(obj):
+    file = image_file(obj)
+    return file.url if file else ''
+
+
+@register.simple_tag
+def image_url(obj, size='card', fmt='fallback'):
+    """URL del derivado pedido; la original si aún no se generó"""
+    variants = current_variants(obj)
+    if not variants:
+        return _original_url(obj)
+    return default_storage.url(variants['sizes'][size][fmt])
+
+
+@register.simple_tag
+def image_srcset(obj, size='card', fmt='fallback'):
+    """'url 300w, url 400w, url 800w' con los anchos de un solo tamaño (mismo recorte y proporción)"""
+    variants = current_variants(obj)
+    if not variants:
+        return ''
+    entry = variants['sizes'][size]
+    # Manifiestos anteriores a SRCSET_WIDTHS: sólo el derivado del tamaño (build_image_derivatives --force)
+    entries = entry.get('srcset') or [entry]
+    return ', '.join(f"{default_storage.url(item[fmt])} {item['width']}w" for item in entries)
+
+
+@register.simple_tag
+def responsive_image(obj, size='card', sizes=None, **attrs):
+    """<picture> con fuente WebP y <img> de respaldo con srcset, tamaño y carga diferida"""
+    attrs.setdefault('loading', 'lazy')
+    variants = current_variants(obj)
+    if not variants:
+        return format_html(
+            '<img src="{}"{}>', _original_url(obj),
+            format_html_join('', ' {}="{}"', attrs.items()),
+        )
+
+    entry = variants['sizes'][size]
+    sizes = sizes or DEFAULT_SIZES.get(size, f'{DERIVATIVE_SIZES[size][0]}px')
+    attrs.update({'width': entry['width'], 'height': entry['height']})
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        image_srcset(obj, size, 'webp'), sizes,
+        image_url(obj, size), image_srcset(obj, size), sizes,
+        format_html_join('', ' {}="{}"', attrs.items()),
+    )
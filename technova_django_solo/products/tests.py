@@ -0,0 +1,531 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from functools import partialmethod
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import get_catalog_version
+from core.pagination import CursorPaginator
+from orders.models import Order, OrderItem, Wishlist
+
+from . import views
+from .category_tree import get_category_tree
+from .facets import FacetQuery, flatten_specifications
+from .images import DERIVATIVE_SIZES, current_variants
+from .importer import ProductImporter, clean_row, import_products
+from .models import Category, Product, ProductRecommendation, ProductSearchTerm, Review
+from .ratings import reconcile_ratings, set_reviews_approval
+from .recommendations import CooccurrenceMatrix, build_recommendations, related_products
+from .search import InvertedIndexBackend, fold, search_products, tokenize
+from .templatetags.product_images import image_srcset
+from PIL import Image
+
+User = get_user_model()
+
+
+def create_product(category, name, **kwargs):
+    defaults = {
+        'slug': name.lower().replace(' ', '-'),
+        'description': '',
+        'price': Decimal('100.00'),
+        'stock_quantity': 5,
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(category=category, name=name, **defaults)
+
+
+class ProductSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptops = Category.objects.get(slug='laptops')
+        cls.audio = Category.objects.get(slug='audio-video')
+        cls.laptop = create_product(cls.laptops, 'Portátil Lenovo ThinkPad', brand='Lenovo', sku='LN-T14')
+        cls.headphones = create_product(
+            cls.audio, 'Audífonos Sony', brand='Sony',
+            description='Audífonos inalámbricos con cancelación de ruido para portátil',
+        )
+
+    def test_fold_and_tokenize(self):
+        self.assertEqual(fold('Cámara AÑO'), 'camara ano')
+        self.assertEqual(tokenize('Audífonos de la marca Sony'), ['audifonos', 'marca', 'sony'])
+
+    def test_index_is_maintained_by_signals(self):
+        self.assertTrue(ProductSearchTerm.objects.filter(product=self.laptop, term='thinkpad').exists())
+        self.laptop.name = 'Portátil Lenovo Yoga'
+        self.laptop.save()
+        self.assertFalse(ProductSearchTerm.objects.filter(product=self.laptop, term='thinkpad').exists())
+        self.headphones.delete()
+        self.assertFalse(ProductSearchTerm.objects.filter(product_id=self.headphones.pk).exists())
+
+    def test_search_ranks_by_field_weight_and_folds_accents(self):
+        backend = InvertedIndexBackend()
+        # Coincide en el nombre del primero y sólo en la descripción del segundo
+        self.assertEqual(backend.search('portatil'), [self.laptop.pk, self.headphones.pk])
+        self.assertEqual(backend.search('AUDIFONOS sony'), [self.headphones.pk])
+        self.assertEqual(backend.search('ln-t14'), [self.laptop.pk])
+        self.assertEqual(backend.search('think'), [self.laptop.pk])
+        self.assertEqual(backend.search('de la'), [])
+
+    def test_search_products_keeps_queryset_filters(self):
+        products = search_products(Product.objects.filter(category=self.audio), 'portatil')
+        self.assertEqual(list(products), [self.headphones])
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=1)
+    def test_result_limit_does_not_drop_filtered_matches(self):
+        # El portátil (mejor puntuado) queda fuera por el filtro, no por el límite
+        self.assertEqual(InvertedIndexBackend().search('portatil'), [self.laptop.pk])
+        Product.objects.filter(pk=self.laptop.pk).update(status='inactive')
+        products = search_products(Product.objects.filter(status='active'), 'portatil')
+        self.assertEqual(list(products), [self.headphones])
+        broad = search_products(Product.objects.all(), 'portatil')
+        self.assertEqual(list(broad), [self.laptop, self.headphones])
+
+
+class CategoryTreeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.root = Category.objects.get(slug='laptops')
+        self.child = Category.objects.create(name='Gaming', slug='gaming', parent=self.root)
+        self.grandchild = Category.objects.create(name='Ultraligeras', slug='ultraligeras', parent=self.child)
+
+    def test_materialized_path(self):
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.depth, 2)
+        self.assertTrue(self.grandchild.path.startswith(self.root.path))
+
+    def test_descendants_include_grandchildren(self):
+        tree = get_category_tree()
+        self.assertEqual(tree.descendant_ids(self.root), {self.root.pk, self.child.pk, self.grandchild.pk})
+        self.assertEqual(tree.get_ancestors(tree.get('ultraligeras')), [tree.get('laptops'), tree.get('gaming')])
+
+    def test_moving_a_subtree_updates_paths_and_snapshot(self):
+        tablets = Category.objects.get(slug='tablets')
+        self.child.parent = tablets
+        self.child.save()
+        self.grandchild.refresh_from_db()
+        self.assertTrue(self.grandchild.path.startswith(tablets.path))
+        self.assertIn(self.grandchild.pk, get_category_tree().descendant_ids(tablets))
+        self.assertNotIn(self.grandchild.pk, get_category_tree().descendant_ids(self.root))
+
+    def test_category_view_lists_grandchild_products(self):
+        product = create_product(self.grandchild, 'Laptop Ultraligera')
+        response = self.client.get(reverse('products:category', args=['laptops']))
+        self.assertContains(response, product.name)
+
+    def test_header_menu_renders_without_queries(self):
+        get_category_tree()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('core:contact'))
+        self.assertContains(response, reverse('products:category', args=['laptops']))
+
+
+class FacetQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        laptops = Category.objects.get(slug='laptops')
+        cls.a = create_product(laptops, 'Laptop A', brand='Lenovo', price=Decimal('800.00'),
+                               specifications={'RAM': '8GB', 'Colores': ['negro', 'gris']})
+        cls.b = create_product(laptops, 'Laptop B', brand='Lenovo', price=Decimal('1200.00'),
+                               specifications={'RAM': '16GB'})
+        cls.c = create_product(laptops, 'Laptop C', brand='Asus', price=Decimal('1500.00'),
+                               specifications={'RAM': '16GB'}, condition='refurbished')
+
+    def test_flatten_specifications(self):
+        self.assertEqual(
+            sorted(flatten_specifications({'Pantalla': {'Tamaño': 15.6}, 'Táctil': True, 'Puertos': ['USB', 'HDMI']})),
+            [('pantalla-tamano', '15.6'), ('puertos', 'HDMI'), ('puertos', 'USB'), ('tactil', 'Sí')],
+        )
+
+    def test_filters_and_disjunctive_counts(self):
+        facet_query = FacetQuery(
+            Product.objects.all(),
+            filters={'ram': ['16GB'], 'brand': ['Lenovo']},
+            facets=['brand', 'ram', 'colores'],
+        )
+        self.assertEqual(facet_query.product_ids(), [self.b.pk])
+        with self.assertNumQueries(4):
+            counts = facet_query.counts()
+        # Cada faceta se cuenta sin su propio filtro
+        self.assertEqual({v['value']: v['count'] for v in counts['brand']}, {'Lenovo': 1, 'Asus': 1})
+        self.assertEqual({v['value']: v['count'] for v in counts['ram']}, {'8GB': 1, '16GB': 1})
+        self.assertEqual(counts['colores'], [])
+        self.assertEqual([b['count'] for b in counts['precio']], [0, 0, 1, 0, 0])
+
+    def test_price_bucket_and_attribute_maintenance(self):
+        self.c.specifications = {'RAM': '32GB'}
+        self.c.save()
+        facet_query = FacetQuery(Product.objects.all(), filters={'ram': ['32GB']}, price='1000-5000')
+        self.assertEqual(facet_query.product_ids(), [self.c.pk])
+
+    def test_search_view_renders_facets(self):
+        response = self.client.get(reverse('products:search'), {'q': 'laptop', 'f_brand': 'Asus'})
+        self.assertEqual(list(response.context['products']), [self.c])
+        self.assertContains(response, 'Marca')
+        self.assertContains(response, 'f_brand=Asus&amp;f_brand=Lenovo')
+
+
+class ProductRatingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.get(slug='audio-video')
+        cls.product = create_product(cls.category, 'Audífonos Pro')
+        cls.other = create_product(cls.category, 'Bocina Mini')
+        cls.users = [
+            User.objects.create_user(username=f'resenador{i}', email=f'r{i}@example.com', password='x')
+            for i in range(4)
+        ]
+
+    def assertRating(self, product, rating_sum, count, average):
+        product.refresh_from_db()
+        self.assertEqual((product.rating_sum, product.review_count, product.average_rating), (rating_sum, count, Decimal(average)))
+
+    def review(self, user, rating, approved=True, product=None):
+        return Review.objects.create(
+            product=product or self.product, user=user, rating=rating, comment='ok', is_approved=approved,
+        )
+
+    def test_deltas_follow_approval_state(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 4)
+        pending = self.review(self.users[2], 1, approved=False)
+        self.assertRating(self.product, 9, 2, '4.50')
+
+        pending.is_approved = True
+        pending.save()
+        self.assertRating(self.product, 10, 3, '3.33')
+
+        first.rating = 2
+        first.save()
+        self.assertRating(self.product, 7, 3, '2.33')
+
+        first.delete()
+        self.assertRating(self.product, 5, 2, '2.50')
+
+    def test_saves_without_rating_change_do_not_touch_product(self):
+        review = self.review(self.users[0], 3, approved=False)
+        review = Review.objects.get(pk=review.pk)
+        review.comment = 'editada'
+        # Sólo el UPDATE de la reseña, ninguna consulta sobre el producto
+        with self.assertNumQueries(1):
+            review.save()
+
+    def test_bulk_moderation_and_reconcile(self):
+        for user, rating in zip(self.users, [5, 4, 3, 2]):
+            self.review(user, rating, approved=False)
+        self.review(self.users[0], 1, approved=False, product=self.other)
+
+        with self.assertNumQueries(6):
+            approved = set_reviews_approval(Review.objects.all(), True)
+        self.assertEqual(approved, 5)
+        self.assertRating(self.product, 14, 4, '3.50')
+        self.assertRating(self.other, 1, 1, '1.00')
+
+        Review.objects.filter(rating=5).update(is_approved=False)
+        self.assertEqual(reconcile_ratings(dry_run=True), [self.product.pk])
+        self.assertEqual(reconcile_ratings(), [self.product.pk])
+        self.assertRating(self.product, 9, 3, '3.00')
+        self.assertEqual(reconcile_ratings(), [])
+
+
+def image_upload(name='foto.png', size=(800, 600), mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.category = Category.objects.get(slug='audio-video')
+
+    def test_derivatives_generated_on_save(self):
+        product = create_product(self.category, 'Bocina Foto', primary_image=image_upload())
+        product.refresh_from_db()
+        variants = current_variants(product)
+        self.assertIsNotNone(variants)
+        self.assertEqual(set(variants['sizes']), set(DERIVATIVE_SIZES))
+
+        card = variants['sizes']['card']
+        self.assertEqual((card['width'], card['height']), (400, 400))
+        self.assertIn(variants['digest'], card['fallback'])
+        self.assertTrue(card['fallback'].endswith('.jpg'))
+        self.assertTrue(card['webp'].endswith('.webp'))
+        detail = variants['sizes']['detail']
+        self.assertEqual((detail['width'], detail['height']), (800, 600))
+        for entry in variants['sizes'].values():
+            self.assertTrue(default_storage.exists(entry['fallback']))
+            self.assertTrue(default_storage.exists(entry['webp']))
+
+    def test_transparent_images_keep_png_fallback(self):
+        product = create_product(self.category, 'Logo', primary_image=image_upload(mode='RGBA'))
+        product.refresh_from_db()
+        self.assertTrue(product.image_variants['sizes']['thumbnail']['fallback'].endswith('.png'))
+
+    def test_responsive_image_tag(self):
+        product = create_product(self.category, 'Audífonos Foto', primary_image=image_upload())
+        product.refresh_from_db()
+        html = Template("{% load product_images %}{% responsive_image product 'card' class='card-img-top' alt=product.name %}").render(
+            Context({'product': product})
+        )
+        self.assertIn('<picture><source type="image/webp"', html)
+        # Sólo derivados cuadrados de card; el de 800px ampliaría la original de 800x600
+        self.assertEqual(image_srcset(product, 'card').count('w, '), 1)
+        self.assertIn(' 300w, ', html)
+        self.assertIn(' 400w"', html)
+        self.assertNotIn(' 150w', html)
+        self.assertIn('width="400" height="400"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('alt="Audífonos Foto"', html)
+
+    def test_detail_srcset_keeps_the_uncropped_photo(self):
+        product = create_product(self.category, 'Monitor Foto', primary_image=image_upload())
+        product.refresh_from_db()
+        srcset = image_srcset(product, 'detail')
+        self.assertEqual([item.rsplit(' ', 1)[1] for item in srcset.split(', ')], ['600w', '800w'])
+        self.assertNotIn('-card-', srcset)
+        html = Template("{% load product_images %}{% responsive_image product 'detail' %}").render(Context({'product': product}))
+        self.assertIn('width="800" height="600"', html)
+
+    def test_stale_variants_fall_back_to_original(self):
+        product = create_product(self.category, 'Cámara Foto', primary_image=image_upload())
+        product.refresh_from_db()
+        # Una imagen nueva sin derivados todavía (p. ej. generación asíncrona pendiente)
+        Product.objects.filter(pk=product.pk).update(primary_image='products/otra.png')
+        product.refresh_from_db()
+        self.assertIsNone(current_variants(product))
+        html = Template("{% load product_images %}{% responsive_image product %}").render(Context({'product': product}))
+        self.assertEqual(html, f'<img src="{product.primary_image.url}" loading="lazy">')
+
+
+class RecommendationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        laptops = Category.objects.get(slug='laptops')
+        audio = Category.objects.get(slug='audio-video')
+        cls.laptop = create_product(laptops, 'Laptop Uno')
+        cls.bag = create_product(laptops, 'Funda Laptop')
+        cls.other_laptop = create_product(laptops, 'Laptop Dos', average_rating=Decimal('4.50'))
+        cls.headphones = create_product(audio, 'Audífonos Estudio')
+        cls.speaker = create_product(audio, 'Bocina Sala')
+        cls.user = User.objects.create_user(username='comprador', email='c@example.com', password='x')
+
+        for basket, status in (
+            ([cls.laptop, cls.headphones], 'delivered'),
+            ([cls.laptop, cls.headphones, cls.bag], 'delivered'),
+            ([cls.laptop, cls.speaker], 'cancelled'),
+        ):
+            order = Order.objects.create(user=cls.user, email='c@example.com', phone='555', payment_method='paypal', status=status)
+            for product in basket:
+                OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=product.price)
+        Wishlist.objects.create(user=cls.user, product=cls.laptop)
+        Wishlist.objects.create(user=cls.user, product=cls.bag)
+
+    def neighbours(self, product):
+        return list(
+            ProductRecommendation.objects.filter(product=product).values_list('recommended_id', 'source')
+        )
+
+    def test_copurchase_neighbours_ranked_then_category_fill(self):
+        stats = build_recommendations(top_k=3)
+        self.assertEqual(stats['baskets'], 3)
+        # Audífonos (2 pedidos) por delante de la funda (1 pedido + lista de deseos); el pedido cancelado no cuenta
+        self.assertEqual(self.neighbours(self.laptop), [
+            (self.headphones.pk, 'copurchase'), (self.bag.pk, 'copurchase'), (self.other_laptop.pk, 'category'),
+        ])
+        self.assertEqual(self.neighbours(self.speaker), [(self.headphones.pk, 'category')])
+
+    def test_detail_reads_precomputed_rows(self):
+        build_recommendations(top_k=3)
+        Product.objects.filter(pk=self.headphones.pk).update(stock_quantity=0)
+        with self.assertNumQueries(1):
+            related = related_products(self.laptop, limit=4)
+        self.assertEqual(related, [self.bag, self.other_laptop])
+
+        response = self.client.get(reverse('products:detail', args=['laptops', self.laptop.slug]))
+        self.assertEqual(list(response.context['related_products']), [self.bag, self.other_laptop])
+
+    def test_falls_back_to_category_without_rows(self):
+        self.assertEqual(set(related_products(self.headphones)), {self.speaker})
+
+    def test_oversize_baskets_are_skipped_whole(self):
+        matrix = CooccurrenceMatrix(max_basket=2)
+        matrix.add({1, 2, 3})
+        matrix.add({2, 3})
+        self.assertEqual((matrix.baskets, matrix.skipped), (1, 1))
+        # Un recorte por id habría emparejado 1 y 2 y dejado fuera al 3
+        self.assertEqual(matrix.neighbours(1, 3), [])
+        self.assertEqual(matrix.neighbours(3, 3), [(2, 1.0)])
+
+
+class ProductCardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        laptops = Category.objects.get(slug='laptops')
+        for i in range(3):
+            create_product(
+                laptops, f'Laptop Tarjeta {i}', description='texto largo ' * 50,
+                specifications={'ram': '16GB'}, compare_at_price=Decimal('150.00'), average_rating=Decimal('4.50'),
+            )
+
+    def test_cards_defer_heavy_columns(self):
+        product = Product.objects.cards().get(slug='laptop-tarjeta-0')
+        self.assertTrue({'description', 'specifications', 'features', 'meta_description'} <= product.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual((product.category.slug, product.discount_percentage, product.is_low_stock), ('laptops', 33, True))
+
+    def test_listings_render_without_loading_deferred_fields(self):
+        for url in (
+            reverse('core:home'),
+            reverse('products:category', args=['laptops']),
+            reverse('products:all'),
+            reverse('products:sale'),
+            reverse('products:search') + '?q=laptop',
+        ):
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                self.assertContains(response, 'Laptop Tarjeta 2')
+            statements = [query['sql'] for query in queries if '"products_product"' in query['sql']]
+            self.assertTrue(statements)
+            self.assertFalse([sql for sql in statements if '"products_product"."description"' in sql])
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+@mock.patch.object(views, 'PRODUCTS_PER_PAGE', 2)
+class CatalogPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        laptops = Category.objects.get(slug='laptops')
+        cls.products = [create_product(laptops, f'Laptop Pagina {i}') for i in range(3)]
+
+    def test_category_walks_pages_by_cursor(self):
+        url = reverse('products:category', args=['laptops'])
+        first = self.client.get(url)
+        page = first.context['page_obj']
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(len(page), 2)
+        self.assertContains(first, '3 resultados')
+        second = self.client.get(url + '?' + page.next_querystring)
+        self.assertEqual(len(second.context['page_obj']), 1)
+        self.assertEqual(
+            {p.pk for p in list(page) + list(second.context['page_obj'])},
+            {p.pk for p in self.products},
+        )
+
+    @override_settings(LISTING_COUNT_MODE='approx')
+    def test_capped_count_is_rendered_as_approximate(self):
+        with mock.patch.object(CursorPaginator, '__init__', partialmethod(CursorPaginator.__init__, count_cap=2)):
+            response = self.client.get(reverse('products:all'))
+        self.assertTrue(response.context['page_obj'].paginator.count_is_approximate)
+        self.assertContains(response, 'Más de 2 resultados')
+
+    @override_settings(LISTING_PAGINATION='offset')
+    def test_offset_search_page_links_keep_the_query(self):
+        response = self.client.get(reverse('products:search') + '?q=laptop')
+        page = response.context['page_obj']
+        self.assertFalse(getattr(page, 'is_cursor', False))
+        self.assertEqual(page.paginator.count, 3)
+        self.assertContains(response, 'href="?q=laptop&amp;page=2"')
+
+    def test_deep_search_pages_run_no_count_or_offset(self):
+        url = reverse('products:search')
+        first = self.client.get(url + '?q=laptop')
+        page = first.context['page_obj']
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(page.paginator.count, 3)
+        self.assertIn('q=laptop', page.next_querystring)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url + '?' + page.next_querystring)
+        sql = [query['sql'] for query in queries]
+        self.assertFalse([statement for statement in sql if '__count' in statement or ' OFFSET ' in statement])
+        self.assertEqual(
+            [p.pk for p in list(page) + list(second.context['page_obj'])],
+            [p.pk for p in self.products],
+        )
+
+
+FEED = [
+    {'sku': 'IMP-1', 'name': 'Router Mesh', 'category': 'Redes > Routers', 'price': '1,299.00', 'stock_quantity': '7',
+     'brand': 'TP-Link', 'specifications': '{"banda": "dual"}'},
+    {'sku': 'IMP-2', 'name': 'Router Mesh', 'category': 'Redes > Routers', 'price': '999.50'},
+    {'sku': 'IMP-3', 'name': 'Switch 8 puertos', 'category': 'Redes', 'price': 'caro'},
+]
+
+
+class ProductImportTests(TestCase):
+
+    def test_upsert_with_categories_slugs_and_errors(self):
+        stats = import_products(iter(FEED), batch_size=2)
+        self.assertEqual((stats.rows, stats.created, stats.error_count, stats.categories), (3, 2, 1, 2))
+        self.assertIn('IMP-3: price no es un número', stats.errors[0])
+
+        first, second = Product.objects.filter(sku__startswith='IMP-').order_by('sku')
+        self.assertEqual((first.slug, second.slug), ('router-mesh', 'router-mesh-2'))
+        self.assertEqual((first.price, first.stock_quantity, first.specifications), (Decimal('1299.00'), 7, {'banda': 'dual'}))
+        self.assertEqual(first.category.parent.name, 'Redes')
+        self.assertEqual(first.category.path, f'{first.category.parent_id:06d}/{first.category_id:06d}/')
+        # bulk_create no dispara señales: el importador indexa el lote
+        self.assertEqual(set(search_products(Product.objects.all(), 'router')), {first, second})
+
+    def test_reimport_skips_unchanged_and_updates_changed(self):
+        import_products(iter(FEED[:2]))
+        created_at = Product.objects.get(sku='IMP-1').created_at
+        changed = [dict(FEED[0], price='1199.00'), FEED[1]]
+        stats = import_products(iter(changed))
+        self.assertEqual((stats.created, stats.updated, stats.unchanged), (0, 1, 1))
+        product = Product.objects.get(sku='IMP-1')
+        self.assertEqual((product.price, product.slug, product.created_at), (Decimal('1199.00'), 'router-mesh', created_at))
+
+    def test_dry_run_writes_nothing(self):
+        stats = import_products(iter(FEED), dry_run=True)
+        self.assertEqual(stats.created, 2)
+        self.assertFalse(Product.objects.filter(sku__startswith='IMP-').exists())
+        self.assertFalse(Category.objects.filter(name='Routers').exists())
+
+    def test_clean_row_validation(self):
+        data, error = clean_row({'sku': 'X', 'name': 'Algo', 'category': 'Redes', 'price': '10', 'condition': 'usado'})
+        self.assertIsNone(data)
+        self.assertIn('condition inválida', error)
+        data, _ = clean_row({'sku': 'X', 'name': 'Algo', 'category': ' Redes >  Wifi ', 'price': '10'})
+        self.assertEqual((data['category'], data['status'], data['features']), (('Redes', 'Wifi'), 'active', []))
+        data, error = clean_row({'sku': 'X', 'name': 'Algo', 'category': 'Redes > ' + 'W' * 101, 'price': '10'})
+        self.assertIsNone(data)
+        self.assertIn('supera 100 caracteres', error)
+
+    def test_failed_batch_still_invalidates_catalog(self):
+        rows = [FEED[0], {'sku': 'IMP-9', 'name': 'Roto', 'category': 'Redes', 'price': '10'}]
+        importer = ProductImporter(batch_size=1)
+        category = Category.objects.get(slug='laptops').pk
+        version = get_catalog_version()
+        # El primer lote se confirma y el segundo falla
+        with mock.patch.object(importer.categories, 'resolve', side_effect=[category, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                importer.run(iter(rows))
+        self.assertTrue(Product.objects.filter(sku='IMP-1').exists())
+        self.assertNotEqual(get_catalog_version(), version)
@@ -2,15 +2,27 @@
 
 # Vista de ejemplo para el perfil de usuario
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
+from django.http import Http404
+from django.db.models import Count, Max, Q, Sum
 from .models import Category, Product, ProductImage, Review
+from .search import search_products
+from .category_tree import get_category_tree
+from .facets import FacetQuery, facet_groups
+from .recommendations import related_products
+from core.conditional import conditional_page
+from core.page_cache import anonymous_page
+from core.instrumentation import query_budget
+from core.pagination import paginate
+
+# Productos por página en los listados del catálogo
+PRODUCTS_PER_PAGE = 24
 
 def home(request):
     """Vista principal con productos destacados y categorías"""
     featured_products = Product.objects.filter(
         status='active',
         stock_quantity__gt=0
-    ).select_related('category').prefetch_related('additional_images')[:8]
+    ).cards()[:8]
     
     categories = Category.objects.filter(
         is_active=True,
@@ -23,100 +35,150 @@ def home(request):
     }
     return render(request, 'templates/products/home.html', context)
 
+def category_fingerprint(request, category_slug):
+    """Productos visibles del subárbol (cantidad, ids y última edición) en una consulta"""
+    tree = get_category_tree()
+    category = tree.get(category_slug)
+    if category is None:
+        return None
+    visible = Product.objects.filter(
+        category_id__in=tree.descendant_ids(category),
+        status='active',
+        stock_quantity__gt=0
+    ).aggregate(count=Count('id'), ids=Sum('id'), updated=Max('updated_at'))
+    return f"category:{category.pk}:{visible['count']}:{visible['ids']}:{visible['updated']}"
+
+
+@query_budget(8)
+@anonymous_page('category')
+@conditional_page(category_fingerprint, 'category')
 def category_view(request, category_slug):
     """Vista de categoría con productos y subcategorías"""
-    category = get_object_or_404(Category, slug=category_slug)
+    tree = get_category_tree()
+    category = tree.get(category_slug)
+    if category is None:
+        raise Http404('Categoría no encontrada')
     
-    # Obtener productos de esta categoría y subcategorías
+    # Obtener productos de esta categoría y de todo su subárbol
     products = Product.objects.filter(
-        Q(category=category) | Q(category__parent=category),
+        category_id__in=tree.descendant_ids(category),
         status='active',
         stock_quantity__gt=0
-    ).select_related('category').prefetch_related('additional_images')
+    ).cards()
+    page_obj = paginate(request, products.order_by('-created_at'), PRODUCTS_PER_PAGE, '-created_at')
     
     # Obtener subcategorías
-    subcategories = category.children.filter(is_active=True)
+    subcategories = tree.get_children(category)
     
     context = {
         'category': category,
-        'products': products,
+        'products': page_obj,
+        'page_obj': page_obj,
         'subcategories': subcategories,
     }
     return render(request, 'category.html', context)
 
+def detail_fingerprint(request, category_slug, product_slug):
+    """Campos del producto que muestra la ficha (stock, valoraciones, reseñas) en una consulta"""
+    row = Product.objects.filter(
+        slug=product_slug,
+        category__slug=category_slug
+    ).annotate(reviews_updated=Max('reviews__updated_at')).values_list(
+        'pk', 'updated_at', 'stock_quantity', 'status', 'review_count', 'average_rating',
+        'category__updated_at', 'reviews_updated'
+    ).first()
+    if row is None:
+        return None
+    return 'detail:' + ':'.join(str(value) for value in row)
+
+
+@query_budget(12)
+@anonymous_page('detail')
+@conditional_page(detail_fingerprint, 'detail')
 def product_detail(request, category_slug, product_slug):
     """Vista de detalle de producto con imágenes y reseñas"""
     category = get_object_or_404(Category, slug=category_slug)
     product = get_object_or_404(
         Product.objects.select_related('category')
-        .prefetch_related('additional_images', 'reviews__user'),
+        .prefetch_related('additional_images'),
         slug=product_slug,
         category=category
     )
     
-    # Obtener productos relacionados
-    related_products = Product.objects.filter(
-        category=category,
-        status='active',
-        stock_quantity__gt=0
-    ).exclude(id=product.id)[:4]
+    # Productos relacionados precalculados (manage.py build_recommendations)
+    related = related_products(product, limit=4)
     
     # Obtener reseñas aprobadas
-    approved_reviews = product.reviews.filter(is_approved=True)
+    approved_reviews = product.reviews.filter(is_approved=True).select_related('user')
     
     context = {
         'product': product,
         'category': category,
-        'related_products': related_products,
+        'related_products': related,
         'approved_reviews': approved_reviews,
     }
     return render(request, 'detail.html', context)
 
+@query_budget(12)
 def search(request):
     """Vista de búsqueda de productos"""
     query = request.GET.get('q', '')
-    products = Product.objects.none()
+    page_obj = None
+    facets = []
     
     if query:
-        products = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(brand__icontains=query) |
-            Q(category__name__icontains=query),
-            status='active',
-            stock_quantity__gt=0
-        ).select_related('category').prefetch_related('additional_images')
+        results = search_products(
+            Product.objects.filter(status='active', stock_quantity__gt=0),
+            query
+        )
+        # Filtros por especificaciones, marca, condición y precio (?f_ram=8GB&precio=500-1000)
+        facet_query = FacetQuery.from_querydict(results, request.GET)
+        # La galería sólo se usa como imagen de respaldo de la tarjeta
+        products = facet_query.products.cards().prefetch_related('additional_images')
+        # Cursor sobre (search_rank, pk): las páginas profundas no hacen COUNT ni OFFSET
+        page_obj = paginate(request, products, PRODUCTS_PER_PAGE, 'search_rank')
+        facets = facet_groups(facet_query, request.GET)
     
     context = {
         'query': query,
-        'products': products,
+        'products': page_obj or Product.objects.none(),
+        'page_obj': page_obj,
+        'facets': facets,
     }
     return render(request, 'search.html', context)
 
 
+@query_budget(8)
+@anonymous_page('all_products')
 def all_products(request):
     """Vista para mostrar todos los productos activos"""
     products = Product.objects.filter(
         status='active',
         stock_quantity__gt=0
-    ).select_related('category').prefetch_related('additional_images')
+    ).cards()
+    page_obj = paginate(request, products.order_by('-created_at'), PRODUCTS_PER_PAGE, '-created_at')
     
     context = {
-        'products': products,
+        'products': page_obj,
+        'page_obj': page_obj,
         'title': 'Todos los Productos',
     }
     return render(request, 'all.html', context)
 
+@query_budget(8)
+@anonymous_page('sale_products')
 def sale_products(request):
     """Vista para mostrar productos en oferta"""
     products = Product.objects.filter(
         status='active',
         stock_quantity__gt=0,
         compare_at_price__isnull=False
-    ).select_related('category').prefetch_related('additional_images')
+    ).cards()
+    page_obj = paginate(request, products.order_by('-created_at'), PRODUCTS_PER_PAGE, '-created_at')
     
     context = {
-        'products': products,
+        'products': page_obj,
+        'page_obj': page_obj,
         'title': 'Productos en Oferta',
     }
     return render(request, 'sale.html', context)
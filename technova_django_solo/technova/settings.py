@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    'core.instrumentation.QueryCountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -77,7 +78,8 @@ ROOT_URLCONF = 'technova.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (core.instrumentation)
+        'BACKEND': 'core.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,6 +90,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.cart',
                 'core.context_processors.categories',
+                'core.context_processors.user_fragments',
             ],
         },
     },
@@ -265,6 +268,8 @@ SITE_NAME = 'TechNova Solutions'
 SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
 
 # Configuración de cookies
+# Sesiones leídas del cache: comprobar si el visitante es anónimo no consulta la BD
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_COOKIE_AGE = 86400  # 24 horas
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_SAVE_EVERY_REQUEST = True
@@ -281,4 +286,79 @@ WHITENOISE_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Configuración del admin
 ADMIN_SITE_TITLE = 'Administración TechNova Solutions'
 ADMIN_SITE_HEADER = 'Administración TechNova Solutions'
-ADMIN_INDEX_TITLE = 'Panel de Administración'
\ No newline at end of file
+ADMIN_INDEX_TITLE = 'Panel de Administración'
+# Configuración de búsqueda de productos
+PRODUCT_SEARCH_BACKEND = os.getenv('PRODUCT_SEARCH_BACKEND', 'products.search.InvertedIndexBackend')
+PRODUCT_SEARCH_MAX_RESULTS = 1000
+
+# Facetas visibles en la búsqueda (claves normalizadas de las especificaciones)
+PRODUCT_FACETS = ['brand', 'condition', 'ram', 'almacenamiento', 'color']
+
+# Productos relacionados guardados por producto (manage.py build_recommendations)
+PRODUCT_RECOMMENDATIONS_TOP_K = 8
+
+# Paginación de listados: 'cursor' (keyset, coste constante) u 'offset' (Paginator clásico)
+LISTING_PAGINATION = os.getenv('LISTING_PAGINATION', 'cursor')
+# Conteo total en modo cursor: None, 'approx' (estimado/acotado) o 'exact'
+LISTING_COUNT_MODE = os.getenv('LISTING_COUNT_MODE', 'approx') or None
+
+# Números de pedido reservados por proceso en cada viaje a la base de datos
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', 100))
+
+# Secciones de la portada: se invalidan al cambiar la versión del catálogo
+HOME_SECTIONS_TIMEOUT = 60 * 15
+
+# Peticiones condicionales (ETag + 304) en portada, categorías y ficha de producto
+CATALOG_CONDITIONAL_GET = True
+# Cache-Control por vista: privada porque la cabecera muestra el carrito y el usuario
+CATALOG_CACHE_CONTROL = {
+    'home': {'private': True, 'max_age': 0, 'must_revalidate': True},
+    'category': {'private': True, 'max_age': 0, 'must_revalidate': True},
+    'detail': {'private': True, 'max_age': 0, 'must_revalidate': True},
+}
+
+# Cache de página completa para anónimos (core.page_cache); el carrito y los mensajes se piden aparte
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True') == 'True'
+# Tope de antigüedad: el stock descontado con update() no invalida la página
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Instrumentación de peticiones: cabeceras X-Query-Count/Server-Timing y /_stats/peticiones/
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', str(DEBUG)) == 'True'
+# Lanzar QueryBudgetExceeded (en lugar de registrar un aviso) si una vista supera su presupuesto
+QUERY_BUDGET_STRICT = False
+
+# Derivados de imágenes (miniaturas, tarjetas, detalle y WebP) generados en segundo plano
+IMAGE_DERIVATIVES_ASYNC = True
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv('IMAGE_DERIVATIVE_WORKERS', 2))
+
+# Bandeja de salida de correos (core.outbox): el worker es "manage.py send_outbox" o la tarea Celery
+EMAIL_OUTBOX_CELERY = os.getenv('EMAIL_OUTBOX_CELERY', 'False') == 'True'
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+# Segundos antes del primer reintento; se duplica en cada intento hasta el máximo
+EMAIL_OUTBOX_RETRY_DELAY = 30
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 60 * 60
+# Una reserva sin resolver tras este tiempo se considera abandonada
+EMAIL_OUTBOX_LEASE = 60 * 5
+
+# Campañas del newsletter: "manage.py send_campaign <id>"
+NEWSLETTER_SEND_WORKERS = int(os.getenv('NEWSLETTER_SEND_WORKERS', 4))
+NEWSLETTER_CHUNK_SIZE = 500
+
+# Resúmenes de ventas: "manage.py update_sales_rollups" (cron) y "backfill_sales_rollups" para el historial
+# Segundos que se releen antes de la marca de agua (transacciones que confirman tarde)
+SALES_ROLLUP_LAG = 300
+
+# Reservas de inventario del checkout: segundos que se aparta el stock; "manage.py release_stock_holds" (cron) libera las vencidas
+STOCK_HOLD_TTL = 15 * 60
+# Contra el acaparamiento: las renovaciones no pasan de esta ventana por propietario, seguida de una espera sin reservas
+STOCK_HOLD_MAX_AGE = 45 * 60
+STOCK_HOLD_COOLDOWN = 15 * 60
+# Unidades máximas que se apartan por línea; las líneas mayores se descuentan al confirmar
+STOCK_HOLD_MAX_QUANTITY = 5
+
+# Carrito de visitantes anónimos: en cache hasta iniciar sesión (o 'orders.cart_storage.DatabaseCartStore')
+CART_ANONYMOUS_STORE = os.getenv('CART_ANONYMOUS_STORE', 'orders.cart_storage.CacheCartStore')
+
+# Tests con cache local en memoria y estáticos sin manifiesto (core.testing)
+TEST_RUNNER = 'core.testing.TestRunner'
@@ -4,19 +4,36 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from .forms import UserRegistrationForm
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.db import transaction
+from django.urls import reverse
 from django.contrib.auth import get_user_model
 from .models import VerificationToken
 from django.views.decorators.csrf import csrf_protect
 from django.contrib.auth.decorators import login_required
 import uuid
-from django.template.loader import render_to_string
 from django.utils import timezone
+from core.outbox import enqueue_template
 from orders.models import Order
 from orders.models import Wishlist
 User = get_user_model()
 
 
+def queue_verification_email(user):
+    """Crear (o renovar) el token de verificación y encolar el correo"""
+    token, _ = VerificationToken.objects.update_or_create(
+        user=user,
+        defaults={
+            'token': uuid.uuid4(),
+            'expires_at': timezone.now() + timezone.timedelta(hours=24),
+        },
+    )
+    context = {
+        'user': user,
+        'verification_url': f"{settings.SITE_URL}{reverse('users:verify', args=[token.token])}",
+    }
+    return enqueue_template('Verifica tu cuenta de TechNova Solutions', 'verification_email.html', context, [user.email])
+
+
 @csrf_protect
 def login_view(request):
     if request.method == 'POST':
@@ -47,36 +64,13 @@ def register_view(request):
     if request.method == 'POST':
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
-            user.is_active = False
-            user.save()
-            
-            # Crear token de verificación
-            token = str(uuid.uuid4())
-            VerificationToken.objects.create(
-                user=user,
-                token=token,
-                expires_at=timezone.now() + timezone.timedelta(hours=24)
-            )
-            
-            # Preparar contexto para el email
-            context = {
-                'user': user,
-                'verification_url': f"{settings.SITE_URL}/usuarios/verify/{token}",
-            }
-            
-            # Renderizar template HTML
-            html_content = render_to_string('verification_email.html', context)
-            
-            # Crear y enviar email
-            email = EmailMessage(
-                subject='Verifica tu cuenta de TechNova Solutions',
-                body=html_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email],
-            )
-            email.content_subtype = "html"
-            email.send()
+            # El correo queda en la bandeja dentro de la misma transacción;
+            # el worker lo envía sin bloquear la respuesta
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.is_active = False
+                user.save()
+                queue_verification_email(user)
             
             return redirect('users:registration_success')
     else:
@@ -120,32 +114,8 @@ def resend_verification(request):
         try:
             user = User.objects.get(email=email, is_active=False)
             
-            # Crear nuevo token
-            token = str(uuid.uuid4())
-            VerificationToken.objects.create(
-                user=user,
-                token=token,
-                expires_at=timezone.now() + timezone.timedelta(hours=24)
-            )
-            
-            # Preparar contexto para el email
-            context = {
-                'user': user,
-                'verification_url': f"{settings.SITE_URL}/usuarios/verificar/{token}/",
-            }
-            
-            # Renderizar template HTML
-            html_content = render_to_string('users/verification_email.html', context)
-            
-            # Crear y enviar email
-            email = EmailMessage(
-                subject='Verifica tu cuenta de TechNova Solutions',
-                body=html_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email],
-            )
-            email.content_subtype = "html"
-            email.send()
+            with transaction.atomic():
+                queue_verification_email(user)
             
             messages.success(request, 'Se ha enviado un nuevo email de verificación.')
             return redirect('users:login')